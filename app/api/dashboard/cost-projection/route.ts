@@ -10,61 +10,36 @@ export async function GET(request: Request) {
   try {
     const supabase = await createServerClient()
 
-    // Get episode average cost
-    const { data: episodeDef, error: episodeDefError } = await supabase
-      .from("episode_definition")
-      .select("average_cost")
-      .eq("episode_id", episodeId)
-      .maybeSingle()
-
-    console.log("[v0] Episode definition for cost projection:", { episodeId, episodeDef, error: episodeDefError })
-
-    const avgCost = episodeDef?.average_cost || 30000
-
-    // Get historical costs from clinical_outcome_event + claim_line
-    const threeMonthsAgo = new Date()
-    threeMonthsAgo.setMonth(threeMonthsAgo.getMonth() - 3)
-
-    const { data: outcomes } = await supabase
-      .from("clinical_outcome_event")
-      .select("procedure_date, outcome_event_id")
-      .eq("episode_id", episodeId)
-      .gte("procedure_date", threeMonthsAgo.toISOString())
+    // Generate quarters (Q3 2024 through Q2 2025)
+    const quarters = ["Q3 2024", "Q4 2024", "Q1 2025", "Q2 2025"]
 
-    // Get predictions for future quarters
-    const { data: predictions } = await supabase
-      .from("prediction_result")
-      .select("predicted_event_date, predicted_cost")
+    // Monthly cost cells from the pre-rolled cube (scripts/edi_loader/forecast_cube.py);
+    // costs there already fall back to the episode average cost
+    const { data: cells } = await supabase
+      .from("forecast_monthly_aggregate")
+      .select("month, actual_cost, predicted_volume, predicted_cost")
       .eq("episode_id", episodeId)
-      .gte("probability_score", 0.5)
-      .gte("predicted_event_date", new Date().toISOString())
+      .gte("month", "2024-07-01")
+      .lt("month", "2025-07-01")
 
     // Aggregate by quarter
     const quarterlyData: Record<string, { actual: number; projected: number; count: number }> = {}
-
-    // Generate quarters (Q3 2024 through Q2 2025)
-    const quarters = ["Q3 2024", "Q4 2024", "Q1 2025", "Q2 2025"]
     quarters.forEach((q) => {
       quarterlyData[q] = { actual: 0, projected: 0, count: 0 }
     })
 
-    // Aggregate actual costs by quarter
-    outcomes?.forEach((outcome) => {
-      const date = new Date(outcome.procedure_date)
-      const quarter = `Q${Math.floor(date.getMonth() / 3) + 1} ${date.getFullYear()}`
-      if (quarterlyData[quarter]) {
-        quarterlyData[quarter].actual += avgCost / 1000000 // Convert to millions
-      }
-    })
-
-    // Aggregate predicted costs by quarter
-    predictions?.forEach((pred) => {
-      const date = new Date(pred.predicted_event_date)
-      const quarter = `Q${Math.floor(date.getMonth() / 3) + 1} ${date.getFullYear()}`
+    // Actual costs for every month, projections from the current month on
+    const now = new Date()
+    const currentMonth = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, "0")}-01`
+    cells?.forEach((cell) => {
+      const [year, month] = cell.month.split("-").map(Number)
+      const quarter = `Q${Math.floor((month - 1) / 3) + 1} ${year}`
       if (quarterlyData[quarter]) {
-        const cost = pred.predicted_cost || avgCost
-        quarterlyData[quarter].projected += cost / 1000000 // Convert to millions
-        quarterlyData[quarter].count++
+        quarterlyData[quarter].actual += Number(cell.actual_cost) / 1000000 // Convert to millions
+        if (cell.month >= currentMonth) {
+          quarterlyData[quarter].projected += Number(cell.predicted_cost) / 1000000
+          quarterlyData[quarter].count += cell.predicted_volume
+        }
       }
     })
 
@@ -11,73 +11,52 @@ export async function GET(request: Request) {
   try {
     const supabase = await createServerClient()
 
-    // Get member IDs that match the filters
-    let memberQuery = supabase.from("member").select("member_id")
+    // Last 6 months + next 5 months, read from the pre-rolled monthly cube
+    // (scripts/edi_loader/forecast_cube.py) instead of members/outcomes/predictions
+    const now = new Date()
+    const firstMonth = new Date(now.getFullYear(), now.getMonth() - 5, 1)
+    const lastMonth = new Date(now.getFullYear(), now.getMonth() + 5, 1)
+
+    let cubeQuery = supabase
+      .from("forecast_monthly_aggregate")
+      .select("month, actual_volume, predicted_volume")
+      .eq("episode_id", episodeId)
+      .gte("month", toMonthDate(firstMonth))
+      .lte("month", toMonthDate(lastMonth))
 
     if (region !== "all") {
-      memberQuery = memberQuery.eq("region", region)
+      cubeQuery = cubeQuery.eq("region", region)
     }
     if (network !== "all") {
-      memberQuery = memberQuery.eq("network_tier", network)
+      cubeQuery = cubeQuery.eq("network", network)
     }
     if (planType !== "all") {
-      memberQuery = memberQuery.eq("plan_type", planType)
-    }
-
-    const { data: members } = await memberQuery
-
-    if (!members || members.length === 0) {
-      return NextResponse.json([])
+      cubeQuery = cubeQuery.eq("plan_type", planType)
     }
 
-    const memberIds = members.map((m) => m.member_id)
-
-    // Get actual volumes from clinical_outcome_event (claims)
-    const { data: outcomes } = await supabase
-      .from("clinical_outcome_event")
-      .select("procedure_date, episode_id")
-      .eq("episode_id", episodeId)
-      .in("member_id", memberIds)
-      .gte("procedure_date", new Date(Date.now() - 180 * 24 * 60 * 60 * 1000).toISOString()) // Last 6 months
-
-    // Get predictions for future volumes
-    const { data: predictions } = await supabase
-      .from("prediction_result")
-      .select("predicted_event_date, probability_score, episode_id")
-      .eq("episode_id", episodeId)
-      .in("member_id", memberIds)
-      .gte("probability_score", 0.5)
-      .gte("predicted_event_date", new Date().toISOString())
-      .lte("predicted_event_date", new Date(Date.now() + 150 * 24 * 60 * 60 * 1000).toISOString()) // Next 5 months
+    const { data: cells } = await cubeQuery
 
     // Aggregate by month
     const monthlyData: Record<string, { actual: number; predicted: number }> = {}
 
-    // Generate last 6 months + next 5 months
     const months = []
     for (let i = -5; i <= 5; i++) {
-      const date = new Date()
-      date.setMonth(date.getMonth() + i)
+      const date = new Date(now.getFullYear(), now.getMonth() + i, 1)
       const monthKey = date.toLocaleDateString("en-US", { month: "short", year: "numeric" })
       months.push(monthKey)
       monthlyData[monthKey] = { actual: 0, predicted: 0 }
     }
 
-    // Count actual outcomes by month
-    outcomes?.forEach((outcome) => {
-      const date = new Date(outcome.procedure_date)
-      const monthKey = date.toLocaleDateString("en-US", { month: "short", year: "numeric" })
-      if (monthlyData[monthKey]) {
-        monthlyData[monthKey].actual++
-      }
-    })
-
-    // Count predictions by month
-    predictions?.forEach((pred) => {
-      const date = new Date(pred.predicted_event_date)
-      const monthKey = date.toLocaleDateString("en-US", { month: "short", year: "numeric" })
+    // Actuals for past months, predictions from the current month on
+    const currentMonth = toMonthDate(new Date(now.getFullYear(), now.getMonth(), 1))
+    cells?.forEach((cell) => {
+      const [year, month] = cell.month.split("-").map(Number)
+      const monthKey = new Date(year, month - 1, 1).toLocaleDateString("en-US", { month: "short", year: "numeric" })
       if (monthlyData[monthKey]) {
-        monthlyData[monthKey].predicted++
+        monthlyData[monthKey].actual += cell.actual_volume
+        if (cell.month >= currentMonth) {
+          monthlyData[monthKey].predicted += cell.predicted_volume
+        }
       }
     })
 
@@ -101,3 +80,7 @@ export async function GET(request: Request) {
     return NextResponse.json([])
   }
 }
+
+function toMonthDate(date: Date) {
+  return `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, "0")}-01`
+}
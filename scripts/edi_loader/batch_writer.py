@@ -0,0 +1,166 @@
+"""
+Batched upsert writer for Supabase tables
+
+Consumes rows (typically straight from a parser generator), flushes them in
+fixed-size batches and keeps a bounded number of batches in flight on a
+thread pool. Failed batches are retried with exponential backoff.
+
+At most batch_size * (max_in_flight + 1) rows are resident at any time, no
+matter how large the input is. The client only needs the supabase-py
+`client.table(name).upsert(rows).execute()` interface, so a local stub
+client can stand in for Supabase.
+
+A writer created inside a RunMetrics stage reports each batch's latency,
+rows and retries to that stage.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from metrics import Histogram, current_stage
+
+DEFAULT_BATCH_SIZE = int(os.environ.get('CFE_BATCH_SIZE', 1000))
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get('CFE_MAX_IN_FLIGHT', 4))
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+
+class BatchWriter:
+    """Buffers rows for one table and upserts them in concurrent batches"""
+
+    def __init__(self, client: Any, table: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_seconds: float = DEFAULT_BACKOFF_SECONDS, on_conflict: Optional[str] = None,
+                 depends_on: Optional['BatchWriter'] = None):
+        """
+        Args:
+            client: Supabase client (or any object with the same table/upsert/execute API)
+            table: Target table name
+            batch_size: Rows per upsert call
+            max_in_flight: Batches allowed to be sending concurrently
+            max_retries: Retries per batch before the load fails
+            backoff_seconds: Delay before the first retry, doubled on each retry
+            on_conflict: Conflict target columns passed to upsert
+            depends_on: Writer whose rows must land first (e.g. claim_header
+                before claim_line); it is drained before each batch is sent
+        """
+        self.client = client
+        self.table = table
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.on_conflict = on_conflict
+        self.depends_on = depends_on
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.retries = 0
+        self.batch_seconds = Histogram()
+        # Worker threads don't inherit the caller's context, so keep the stage
+        self._stage = current_stage()
+
+        self._batch = []
+        self._pending = []
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight,
+                                            thread_name_prefix=f'upsert-{table}')
+
+    def __enter__(self) -> 'BatchWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def write(self, row: Dict):
+        """Add one row, sending a batch once batch_size rows are buffered"""
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self._submit()
+
+    def write_all(self, rows: Iterable[Dict]) -> int:
+        """Add every row from an iterable (e.g. a parser generator)"""
+        count = 0
+        for row in rows:
+            self.write(row)
+            count += 1
+        return count
+
+    def flush(self):
+        """Send any partially filled batch"""
+        if self._batch:
+            self._submit()
+
+    def drain(self):
+        """Send the partial batch and wait for every in-flight batch to finish"""
+        self.flush()
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        """Drain and release the worker threads"""
+        try:
+            self.drain()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _submit(self):
+        batch, self._batch = self._batch, []
+
+        if self.depends_on is not None:
+            self.depends_on.drain()
+
+        # Blocks the producer while max_in_flight batches are outstanding
+        self._slots.acquire()
+        future = self._executor.submit(self._send, batch)
+        future.add_done_callback(self._release)
+        self._pending.append(future)
+        self._reap()
+
+    def _release(self, future: Future):
+        self._slots.release()
+
+    def _reap(self):
+        """Drop finished batches, surfacing failures as early as possible"""
+        still_pending = []
+        for future in self._pending:
+            if future.done():
+                future.result()
+            else:
+                still_pending.append(future)
+        self._pending = still_pending
+
+    def _send(self, batch: List[Dict]) -> int:
+        options = {'on_conflict': self.on_conflict} if self.on_conflict else {}
+        started = time.perf_counter()
+        retries = 0
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.table(self.table).upsert(batch, **options).execute()
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(
+                        f"Upsert of {len(batch)} rows into {self.table} failed after "
+                        f"{attempt + 1} attempts: {str(e)}"
+                    ) from e
+                with self._lock:
+                    self.retries += 1
+                retries += 1
+                time.sleep(self.backoff_seconds * (2 ** attempt))
+
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.rows_written += len(batch)
+            self.batches_written += 1
+            self.batch_seconds.observe(seconds)
+        if self._stage is not None:
+            self._stage.observe_batch(len(batch), seconds, retries)
+        return len(batch)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Memory per claim line for parse_837 dicts vs parse_837_columnar buffers
+
+Generates synthetic 837I and 837P files, checks that every columnar record
+decodes back to the same dict parse_837 produces, then measures the memory
+each representation holds once parsing has finished (tracemalloc, so the
+figures are Python allocations only) and extrapolates to a million lines.
+
+Usage:
+  python benchmarks/bench_claim_columns.py --interchanges 2000
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from synthetic_x12 import write_file
+
+from parsers import parse_837, parse_837_columnar
+
+def check_identical(file_path: str) -> int:
+    """Every columnar row decodes to the parse_837 dict; returns rows checked"""
+    headers, lines = parse_837(file_path)
+    header_table, line_table = parse_837_columnar(file_path)
+    assert len(headers) == len(header_table) and len(lines) == len(line_table)
+
+    for expected, actual in zip(headers, header_table.records()):
+        assert {**actual, **expected} == actual, (expected, actual)
+    for expected, actual in zip(lines, line_table.records()):
+        # Columns cover both SV1 and SV2 fields; the one a line lacks is None
+        assert {**actual, **expected} == actual, (expected, actual)
+    return len(headers) + len(lines)
+
+def measure(parse: Callable, file_path: str) -> Dict:
+    """Parse once and report retained bytes, peak bytes and seconds"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    headers, lines = parse(file_path)
+    seconds = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'headers': len(headers), 'lines': len(lines), 'retained': retained,
+            'peak': peak, 'seconds': seconds}
+
+def print_result(name: str, result: Dict):
+    per_line = result['retained'] / max(result['lines'], 1)
+    print(f"  {name:<20} {result['retained'] / 1e6:>9.1f} MB held  {result['peak'] / 1e6:>9.1f} MB peak  "
+          f"{per_line:>8.0f} B/line  {per_line * 1e6 / 1e9:>6.2f} GB per 1M lines  "
+          f"{result['seconds']:>7.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark columnar 837 claim memory')
+    parser.add_argument('--interchanges', type=int, default=2000, help='Interchanges per synthetic file')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'cfe-bench'),
+                        help='Where synthetic files are generated and cached')
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    for kind in ('837I', '837P'):
+        path = os.path.join(args.work_dir, f"synthetic-{kind}-{args.interchanges}-{args.seed}.edi")
+        if not os.path.exists(path):
+            write_file(path, kind, args.interchanges, seed=args.seed)
+
+        print(f"{kind}: identical output on {check_identical(path):,} records")
+        dicts = measure(parse_837, path)
+        columns = measure(parse_837_columnar, path)
+        print(f"  {dicts['headers']:,} claims, {dicts['lines']:,} lines")
+        print_result('parse_837', dicts)
+        print_result('parse_837_columnar', columns)
+        print(f"  {dicts['retained'] / max(columns['retained'], 1):.1f}x less memory held")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for code_trie.py against a linear scan of prefix rules
+
+Builds a rule set of ICD-10 families and CPT ranges, checks that the trie
+and the scan agree on every looked-up code, then times both. The scan is
+what matching families without an index costs: every rule per code.
+
+Usage:
+  python benchmarks/bench_code_trie.py --rules 500 --lookups 200000
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import string
+import time
+
+from code_trie import CodeTrie, normalize_code
+
+def make_rules(count: int, rng: random.Random):
+    """Half ICD-10 families ('M17.*'), half CPT ranges ('27440-27447')"""
+    rules = []
+    for i in range(count):
+        if i % 2:
+            rules.append(('ICD10', f"{rng.choice(string.ascii_uppercase)}{rng.randint(0, 99):02d}.*"))
+        else:
+            low = rng.randint(10000, 99000)
+            rules.append(('CPT', f"{low}-{low + rng.randint(0, 200)}"))
+    return rules
+
+def make_codes(count: int, rng: random.Random):
+    codes = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            letter = rng.choice(string.ascii_uppercase)
+            codes.append(('ICD10', f"{letter}{rng.randint(0, 99):02d}.{rng.randint(0, 99)}"))
+        else:
+            codes.append(('CPT', f"{rng.randint(10000, 99999)}"))
+    return codes
+
+def scan(rules, code_type: str, code_value: str):
+    """Linear reference matcher"""
+    code = normalize_code(code_type, code_value)
+    matches = []
+    for rule_type, pattern in rules:
+        if rule_type != code_type:
+            continue
+        if pattern.endswith('.*'):
+            if code.startswith(normalize_code(rule_type, pattern[:-2])):
+                matches.append(pattern)
+        else:
+            low, high = pattern.split('-')
+            if len(code) == len(low) and low <= code <= high:
+                matches.append(pattern)
+    return matches
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark code trie lookups')
+    parser.add_argument('--rules', type=int, default=500)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = make_rules(args.rules, rng)
+    codes = make_codes(args.lookups, rng)
+
+    tries = {'ICD10': CodeTrie('ICD10'), 'CPT': CodeTrie('CPT')}
+    for code_type, pattern in rules:
+        tries[code_type].add(pattern, pattern)
+
+    for code_type, code_value in codes[:20000]:
+        assert sorted(tries[code_type].match(code_value)) == sorted(scan(rules, code_type, code_value)), code_value
+    print(f"Identical matches on {min(len(codes), 20000):,} codes "
+          f"({args.rules} rules, {sum(len(t) for t in tries.values()):,} trie keys)")
+
+    started = time.perf_counter()
+    for code_type, code_value in codes:
+        tries[code_type].match(code_value)
+    trie_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for code_type, code_value in codes:
+        scan(rules, code_type, code_value)
+    scan_seconds = time.perf_counter() - started
+
+    print(f"Lookups:      {args.lookups:>12,}")
+    print(f"linear scan:  {scan_seconds:>11.3f}s  ({args.lookups / scan_seconds:>12,.0f} lookups/s)")
+    print(f"code trie:    {trie_seconds:>11.3f}s  ({args.lookups / trie_seconds:>12,.0f} lookups/s)  "
+          f"{scan_seconds / trie_seconds:>5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for parsers/edi_dates.py against the old strptime helpers
+
+First checks that both produce identical output over every calendar day
+1960-2040 (D8, YYMMDD and RD8), a spread of times and a set of invalid
+values, then times a claims-like workload where a small set of service
+dates repeats many times.
+
+Usage:
+  python benchmarks/bench_dates.py --calls 1000000
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from parsers.edi_dates import parse_edi_date, parse_edi_datetime
+
+def legacy_parse_edi_datetime(date_str, time_str):
+    """strptime-based helper previously copied into each parser"""
+    try:
+        if len(date_str) == 8:
+            dt = datetime.strptime(date_str, '%Y%m%d')
+        elif len(date_str) == 6:
+            dt = datetime.strptime(date_str, '%y%m%d')
+        else:
+            return None
+
+        if time_str and len(time_str) >= 4:
+            hour = int(time_str[:2])
+            minute = int(time_str[2:4])
+            dt = dt.replace(hour=hour, minute=minute)
+
+        return dt.isoformat()
+    except:
+        return None
+
+def legacy_parse_edi_date(date_str):
+    """strptime-based helper previously copied into each parser"""
+    try:
+        if '-' in date_str:
+            date_str = date_str.split('-')[0]
+
+        if len(date_str) == 8:
+            return datetime.strptime(date_str, '%Y%m%d').date().isoformat()
+        elif len(date_str) == 6:
+            return datetime.strptime(date_str, '%y%m%d').date().isoformat()
+    except:
+        return None
+
+INVALID = ['', '2024', '20241301', '20240230', '20240000', '241301', 'ABCDEFGH', '2024-12-01',
+           '20241201-', '-20241201', '2024120A', '１２３４５６７８']
+TIMES = ['0000', '0923', '1445', '2359', '092359', '2400', '0960', '12', '', None, 'AB12']
+
+def check_identical():
+    """Compare outputs over a full calendar sweep; returns the number of values checked"""
+    checked = 0
+    day = date(1960, 1, 1)
+    while day < date(2041, 1, 1):
+        d8 = day.strftime('%Y%m%d')
+        values = [d8, day.strftime('%y%m%d'), f"{d8}-{(day + timedelta(days=3)).strftime('%Y%m%d')}"]
+        for value in values:
+            assert parse_edi_date(value) == legacy_parse_edi_date(value), value
+            checked += 1
+        for time_str in TIMES[day.toordinal() % 3::3]:
+            assert parse_edi_datetime(d8, time_str) == legacy_parse_edi_datetime(d8, time_str), (d8, time_str)
+            checked += 1
+        day += timedelta(days=1)
+
+    for value in INVALID:
+        assert parse_edi_date(value) == legacy_parse_edi_date(value), value
+        for time_str in TIMES:
+            assert parse_edi_datetime(value, time_str) == legacy_parse_edi_datetime(value, time_str), (value, time_str)
+        checked += 1 + len(TIMES)
+    return checked
+
+def timed(fn, values):
+    started = time.perf_counter()
+    for value in values:
+        fn(value)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark EDI date conversion')
+    parser.add_argument('--calls', type=int, default=1_000_000)
+    parser.add_argument('--distinct-dates', type=int, default=730, help='Distinct service dates in the workload')
+    args = parser.parse_args()
+
+    print(f"Identical output on {check_identical():,} values")
+
+    rng = random.Random(42)
+    pool = [(date(2023, 1, 1) + timedelta(days=i)).strftime('%Y%m%d') for i in range(args.distinct_dates)]
+    values = [rng.choice(pool) for _ in range(args.calls)]
+
+    parse_edi_date.cache_clear()
+    legacy = timed(legacy_parse_edi_date, values)
+    cached = timed(parse_edi_date, values)
+    uncached = timed(parse_edi_date.__wrapped__, values)
+
+    print(f"Calls:                 {args.calls:>12,} ({args.distinct_dates} distinct dates)")
+    print(f"strptime (legacy):     {legacy:>11.3f}s  ({args.calls / legacy:>12,.0f} calls/s)")
+    print(f"slicing, no cache:     {uncached:>11.3f}s  ({args.calls / uncached:>12,.0f} calls/s)  {legacy / uncached:>5.1f}x")
+    print(f"slicing + LRU cache:   {cached:>11.3f}s  ({args.calls / cached:>12,.0f} calls/s)  {legacy / cached:>5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Benchmark create_clinical_intent_events against the anti-join version it replaced
+
+Needs a scratch PostgreSQL database. Installs sql/00-consolidated-schema.sql
+and 02-seed-episode-definitions.sql in a cfe_bench_intent schema, seeds
+--rows eligibility, prior auth and Rx benefit source rows (10M by default,
+split 50/30/20) with generate_series, then times:
+
+  1. the previous function (correlated NOT EXISTS on an unindexed
+     event_source_id, inline drug-class CASE) on an empty clinical_intent_event
+  2. the current function's first (full) run
+  3. both again after adding --delta-pct new source rows: the previous
+     function rescans every source row, the current one reads from its
+     watermarks
+
+Runs of the previous function are rolled back; after each step both
+functions must have produced the same events (count and checksum).
+
+Usage:
+  python benchmarks/bench_intent_events.py --dsn postgresql://postgres@localhost/cfe_scratch --rows 10000000
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from typing import Tuple
+
+import psycopg2
+from psycopg2.extensions import AsIs, make_dsn
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'sql')
+SCHEMA = 'cfe_bench_intent'
+
+# create_clinical_intent_events as it was before the watermark rewrite
+LEGACY_SQL = """
+CREATE OR REPLACE FUNCTION create_clinical_intent_events_legacy() RETURNS INTEGER AS $$
+DECLARE
+  v_elig_count INTEGER;
+  v_pa_count INTEGER;
+  v_rx_count INTEGER;
+BEGIN
+  -- Create intent events from eligibility inquiries
+  WITH inserted AS (
+    INSERT INTO clinical_intent_event (
+      intent_event_id, member_id, episode_id, event_date, event_type,
+      event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
+    )
+    SELECT 
+      'INT-ELG-' || e.event_id,
+      e.member_id,
+      epm.episode_id,
+      e.inquiry_date,
+      'Eligibility_Inquiry',
+      e.event_id,
+      e.procedure_code,
+      e.diagnosis_code,
+      e.provider_npi,
+      CASE 
+        WHEN e.coverage_status = 'Covered' THEN 60.0
+        WHEN e.coverage_status = 'Prior Auth Required' THEN 75.0
+        ELSE 40.0
+      END
+    FROM eligibility_inquiry_event e
+    JOIN episode_procedure_map epm ON e.procedure_code = epm.procedure_code
+    WHERE NOT EXISTS (
+      SELECT 1 FROM clinical_intent_event ci 
+      WHERE ci.event_source_id = e.event_id
+    )
+    RETURNING 1
+  )
+  SELECT COUNT(*) INTO v_elig_count FROM inserted;
+  
+  -- Create intent events from prior auth requests AND referrals
+  WITH inserted AS (
+    INSERT INTO clinical_intent_event (
+      intent_event_id, member_id, episode_id, event_date, event_type,
+      event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
+    )
+    SELECT 
+      CASE 
+        WHEN pa.request_type = 'referral' THEN 'INT-REF-'
+        ELSE 'INT-PA-'
+      END || pa.auth_id,
+      pa.member_id,
+      epm.episode_id,
+      pa.request_date,
+      CASE 
+        WHEN pa.request_type = 'referral' THEN 'Referral'
+        ELSE 'Prior_Auth_Request'
+      END,
+      pa.auth_id,
+      pa.procedure_code,
+      pa.diagnosis_code,
+      pa.requesting_provider_npi,
+      CASE 
+        -- Referrals have lower signal strength than PA
+        WHEN pa.request_type = 'referral' AND pa.referred_provider_specialty IN ('Orthopedic Surgery', 'Pain Management') THEN 70.0
+        WHEN pa.request_type = 'referral' THEN 55.0
+        -- Prior auths have higher signal strength
+        WHEN pa.auth_status = 'approved' THEN 90.0
+        WHEN pa.auth_status = 'pended' THEN 70.0
+        WHEN pa.auth_status = 'requested' THEN 85.0
+        ELSE 50.0
+      END
+    FROM prior_auth_request pa
+    LEFT JOIN episode_procedure_map epm ON pa.procedure_code = epm.procedure_code
+    WHERE NOT EXISTS (
+      SELECT 1 FROM clinical_intent_event ci 
+      WHERE ci.event_source_id = pa.auth_id
+    )
+    -- For referrals without procedure codes, try to map via diagnosis
+    AND (epm.episode_id IS NOT NULL OR pa.request_type = 'referral')
+    RETURNING 1
+  )
+  SELECT COUNT(*) INTO v_pa_count FROM inserted;
+  
+  -- Create intent events from Rx benefit checks
+  -- Map drugs to episodes based on indication
+  WITH inserted AS (
+    INSERT INTO clinical_intent_event (
+      intent_event_id, member_id, episode_id, event_date, event_type,
+      event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
+    )
+    SELECT 
+      'INT-RX-' || rx.inquiry_id,
+      rx.member_id,
+      CASE 
+        WHEN rx.drug_class IN ('NSAID', 'Opioid', 'Viscosupplement') THEN 'TKA'
+        WHEN rx.drug_class IN ('Anticoagulant', 'Antiplatelet') THEN 'CABG'
+        WHEN rx.drug_class IN ('Chemotherapy', 'Antiemetic') THEN 'COLORECTAL_SURGERY'
+        ELSE NULL
+      END,
+      rx.inquiry_date,
+      'Rx_Benefit_Check',
+      rx.inquiry_id,
+      NULL,
+      NULL,
+      rx.prescriber_npi,
+      CASE 
+        WHEN rx.drug_class IN ('Viscosupplement', 'Opioid') THEN 80.0
+        WHEN rx.drug_class = 'NSAID' THEN 50.0
+        ELSE 40.0
+      END
+    FROM rx_benefit_inquiry rx
+    WHERE NOT EXISTS (
+      SELECT 1 FROM clinical_intent_event ci 
+      WHERE ci.event_source_id = rx.inquiry_id
+    )
+    AND CASE 
+      WHEN rx.drug_class IN ('NSAID', 'Opioid', 'Viscosupplement') THEN 'TKA'
+      WHEN rx.drug_class IN ('Anticoagulant', 'Antiplatelet') THEN 'CABG'
+      WHEN rx.drug_class IN ('Chemotherapy', 'Antiemetic') THEN 'COLORECTAL_SURGERY'
+      ELSE NULL
+    END IS NOT NULL
+    RETURNING 1
+  )
+  SELECT COUNT(*) INTO v_rx_count FROM inserted;
+  
+  RETURN v_elig_count + v_pa_count + v_rx_count;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Procedure codes the source rows draw from; the first four map to episodes
+PROCEDURE_MAP = [('TKA', '27447'), ('THA', '27130'), ('SPINAL_FUSION', '22612'), ('CABG', '33533')]
+PROCEDURE_CODES = [code for _, code in PROCEDURE_MAP] + ['99213', '73560', '20610', '97110']
+
+# Drug classes the Rx rows draw from; both functions map the first five
+# (the old CASE sent Chemotherapy/Antiemetic to a nonexistent episode)
+DRUG_CLASSES = ['NSAID', 'Opioid', 'Viscosupplement', 'Anticoagulant', 'Antiplatelet', 'Statin', 'Antihistamine']
+
+SEED_SQL = """
+INSERT INTO eligibility_inquiry_event (event_id, member_id, inquiry_date, procedure_code,
+                                       provider_npi, coverage_status, created_at)
+SELECT 'ELG-' || %(tag)s || i, 'M' || LPAD((i %% %(members)s + 1)::TEXT, 6, '0'),
+       TIMESTAMPTZ '2024-01-01' + (i %% 365) * INTERVAL '1 day',
+       (%(procedures)s::TEXT[])[i %% %(procedure_count)s + 1], '1234567890',
+       (ARRAY['Covered', 'Prior Auth Required', 'Not Covered'])[i %% 3 + 1], %(created_at)s
+FROM generate_series(1, %(eligibility)s) AS i;
+
+INSERT INTO prior_auth_request (auth_id, member_id, request_date, request_type, auth_status,
+                                procedure_code, requesting_provider_npi, referred_provider_specialty, created_at)
+SELECT 'PA-' || %(tag)s || i, 'M' || LPAD((i %% %(members)s + 1)::TEXT, 6, '0'),
+       TIMESTAMPTZ '2024-01-01' + (i %% 365) * INTERVAL '1 day',
+       CASE WHEN i %% 4 = 0 THEN 'referral' ELSE 'prior_authorization' END,
+       (ARRAY['requested', 'approved', 'pended', 'denied'])[i %% 4 + 1],
+       CASE WHEN i %% 8 = 0 THEN NULL ELSE (%(procedures)s::TEXT[])[i %% %(procedure_count)s + 1] END,
+       '1234567890', CASE WHEN i %% 3 = 0 THEN 'Orthopedic Surgery' END, %(created_at)s
+FROM generate_series(1, %(prior_auth)s) AS i;
+
+INSERT INTO rx_benefit_inquiry (inquiry_id, member_id, inquiry_date, drug_class, prescriber_npi, created_at)
+SELECT 'RX-' || %(tag)s || i, 'M' || LPAD((i %% %(members)s + 1)::TEXT, 6, '0'),
+       TIMESTAMPTZ '2024-01-01' + (i %% 365) * INTERVAL '1 day',
+       (%(drug_classes)s::TEXT[])[i %% %(drug_class_count)s + 1], '1234567890', %(created_at)s
+FROM generate_series(1, %(rx)s) AS i;
+"""
+
+CHECKSUM_SQL = """
+SELECT COUNT(*), COALESCE(SUM(hashtext(intent_event_id || '|' || COALESCE(episode_id, '') || '|' ||
+                                       event_type || '|' || signal_strength::TEXT)::BIGINT), 0)
+FROM clinical_intent_event
+"""
+
+def install(dsn: str, members: int):
+    with psycopg2.connect(dsn) as connection, connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+        for name in ('00-consolidated-schema.sql', '02-seed-episode-definitions.sql'):
+            with open(os.path.join(SQL_DIR, name)) as f:
+                cursor.execute(f.read())
+        cursor.execute(LEGACY_SQL)
+        cursor.executemany("INSERT INTO episode_procedure_map (episode_id, procedure_code) VALUES (%s, %s)",
+                           PROCEDURE_MAP)
+        cursor.execute("""
+            INSERT INTO member (member_id, first_name, last_name, date_of_birth)
+            SELECT 'M' || LPAD(i::TEXT, 6, '0'), 'Synthetic', 'Member', DATE '1960-01-01'
+            FROM generate_series(1, %s) AS i
+        """, (members,))
+
+def seed(dsn: str, rows: int, members: int, tag: str, created_at: str) -> float:
+    """Insert rows source rows; created_at is an SQL expression"""
+    started = time.perf_counter()
+    with psycopg2.connect(dsn) as connection, connection.cursor() as cursor:
+        cursor.execute(SEED_SQL, {
+            'tag': tag, 'members': members, 'created_at': AsIs(created_at),
+            'procedures': PROCEDURE_CODES, 'procedure_count': len(PROCEDURE_CODES),
+            'drug_classes': DRUG_CLASSES, 'drug_class_count': len(DRUG_CLASSES),
+            'eligibility': rows * 5 // 10, 'prior_auth': rows * 3 // 10, 'rx': rows * 2 // 10
+        })
+        cursor.execute("ANALYZE")
+    return time.perf_counter() - started
+
+def run(dsn: str, function: str, keep: bool) -> Tuple[float, int, Tuple[int, int]]:
+    """Call one generator function; returns (seconds, events created, table checksum)"""
+    connection = psycopg2.connect(dsn)
+    try:
+        with connection.cursor() as cursor:
+            started = time.perf_counter()
+            cursor.execute(f"SELECT {function}()")
+            created = cursor.fetchone()[0]
+            seconds = time.perf_counter() - started
+            cursor.execute(CHECKSUM_SQL)
+            checksum = cursor.fetchone()
+        if keep:
+            connection.commit()
+        else:
+            connection.rollback()
+    finally:
+        connection.close()
+    return seconds, created, checksum
+
+def compare(step: str, legacy: Tuple, current: Tuple):
+    assert legacy[2] == current[2], (step, legacy[2], current[2])
+    print(f"{step}:")
+    print(f"  previous (NOT EXISTS):    {legacy[0]:>9.2f}s  {legacy[1]:>11,} events")
+    print(f"  current (watermark):      {current[0]:>9.2f}s  {current[1]:>11,} events  "
+          f"{legacy[0] / max(current[0], 1e-9):>6.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark create_clinical_intent_events')
+    parser.add_argument('--dsn', required=True, help=f'Scratch database (schema {SCHEMA} is dropped)')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='Source rows across the three tables')
+    parser.add_argument('--members', type=int, default=500_000)
+    parser.add_argument('--delta-pct', type=float, default=1.0, help='New source rows for the incremental step')
+    args = parser.parse_args()
+
+    dsn = make_dsn(args.dsn, options=f"-c search_path={SCHEMA}")
+    install(args.dsn, args.members)
+    seconds = seed(dsn, args.rows, args.members, 'B', "NOW() - INTERVAL '1 day'")
+    print(f"Seeded {args.rows:,} source rows in {seconds:.1f}s")
+
+    legacy = run(dsn, 'create_clinical_intent_events_legacy', keep=False)
+    current = run(dsn, 'create_clinical_intent_events', keep=True)
+    compare("Full run (empty clinical_intent_event)", legacy, current)
+
+    delta = max(int(args.rows * args.delta_pct / 100), 10)
+    seed(dsn, delta, args.members, 'D', 'NOW()')
+    print(f"Added {delta:,} source rows")
+
+    legacy = run(dsn, 'create_clinical_intent_events_legacy', keep=False)
+    current = run(dsn, 'create_clinical_intent_events', keep=True)
+    compare("Incremental run", legacy, current)
+
+if __name__ == '__main__':
+    main()
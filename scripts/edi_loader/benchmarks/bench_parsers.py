@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark EDI parser throughput on synthetic X12 files
+
+Generates 270/278/837I/837P files with synthetic_x12.py and times every
+parser on them: the parsers package (parse_270_271, parse_278, parse_837),
+the inline load_to_supabase parsers, and the bare tokenizer as a floor.
+Each run happens in a fresh subprocess so peak RSS is per parser.
+
+Results (segments/s, MB/s, peak RSS, seconds) can be saved as a JSON
+baseline and compared against a later run. --scaling re-runs the 837
+parsers on files 1x, 2x, 4x and 8x the size with large transactions:
+throughput should stay flat (linear time) and iter_837's peak RSS should
+not grow (one claim in memory).
+
+Usage:
+  python benchmarks/bench_parsers.py --interchanges 20000 --save baseline.json
+  python benchmarks/bench_parsers.py --interchanges 20000 --compare baseline.json
+  python benchmarks/bench_parsers.py --interchanges 500 --scaling
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from synthetic_x12 import write_file
+
+# (benchmark name, parser, file kind)
+BENCHMARKS = [
+    ('tokenizer/270', 'tokenizer', '270'),
+    ('parsers.parse_270_271', 'parsers.parse_270_271', '270'),
+    ('load_to_supabase.parse_270_271', 'load_to_supabase.parse_270_271', '270'),
+    ('parsers.parse_278', 'parsers.parse_278', '278'),
+    ('load_to_supabase.parse_278', 'load_to_supabase.parse_278', '278'),
+    ('tokenizer/837I', 'tokenizer', '837I'),
+    ('parsers.parse_837/837I', 'parsers.parse_837', '837I'),
+    ('parsers.iter_837/837I', 'parsers.iter_837', '837I'),
+    ('load_to_supabase.parse_837/837I', 'load_to_supabase.parse_837', '837I'),
+    ('parsers.parse_837/837P', 'parsers.parse_837', '837P'),
+    ('load_to_supabase.parse_837/837P', 'load_to_supabase.parse_837', '837P'),
+]
+
+def resolve_parser(parser: str) -> Callable[[str], int]:
+    """Import a parser and wrap it to return the number of records it produces"""
+    if parser == 'tokenizer':
+        from parsers.x12_tokenizer import iter_segments
+        return lambda file_path: sum(1 for _ in iter_segments(file_path))
+
+    module_name, function_name = parser.rsplit('.', 1)
+    module = __import__(module_name, fromlist=[function_name])
+    function = getattr(module, function_name)
+
+    def run(file_path: str) -> int:
+        result = function(file_path)
+        if function_name == 'parse_837' and isinstance(result, tuple):
+            return len(result[0])
+        return sum(1 for _ in result)
+    return run
+
+def child(parser: str, file_path: str):
+    """Subprocess entry point: time one parser and print a JSON result"""
+    # Imports happen before the clock starts
+    run = resolve_parser(parser)
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    records = run(file_path)
+    seconds = time.perf_counter() - started
+    cpu_seconds = time.process_time() - cpu_started
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    print(json.dumps({'records': records, 'seconds': seconds, 'cpu_seconds': cpu_seconds,
+                      'peak_rss_mb': peak_mb}))
+
+def measure(parser: str, file_path: str, repeat: int) -> Dict:
+    """Best of `repeat` subprocess runs"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', parser, file_path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run['seconds'])
+    best['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    return best
+
+def count_segments(file_path: str) -> int:
+    """Number of segments in a file (the denominator for segments/s)"""
+    from parsers.x12_tokenizer import iter_segments
+    return sum(1 for _ in iter_segments(file_path))
+
+def prepare_files(work_dir: str, interchanges: int, seed: int) -> Dict[str, Dict]:
+    """Generate one synthetic file per kind (reused if already present)"""
+    files = {}
+    for kind in sorted({kind for _, _, kind in BENCHMARKS}):
+        path = os.path.join(work_dir, f"synthetic-{kind}-{interchanges}-{seed}.edi")
+        if not os.path.exists(path):
+            write_file(path, kind, interchanges, seed=seed)
+        files[kind] = {'path': path, 'bytes': os.path.getsize(path), 'segments': count_segments(path)}
+    return files
+
+def run_benchmarks(interchanges: int, seed: int, repeat: int, work_dir: str, only: List[str]) -> Dict:
+    files = prepare_files(work_dir, interchanges, seed)
+    results = {}
+
+    for name, parser, kind in BENCHMARKS:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        info = files[kind]
+        run = measure(parser, info['path'], repeat)
+        seconds = run['seconds'] or 1e-9
+        results[name] = {
+            'kind': kind,
+            'records': run['records'],
+            'segments': info['segments'],
+            'bytes': info['bytes'],
+            'seconds': round(run['seconds'], 4),
+            'cpu_seconds': round(run['cpu_seconds'], 4),
+            'segments_per_sec': round(info['segments'] / seconds),
+            'mb_per_sec': round(info['bytes'] / seconds / 1e6, 2),
+            'peak_rss_mb': round(run['peak_rss_mb'], 1)
+        }
+        print_result(name, results[name])
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'interchanges': interchanges,
+        'seed': seed,
+        'results': results
+    }
+
+# Parsers re-run by --scaling, and the file size multiples they run on
+SCALING_PARSERS = ['parsers.iter_837', 'parsers.parse_837', 'load_to_supabase.parse_837']
+SCALING_FACTORS = [1, 2, 4, 8]
+
+def run_scaling(interchanges: int, seed: int, work_dir: str, claims: int) -> Dict:
+    """Time the 837 parsers on growing files; flat segments/s means linear time"""
+    files = []
+    for factor in SCALING_FACTORS:
+        count = interchanges * factor
+        path = os.path.join(work_dir, f"scaling-837I-{count}-{claims}-{seed}.edi")
+        if not os.path.exists(path):
+            write_file(path, '837I', count, seed=seed, claims_per_transaction=claims)
+        files.append((factor, path, count_segments(path)))
+
+    print(f"\nScaling (837I, up to {claims} claims per transaction):")
+    scaling = {}
+    for parser in SCALING_PARSERS:
+        rows = []
+        for factor, path, segments in files:
+            run = measure(parser, path, 1)
+            rows.append({'factor': factor, 'segments': segments, 'seconds': round(run['seconds'], 4),
+                         'segments_per_sec': round(segments / (run['seconds'] or 1e-9)),
+                         'peak_rss_mb': round(run['peak_rss_mb'], 1)})
+            relative = rows[-1]['segments_per_sec'] / max(rows[0]['segments_per_sec'], 1)
+            print(f"  {parser:<28} {factor:>2}x {segments:>10,} seg  {run['seconds']:>8.3f}s  "
+                  f"{rows[-1]['segments_per_sec']:>10,} seg/s ({relative:>4.2f} of 1x)  "
+                  f"{run['peak_rss_mb']:>7.1f} MB RSS")
+        scaling[parser] = rows
+    return scaling
+
+def print_result(name: str, result: Dict):
+    print(f"{name:<34} {result['records']:>9,} rec  {result['seconds']:>8.3f}s  "
+          f"{result['segments_per_sec']:>10,} seg/s  {result['mb_per_sec']:>7.2f} MB/s  "
+          f"{result['peak_rss_mb']:>7.1f} MB RSS")
+
+def compare(report: Dict, baseline: Dict):
+    """Print per-benchmark change in time and peak RSS against a baseline"""
+    print(f"\nCompared with baseline from {baseline.get('created')} "
+          f"({baseline.get('interchanges')} interchanges):")
+    if baseline.get('interchanges') != report['interchanges']:
+        print("  ⚠ Different --interchanges; compare throughput, not seconds")
+
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            print(f"  {name:<34} (not in baseline)")
+            continue
+        speedup = result['segments_per_sec'] / max(before['segments_per_sec'], 1)
+        rss_change = result['peak_rss_mb'] - before['peak_rss_mb']
+        print(f"  {name:<34} {speedup:>6.2f}x throughput  {rss_change:>+8.1f} MB RSS")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark EDI parser throughput')
+    parser.add_argument('--interchanges', type=int, default=5000, help='Interchanges per synthetic file')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per parser (best time is kept)')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'cfe-bench'),
+                        help='Where synthetic files are generated and cached')
+    parser.add_argument('--only', action='append', default=[], help='Run benchmarks whose name contains this')
+    parser.add_argument('--save', help='Write results to this JSON baseline file')
+    parser.add_argument('--compare', help='Compare results against this JSON baseline file')
+    parser.add_argument('--scaling', action='store_true', help='Also check 837 parsers scale linearly')
+    parser.add_argument('--scaling-claims', type=int, default=50, help='Max claims per 837 transaction for --scaling')
+    parser.add_argument('--child', nargs=2, metavar=('PARSER', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    report = run_benchmarks(args.interchanges, args.seed, args.repeat, args.work_dir, args.only)
+    if args.scaling:
+        report['scaling'] = run_scaling(args.interchanges, args.seed, args.work_dir, args.scaling_claims)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Compare the COPY bulk load path with the row-at-a-time SQL functions
+
+Needs a scratch PostgreSQL database. Creates two schemas there
+(cfe_bench_rows, cfe_bench_copy), installs sql/00-consolidated-schema.sql
+in each and loads synthetic members through CopyDatabaseConnection
+(load_members_batch, as load_edi_data.py --copy does), then loads the same synthetic 837I claims
+through load_837_claim_header/load_837_claim_line (one SELECT per record)
+and through CopyDatabaseConnection, checks both schemas hold identical
+claim_header and claim_line rows and prints the timings.
+
+Usage:
+  python benchmarks/bench_pg_copy.py --dsn postgresql://postgres@localhost/cfe_scratch --interchanges 2000
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import tempfile
+import time
+
+import psycopg2
+from psycopg2.extensions import make_dsn
+
+from synthetic_x12 import write_file
+
+from parsers import parse_837
+from pg_copy import CopyDatabaseConnection, claim_header_row, claim_line_row
+
+SCHEMA_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          'sql', '00-consolidated-schema.sql')
+
+def schema_dsn(dsn: str, schema: str) -> str:
+    """DSN whose connections use only the given schema"""
+    return make_dsn(dsn, options=f"-c search_path={schema}")
+
+def install_schema(dsn: str, schema: str):
+    with psycopg2.connect(dsn) as connection, connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+        cursor.execute(f"SET search_path TO {schema}")
+        with open(SCHEMA_SQL) as f:
+            cursor.execute(f.read())
+
+def synthetic_members(members: int):
+    """members.json records for the member IDs synthetic_x12 draws from"""
+    for i in range(1, members + 1):
+        yield {'member_id': f"M{i:05d}", 'first_name': 'Synthetic', 'last_name': 'Member',
+               'date_of_birth': '1960-01-01', 'gender': 'U', 'enrollment_status': 'active'}
+
+def load_members(dsn: str, members: int):
+    with CopyDatabaseConnection(dsn) as db:
+        db.execute_function('load_members_batch', synthetic_members(members))
+
+def load_rows(dsn: str, headers, lines) -> float:
+    """One function call per record, as the SQL loader functions are written"""
+    started = time.perf_counter()
+    with psycopg2.connect(dsn) as connection, connection.cursor() as cursor:
+        for header in headers:
+            cursor.execute("SELECT load_837_claim_header(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                           claim_header_row(header))
+        for line in lines:
+            cursor.execute("SELECT load_837_claim_line(%s, %s, %s, %s, %s, %s)", claim_line_row(line))
+    return time.perf_counter() - started
+
+def load_copy(dsn: str, headers, lines, batch_size: int, connections: int) -> float:
+    started = time.perf_counter()
+    with CopyDatabaseConnection(dsn, batch_size, connections) as db:
+        db.execute_function('load_837_headers_batch', headers)
+        db.execute_function('load_837_lines_batch', lines)
+    return time.perf_counter() - started
+
+def table_rows(dsn: str, table: str, columns: str):
+    with psycopg2.connect(dsn) as connection, connection.cursor() as cursor:
+        cursor.execute(f"SELECT {columns} FROM {table} ORDER BY 1")
+        return cursor.fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark COPY bulk load against per-row SQL functions')
+    parser.add_argument('--dsn', required=True, help='Scratch database (schemas cfe_bench_* are dropped)')
+    parser.add_argument('--interchanges', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'cfe-bench'))
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    path = os.path.join(args.work_dir, f"synthetic-837I-{args.interchanges}-{args.seed}.edi")
+    if not os.path.exists(path):
+        write_file(path, '837I', args.interchanges, seed=args.seed)
+    headers, lines = parse_837(path)
+    print(f"{len(headers):,} claims, {len(lines):,} lines")
+
+    row_dsn = schema_dsn(args.dsn, 'cfe_bench_rows')
+    copy_dsn = schema_dsn(args.dsn, 'cfe_bench_copy')
+    for schema in ('cfe_bench_rows', 'cfe_bench_copy'):
+        install_schema(args.dsn, schema)
+        load_members(schema_dsn(args.dsn, schema), members=50000)
+
+    rows_seconds = load_rows(row_dsn, headers, lines)
+    copy_seconds = load_copy(copy_dsn, headers, lines, args.batch_size, args.connections)
+
+    for table, columns in [('claim_header', 'claim_id, member_id, claim_type, claim_status, service_from_date, '
+                                            'service_to_date, billing_provider_npi, facility_npi, total_charge_amount, '
+                                            'claim_frequency_code'),
+                           ('claim_line', 'line_id, claim_id, line_number, procedure_code, service_date, charge_amount')]:
+        assert table_rows(row_dsn, table, columns) == table_rows(copy_dsn, table, columns), table
+    print("Identical claim_header and claim_line rows")
+
+    records = len(headers) + len(lines)
+    print(f"Row-at-a-time functions: {rows_seconds:>8.2f}s  ({records / rows_seconds:>10,.0f} rec/s)")
+    print(f"COPY + set-based merge:  {copy_seconds:>8.2f}s  ({records / copy_seconds:>10,.0f} rec/s)  "
+          f"{rows_seconds / copy_seconds:>5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Synthetic X12 generator for parser benchmarks
+
+Scales the shapes of the files in sample-data/ (270 eligibility, 278 prior
+auth/referral, 837I institutional and 837P professional claims) to any
+number of interchanges. Member IDs, dates, codes and amounts vary, claims
+carry several service lines, and every envelope has consistent control
+numbers and segment counts, so the output parses like real partner files.
+
+Usage:
+  python benchmarks/synthetic_x12.py --kind 837I --interchanges 10000 --out /tmp/837I.edi
+"""
+
+import argparse
+import random
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List
+
+KINDS = ('270', '278', '837I', '837P')
+
+DIAGNOSIS_CODES = ['M1711', 'M1712', 'M170', 'M1611', 'M1612', 'M4806', 'M5416', 'M25561', 'E119', 'I2510']
+SURGICAL_CODES = ['27447', '27130', '29881', '22612', '63030', '27446', '29827']
+OFFICE_CODES = ['99203', '99204', '99213', '99214', '73560', '20610', '97110']
+REVENUE_CODES = ['0450', '0360', '0250', '0300', '0120', '0710', '0636']
+PAYERS = [('AETNA', '60054'), ('BCBS', 'PAYER02'), ('MEDICAID', 'PAYER03'), ('UNITED', '87726')]
+
+class Sequence:
+    """Monotonic control/identifier numbers shared across a generated file"""
+
+    def __init__(self):
+        self.value = 0
+
+    def next(self) -> int:
+        self.value += 1
+        return self.value
+
+def isa_date(day: date) -> str:
+    return day.strftime('%y%m%d')
+
+def d8(day: date) -> str:
+    return day.strftime('%Y%m%d')
+
+def interchange(rng: random.Random, control: int, functional_id: str, version: str,
+                transactions: List[List[str]], sender: str, receiver: str) -> List[str]:
+    """Wrap ST...SE bodies in a fixed-width ISA/GS envelope"""
+    day = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+    clock = f"{rng.randrange(24):02d}{rng.randrange(60):02d}"
+    segments = [
+        f"ISA*00*          *00*          *ZZ*{sender:<15}*ZZ*{receiver:<15}*{isa_date(day)}*{clock}*^*00501*{control:09d}*0*P*:",
+        f"GS*{functional_id}*{sender}*{receiver}*{d8(day)}*{clock}*{control}*X*{version}"
+    ]
+    for number, body in enumerate(transactions, 1):
+        st_control = f"{number:04d}"
+        segments.append(f"ST*{body[0]}*{st_control}*{version}")
+        segments.extend(body[1:])
+        # SE01 counts ST and SE themselves
+        segments.append(f"SE*{len(body) + 1}*{st_control}")
+    segments.append(f"GE*{len(transactions)}*{control}")
+    segments.append(f"IEA*1*{control:09d}")
+    return segments
+
+def member_id(rng: random.Random, members: int) -> str:
+    return f"M{rng.randrange(1, members + 1):05d}"
+
+def npi(rng: random.Random) -> str:
+    return str(rng.randrange(1000000000, 2000000000))
+
+def random_day(rng: random.Random) -> date:
+    return date(2024, 1, 1) + timedelta(days=rng.randrange(540))
+
+def transaction_270(rng: random.Random, ids: Sequence, members: int) -> List[str]:
+    reference = f"REQ{ids.next():07d}"
+    start = random_day(rng)
+    payer, payer_id = rng.choice(PAYERS)
+    return [
+        '270',
+        f"BHT*0022*13*{reference}*{d8(start)}*{rng.randrange(24):02d}{rng.randrange(60):02d}",
+        "HL*1**20*1",
+        f"NM1*PR*2*{payer}*****PI*{payer_id}",
+        "HL*2*1*21*1",
+        f"NM1*1P*1*SMITH*JOHN****XX*{npi(rng)}",
+        "HL*3*2*22*0",
+        f"TRN*1*{reference}*1SENDER123",
+        f"NM1*IL*1*DOE*PAT****MI*{member_id(rng, members)}",
+        f"DMG*D8*{d8(date(1940, 1, 1) + timedelta(days=rng.randrange(20000)))}*{rng.choice('FM')}",
+        f"DTP*291*RD8*{d8(start)}-{d8(start + timedelta(days=rng.choice([30, 60, 90])))}",
+        f"EQ*{'^'.join(rng.sample(['2', 'BT', '30', '1', '48', 'AL'], rng.randint(1, 3)))}"
+    ]
+
+def transaction_278(rng: random.Random, ids: Sequence, members: int) -> List[str]:
+    referral = rng.random() < 0.25
+    reference = f"{'REF' if referral else 'PA'}{ids.next():07d}"
+    day = random_day(rng)
+    payer, payer_id = rng.choice(PAYERS)
+    body = [
+        '278',
+        f"BHT*0007*13*{reference}*{d8(day)}*{rng.randrange(24):02d}{rng.randrange(60):02d}",
+        "HL*1**20*1",
+        f"NM1*X3*2*{payer}*****PI*{payer_id}",
+        "HL*2*1*21*1",
+        f"NM1*1P*1*SMITH*JOHN****XX*{npi(rng)}",
+        "N3*123 MAIN STREET",
+        "N4*NEW YORK*NY*10001",
+        "HL*3*2*22*1",
+        f"TRN*1*{reference}*1234567890",
+        f"NM1*IL*1*DOE*PAT****MI*{member_id(rng, members)}",
+        f"DMG*D8*{d8(date(1940, 1, 1) + timedelta(days=rng.randrange(20000)))}*{rng.choice('FM')}",
+        "HL*4*3*EV*1",
+        f"UM*{'AR' if referral else 'HS'}*I*{rng.choice(['1', '2', '3'])}::::3*RQ",
+        f"HI*{'*'.join('ABK:' + code for code in rng.sample(DIAGNOSIS_CODES, rng.randint(1, 3)))}",
+        f"DTP*472*RD8*{d8(day + timedelta(days=14))}-{d8(day + timedelta(days=104))}",
+        "HL*5*4*SS*0"
+    ]
+    if referral:
+        body.append(f"NM1*SJ*1*ROBERTS*DAVID****XX*{npi(rng)}")
+        body.append("REF*1G*BK")
+    else:
+        code = rng.choice(SURGICAL_CODES)
+        body.append(f"SV1*HC:{code}*{rng.randrange(15000, 60000)}*UN*1***1")
+    return body
+
+def transaction_837(rng: random.Random, ids: Sequence, members: int, institutional: bool,
+                    claims: int) -> List[str]:
+    """One billing provider with a subscriber loop per claim"""
+    payer, payer_id = rng.choice(PAYERS)
+    body = [
+        '837',
+        f"BHT*0019*00*BAT{ids.next():07d}*{d8(random_day(rng))}*1000*CH",
+        "NM1*41*2*METRO BILLING*****46*BILL001",
+        "PER*IC*BILLING DEPT*TE*2125551234",
+        f"NM1*40*2*{payer}*****46*{payer_id}",
+        "HL*1**20*1",
+        f"NM1*85*2*METRO {'HOSPITAL' if institutional else 'ORTHOPEDIC GROUP'}*****XX*{npi(rng)}",
+        "N3*123 MAIN ST",
+        "N4*NEW YORK*NY*10001",
+        "REF*EI*123456789"
+    ]
+
+    for hl in range(2, claims + 2):
+        day = random_day(rng)
+        claim_id = f"CLM{ids.next():09d}"
+        line_count = rng.randint(1, 6) if institutional else rng.randint(1, 4)
+        body += [
+            f"HL*{hl}*1*22*0",
+            f"SBR*P*18*GRP{rng.randrange(1000):03d}******{rng.choice(['12', 'BL', 'CI', 'MC'])}",
+            f"NM1*IL*1*DOE*PAT****MI*{member_id(rng, members)}",
+            "N3*456 ELM ST",
+            "N4*NEW YORK*NY*10002",
+            f"DMG*D8*{d8(date(1940, 1, 1) + timedelta(days=rng.randrange(20000)))}*{rng.choice('FM')}",
+            f"NM1*PR*2*{payer}*****PI*{payer_id}"
+        ]
+
+        if institutional:
+            charges = [rng.randrange(500, 40000) for _ in range(line_count)]
+            body += [
+                f"CLM*{claim_id}*{sum(charges)}***{rng.choice(['11', '13', '21'])}:A:1*Y*A*Y*Y",
+                f"DTP*096*TM*{rng.randrange(24):02d}{rng.randrange(60):02d}",
+                f"DTP*434*RD8*{d8(day)}-{d8(day + timedelta(days=rng.randrange(5)))}",
+                f"HI*ABK:{rng.choice(DIAGNOSIS_CODES)}*ABF:{rng.choice(DIAGNOSIS_CODES)}",
+            ]
+            for line, charge in enumerate(charges, 1):
+                code = rng.choice(SURGICAL_CODES if line == 1 else OFFICE_CODES)
+                body += [
+                    f"LX*{line}",
+                    f"SV2*{rng.choice(REVENUE_CODES)}*HC:{code}*{charge}*UN*1",
+                    f"DTP*472*D8*{d8(day)}"
+                ]
+        else:
+            charges = [rng.randrange(50, 900) for _ in range(line_count)]
+            body += [
+                f"CLM*{claim_id}*{sum(charges)}***11:B:1*Y*A*Y*Y",
+                f"DTP*431*D8*{d8(day - timedelta(days=rng.randrange(400)))}",
+                f"REF*D9*PA{rng.randrange(10 ** 6):06d}",
+                f"HI*ABK:{rng.choice(DIAGNOSIS_CODES)}*ABF:{rng.choice(DIAGNOSIS_CODES)}",
+            ]
+            for line, charge in enumerate(charges, 1):
+                body += [
+                    f"LX*{line}",
+                    f"SV1*HC:{rng.choice(OFFICE_CODES)}*{charge}*UN*1***1",
+                    f"DTP*472*D8*{d8(day)}"
+                ]
+    return body
+
+def generate(kind: str, interchanges: int, seed: int = 42, members: int = 50000,
+             transactions_per_interchange: int = 1, claims_per_transaction: int = 5) -> Iterator[str]:
+    """
+    Yield the segments of a synthetic file, one interchange at a time
+
+    Args:
+        kind: One of KINDS
+        interchanges: Number of ISA...IEA interchanges
+        seed: Random seed (same seed, same file)
+        members: Size of the member ID pool
+        transactions_per_interchange: ST...SE sets per interchange
+        claims_per_transaction: Maximum subscriber/claim loops per 837 transaction
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind}. Choose from: {', '.join(KINDS)}")
+
+    rng = random.Random(seed)
+    ids = Sequence()
+
+    builders: Dict[str, Callable[[], List[str]]] = {
+        '270': lambda: transaction_270(rng, ids, members),
+        '278': lambda: transaction_278(rng, ids, members),
+        '837I': lambda: transaction_837(rng, ids, members, True, rng.randint(1, claims_per_transaction)),
+        '837P': lambda: transaction_837(rng, ids, members, False, rng.randint(1, claims_per_transaction))
+    }
+    functional_id = {'270': ('HS', '005010X279A1'), '278': ('HI', '005010X217'),
+                     '837I': ('HC', '005010X223A2'), '837P': ('HC', '005010X222A1')}[kind]
+
+    for control in range(1, interchanges + 1):
+        transactions = [builders[kind]() for _ in range(transactions_per_interchange)]
+        yield from interchange(rng, control, functional_id[0], functional_id[1], transactions,
+                               f"SENDER{control % 50:03d}", 'PAYER01')
+
+def write_file(path: str, kind: str, interchanges: int, **options) -> int:
+    """Write a synthetic file (one segment per line) and return its segment count"""
+    count = 0
+    with open(path, 'w') as f:
+        for segment in generate(kind, interchanges, **options):
+            f.write(segment)
+            f.write('~\n')
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic X12 files shaped like sample-data/')
+    parser.add_argument('--kind', choices=KINDS, required=True)
+    parser.add_argument('--interchanges', type=int, default=1000)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--members', type=int, default=50000, help='Size of the member ID pool')
+    parser.add_argument('--transactions', type=int, default=1, help='ST...SE sets per interchange')
+    parser.add_argument('--claims', type=int, default=5, help='Maximum claims per 837 transaction')
+    args = parser.parse_args()
+
+    segments = write_file(args.out, args.kind, args.interchanges, seed=args.seed, members=args.members,
+                          transactions_per_interchange=args.transactions,
+                          claims_per_transaction=args.claims)
+    print(f"Wrote {segments:,} segments ({args.interchanges:,} interchanges) to {args.out}")
+
+if __name__ == '__main__':
+    main()
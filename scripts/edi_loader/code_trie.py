@@ -0,0 +1,201 @@
+"""
+Normalized code trie for episode rules
+
+Rules can name a single code ('M17.11'), a code family ('M17.*', 'M17%')
+or, for CPT/HCPCS/revenue codes, an inclusive range ('27440-27447').
+Codes are normalized before insertion and lookup, so dotted and undotted
+ICD-10 forms ('M17.11' / 'M1711') match each other. A lookup walks the
+code one character at a time and collects every family and exact rule on
+the way, so it costs O(code length) no matter how many rules are loaded.
+
+Ranges are decomposed into the fewest prefixes that cover them
+(27400-27599 -> '274', '275'), so they cost no more than family rules.
+"""
+
+from typing import Any, Iterator, List, Optional, Tuple
+
+# Code types whose rules may be written as 'LOW-HIGH' ranges (NDCs contain dashes)
+RANGE_CODE_TYPES = {'CPT', 'HCPCS', 'Revenue', 'DRG'}
+
+# Largest range expanded code by code when it can't be expressed as prefixes
+MAX_RANGE_EXPANSION = 10000
+
+FAMILY_SUFFIXES = ('.*', '*', '%')
+
+ALPHA = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+def normalize_code(code_type: Optional[str], code_value: str) -> str:
+    """
+    Canonical form of a code for matching
+
+    ICD codes drop the dot, NDCs drop dashes, revenue codes are zero-padded
+    to four digits; everything is stripped and upper-cased.
+    """
+    code = code_value.strip().upper()
+    if code_type in ('ICD10', 'ICD9'):
+        return code.replace('.', '')
+    if code_type == 'NDC':
+        return code.replace('-', '')
+    if code_type == 'Revenue' and code.isdigit():
+        return code.zfill(4)
+    return code
+
+def parse_pattern(code_type: Optional[str], pattern: str) -> List[Tuple[str, bool]]:
+    """
+    Expand a rule pattern into (normalized key, is_family) entries
+
+    Args:
+        code_type: Rule code_type (controls normalization and range support)
+        pattern: Exact code, family ('M17.*', 'M17*', 'M17%') or range ('27440-27447')
+
+    Returns:
+        Keys to insert; is_family keys match every code that starts with them
+    """
+    pattern = pattern.strip()
+    for suffix in FAMILY_SUFFIXES:
+        if pattern.endswith(suffix):
+            return [(normalize_code(code_type, pattern[:-len(suffix)]), True)]
+
+    if code_type in RANGE_CODE_TYPES and '-' in pattern:
+        low, _, high = pattern.partition('-')
+        return range_keys(normalize_code(code_type, low), normalize_code(code_type, high))
+
+    return [(normalize_code(code_type, pattern), False)]
+
+def range_keys(low: str, high: str) -> List[Tuple[str, bool]]:
+    """Cover an inclusive code range with family prefixes and exact codes"""
+    if len(low) != len(high) or low > high:
+        raise ValueError(f"Invalid code range {low}-{high}")
+
+    common = 0
+    while common < len(low) and low[common] == high[common]:
+        common += 1
+    prefix = low[:common]
+    low_rest, high_rest = low[common:], high[common:]
+
+    if not low_rest:
+        return [(low, False)]
+
+    if low_rest.isdigit() and high_rest.isdigit():
+        return [(prefix + key, family) for key, family in _decompose(low_rest, high_rest)]
+
+    # e.g. Category II codes 0001F-0005F: a numeric core with the same letter suffix
+    core_low, core_high = low_rest.rstrip(ALPHA), high_rest.rstrip(ALPHA)
+    suffix = low_rest[len(core_low):]
+    if suffix and suffix == high_rest[len(core_high):] and core_low.isdigit() and core_high.isdigit() \
+            and len(core_low) == len(core_high):
+        count = int(core_high) - int(core_low) + 1
+        if count > MAX_RANGE_EXPANSION:
+            raise ValueError(f"Code range {low}-{high} is too large to expand")
+        width = len(core_low)
+        return [(f"{prefix}{value:0{width}d}{suffix}", False)
+                for value in range(int(core_low), int(core_high) + 1)]
+
+    raise ValueError(f"Unsupported code range {low}-{high}")
+
+def _decompose(low: str, high: str) -> Iterator[Tuple[str, bool]]:
+    """Minimal prefixes covering equal-length digit strings low..high"""
+    if low == high:
+        yield low, False
+        return
+    if low.strip('0') == '' and high.strip('9') == '' and low:
+        # Every code of this length: the empty prefix within the parent
+        yield '', True
+        return
+
+    width = len(low) - 1
+    first, last = int(low[0]), int(high[0])
+    if first == last:
+        for key, family in _decompose(low[1:], high[1:]):
+            yield low[0] + key, family
+        return
+
+    # Partial first digit, whole digits in between, partial last digit
+    for key, family in _decompose(low[1:], '9' * width):
+        yield low[0] + key, family
+    for digit in range(first + 1, last):
+        yield str(digit), width > 0
+    for key, family in _decompose('0' * width, high[1:]):
+        yield high[0] + key, family
+
+class _Node:
+    __slots__ = ('children', 'exact', 'family')
+
+    def __init__(self):
+        self.children = {}
+        self.exact = []
+        self.family = []
+
+class CodeTrie:
+    """Trie of normalized codes mapping to rule payloads"""
+
+    def __init__(self, code_type: Optional[str] = None):
+        """
+        Args:
+            code_type: Code type of every pattern in this trie (e.g. 'ICD10')
+        """
+        self.code_type = code_type
+        self.root = _Node()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, pattern: str, value: Any):
+        """Insert a rule payload under an exact code, family or range pattern"""
+        for key, family in parse_pattern(self.code_type, pattern):
+            node = self.root
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+            (node.family if family else node.exact).append(value)
+            self.size += 1
+
+    def match(self, code_value: str) -> List[Any]:
+        """Every payload whose pattern matches the code (family matches first)"""
+        node = self.root
+        matches = list(node.family)
+        for char in normalize_code(self.code_type, code_value):
+            node = node.children.get(char)
+            if node is None:
+                return matches
+            matches.extend(node.family)
+        matches.extend(node.exact)
+        return matches
+
+    def __contains__(self, code_value: str) -> bool:
+        return bool(self.match(code_value))
+
+    @classmethod
+    def from_patterns(cls, patterns, code_type: Optional[str] = None) -> 'CodeTrie':
+        """Build a membership trie (payload True) from a list of patterns"""
+        trie = cls(code_type)
+        for pattern in patterns:
+            trie.add(pattern, True)
+        return trie
+
+    def like_patterns(self, wildcard: str = '%') -> List[str]:
+        """
+        SQL LIKE patterns that select a superset of the trie's codes in
+        their stored form (dotted and undotted ICD codes both)
+
+        Rows fetched with these patterns should still be checked with match().
+        """
+        patterns = []
+
+        def walk(node: _Node, path: str):
+            if node.family:
+                patterns.extend(p + wildcard for p in self.stored_forms(path))
+                return
+            if node.exact:
+                patterns.extend(self.stored_forms(path))
+            for char, child in node.children.items():
+                walk(child, path + char)
+
+        walk(self.root, '')
+        return patterns
+
+    def stored_forms(self, key: str) -> List[str]:
+        """Forms a normalized key may be stored as (ICD codes carry a dot after 3 characters)"""
+        if self.code_type in ('ICD10', 'ICD9') and len(key) > 3:
+            return [key, f"{key[:3]}.{key[3:]}"]
+        return [key]
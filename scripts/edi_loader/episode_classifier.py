@@ -0,0 +1,181 @@
+"""
+In-process episode classification
+
+Loads episode_code_mapping once and compiles it into one CodeTrie per
+(client_id, code_type), so parsed 270/278/837 records can be classified in
+bulk at ingest time without a database round trip per record. code_value
+may be an exact code, a family ('M17.*') or a CPT range ('27440-27447');
+dotted and undotted ICD-10 codes match each other.
+
+Scoring matches the app/api/rules/classify-episode route: each matched
+code contributes its signal_strength (default 50), x1.5 for primary codes
+and x1.3 for CPT codes; episode scores are normalized by the square root
+of their match count and confidence is min(100, score / 2).
+"""
+
+import math
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from code_trie import CodeTrie
+
+DEFAULT_CLIENT_ID = 'default'
+DEFAULT_SIGNAL_STRENGTH = 50.0
+
+# Record fields holding classifiable codes, and the code_type they map to
+CODE_FIELDS = {
+    'procedure_codes': 'CPT',
+    'procedure_code': 'CPT',
+    'diagnosis_codes': 'ICD10',
+    'diagnosis_code': 'ICD10',
+    'revenue_codes': 'Revenue',
+    'revenue_code': 'Revenue',
+    'ndc_code': 'NDC',
+    # Rx rules are keyed on drug class names (e.g. 'NSAID') under NDC
+    'drug_class': 'NDC'
+}
+
+# Record fields tried, in order, for the date used to check rule effective dates
+DATE_FIELDS = ('service_date', 'from_date', 'service_from_date', 'request_date', 'request_ts',
+               'inquiry_date', 'inquiry_ts', 'event_date')
+
+class CodeRule(NamedTuple):
+    """One compiled episode_code_mapping row"""
+    episode_id: str
+    code_type: str
+    code_value: str
+    is_primary: bool
+    signal_strength: float
+    weight: float
+    effective_date: Optional[str]
+    expiration_date: Optional[str]
+
+class Classification(NamedTuple):
+    """Best episode for a record (episode_id None when nothing matched)"""
+    episode_id: Optional[str]
+    confidence_score: int
+    matched_codes: List[Dict]
+
+UNCLASSIFIED = Classification(None, 0, [])
+
+class EpisodeClassifier:
+    """Compiled episode_code_mapping tries"""
+
+    def __init__(self, mappings: Iterable[Dict]):
+        """
+        Args:
+            mappings: episode_code_mapping rows (episode_id, code_type,
+                code_value, is_primary, signal_strength, effective_date,
+                expiration_date, client_id)
+        """
+        self.tries: Dict[Tuple[str, str], CodeTrie] = {}
+        self.rule_count = 0
+        for row in mappings:
+            key = (row.get('client_id') or DEFAULT_CLIENT_ID, row['code_type'])
+            if key not in self.tries:
+                self.tries[key] = CodeTrie(row['code_type'])
+            self.tries[key].add(row['code_value'], self.compile_rule(row))
+            self.rule_count += 1
+
+    def __len__(self) -> int:
+        return self.rule_count
+
+    @staticmethod
+    def compile_rule(row: Dict) -> CodeRule:
+        """Precompute a rule's score contribution"""
+        signal_strength = float(row.get('signal_strength') or DEFAULT_SIGNAL_STRENGTH)
+        weight = signal_strength
+        if row.get('is_primary'):
+            weight *= 1.5
+        if row['code_type'] == 'CPT':
+            weight *= 1.3
+        return CodeRule(
+            episode_id=row['episode_id'],
+            code_type=row['code_type'],
+            code_value=row['code_value'],
+            is_primary=bool(row.get('is_primary')),
+            signal_strength=signal_strength,
+            weight=weight,
+            effective_date=str(row['effective_date'])[:10] if row.get('effective_date') else None,
+            expiration_date=str(row['expiration_date'])[:10] if row.get('expiration_date') else None
+        )
+
+    def lookup(self, code_type: str, code_value: str, client_id: str = DEFAULT_CLIENT_ID,
+               as_of: Optional[str] = None) -> List[CodeRule]:
+        """Rules for one code that are in effect on as_of (ISO date, default today)"""
+        trie = self.tries.get((client_id, code_type))
+        if trie is None:
+            return []
+        rules = trie.match(code_value)
+        as_of = as_of or date.today().isoformat()
+        return [rule for rule in rules
+                if (rule.effective_date is None or rule.effective_date <= as_of)
+                and (rule.expiration_date is None or rule.expiration_date > as_of)]
+
+    def classify(self, codes: Dict[str, Iterable[str]], client_id: str = DEFAULT_CLIENT_ID,
+                 as_of: Optional[str] = None) -> Classification:
+        """
+        Pick the best episode for a set of codes
+
+        Args:
+            codes: code_type -> code values (e.g. {'CPT': ['27447'], 'ICD10': ['M17.11']})
+            client_id: Client whose rules apply
+            as_of: ISO date the rules must be in effect on (default today)
+
+        Returns:
+            Classification with the winning episode, its confidence and matched codes
+        """
+        scores = defaultdict(float)
+        matched = defaultdict(list)
+
+        for code_type, values in codes.items():
+            for code_value in set(values):
+                if not code_value:
+                    continue
+                for rule in self.lookup(code_type, code_value, client_id, as_of):
+                    scores[rule.episode_id] += rule.weight
+                    matched[rule.episode_id].append(rule)
+
+        best_episode = None
+        best_score = 0.0
+        for episode_id, score in scores.items():
+            normalized = score / math.sqrt(len(matched[episode_id]))
+            if normalized > best_score:
+                best_episode, best_score = episode_id, normalized
+
+        if best_episode is None:
+            return UNCLASSIFIED
+
+        return Classification(
+            episode_id=best_episode,
+            confidence_score=round(min(100.0, best_score / 2)),
+            matched_codes=[{
+                'code_type': rule.code_type,
+                'code_value': rule.code_value,
+                'signal_strength': rule.signal_strength,
+                'is_primary': rule.is_primary
+            } for rule in matched[best_episode]]
+        )
+
+    def classify_record(self, record: Dict, client_id: str = DEFAULT_CLIENT_ID,
+                        extra_codes: Optional[Dict[str, Iterable[str]]] = None) -> Classification:
+        """Classify one parsed record (278 PA, 837 claim line, Rx inquiry, ...) by its code fields"""
+        codes = defaultdict(list)
+        for field, code_type in CODE_FIELDS.items():
+            value = record.get(field)
+            if not value:
+                continue
+            if isinstance(value, str):
+                codes[code_type].append(value)
+            else:
+                codes[code_type].extend(value)
+        for code_type, values in (extra_codes or {}).items():
+            codes[code_type].extend(values)
+
+        as_of = next((str(record[field])[:10] for field in DATE_FIELDS if record.get(field)), None)
+        return self.classify(codes, client_id, as_of)
+
+    def classify_records(self, records: Iterable[Dict], client_id: str = DEFAULT_CLIENT_ID) -> List[Classification]:
+        """Classify a batch of parsed records"""
+        return [self.classify_record(record, client_id) for record in records]
@@ -0,0 +1,138 @@
+"""
+Monthly forecast and cost cube for the dashboard
+
+Rolls clinical outcomes and predictions up to one row per (episode_id,
+region, network, plan_type, month), which is what the dashboard forecast
+and cost projection APIs read instead of filtering members and scanning
+clinical_outcome_event / prediction_result on every request.
+
+A refresh rebuilds whole dimension groups (region, network, plan_type):
+the loader passes in every outcome and prediction of the members in the
+groups touched by a load, and cells of those groups that no longer have
+any data are written back as zeros rather than left stale.
+
+Actual volume counts non-voided outcomes by procedure month; actual cost
+is their total_cost. Predicted volume counts each member's latest
+prediction per episode with probability_score >= MIN_PROBABILITY by
+predicted event month; predicted cost is predicted_cost. Either cost
+falls back to the episode's average_cost when missing.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+UNKNOWN = 'Unknown'
+
+# Predictions below this probability are not counted (matches the dashboard)
+MIN_PROBABILITY = 0.5
+
+# member columns the cube is sliced by, in key order
+DIMENSION_COLUMNS = ('geographic_region', 'network', 'plan_type')
+
+KEY_COLUMNS = ('episode_id', 'region', 'network', 'plan_type', 'month')
+
+Dimensions = Tuple[str, str, str]
+
+def member_dimensions(member: Dict) -> Dimensions:
+    """(region, network, plan_type) of a member row, 'Unknown' when missing"""
+    return tuple(member.get(column) or UNKNOWN for column in DIMENSION_COLUMNS)
+
+def month_start(value: Optional[str]) -> Optional[str]:
+    """First day of the month of an ISO date/timestamp ('2024-07-15' -> '2024-07-01')"""
+    if not value or len(value) < 7:
+        return None
+    return f"{value[:7]}-01"
+
+class ForecastCube:
+    """Accumulates monthly volume and cost cells for a set of members"""
+
+    def __init__(self, dimensions: Dict[str, Dimensions], average_costs: Dict[str, Optional[float]],
+                 groups: Optional[Set[Dimensions]] = None):
+        """
+        Args:
+            dimensions: (region, network, plan_type) per member_id; members
+                not in the map are counted under 'Unknown'
+            average_costs: episode_definition.average_cost per episode_id
+            groups: Dimension groups being rebuilt; None rebuilds the whole cube
+        """
+        self.dimensions = dimensions
+        self.average_costs = average_costs
+        self.groups = groups
+
+        # key -> [actual_volume, actual_cost]
+        self._actuals = defaultdict(lambda: [0, 0.0])
+        # (member_id, episode_id) -> (prediction_date, month, cost)
+        self._predictions = {}
+
+    def _dimensions(self, member_id: Optional[str]) -> Dimensions:
+        return self.dimensions.get(member_id) or (UNKNOWN, UNKNOWN, UNKNOWN)
+
+    def _cost(self, value, episode_id: str) -> float:
+        if value is None:
+            value = self.average_costs.get(episode_id)
+        return float(value or 0)
+
+    def add_outcome(self, outcome: Dict):
+        """Count one clinical_outcome_event row (voided outcomes are skipped)"""
+        month = month_start(outcome.get('procedure_date'))
+        if not month or not outcome.get('episode_id') or outcome.get('is_voided'):
+            return
+        key = (outcome['episode_id'], *self._dimensions(outcome.get('member_id')), month)
+        cell = self._actuals[key]
+        cell[0] += 1
+        cell[1] += self._cost(outcome.get('total_cost'), outcome['episode_id'])
+
+    def add_prediction(self, prediction: Dict):
+        """Keep a prediction_result row if it is the member's latest for its episode"""
+        month = month_start(prediction.get('predicted_event_date'))
+        if not month or not prediction.get('episode_id'):
+            return
+        probability = prediction.get('probability_score')
+        if probability is None or float(probability) < MIN_PROBABILITY:
+            return
+
+        key = (prediction.get('member_id'), prediction['episode_id'])
+        prediction_date = prediction.get('prediction_date') or ''
+        current = self._predictions.get(key)
+        if current is None or prediction_date >= current[0]:
+            self._predictions[key] = (prediction_date, month,
+                                      self._cost(prediction.get('predicted_cost'), prediction['episode_id']))
+
+    def cells(self) -> Dict[Tuple, List]:
+        """key -> [actual_volume, actual_cost, predicted_volume, predicted_cost]"""
+        cells = defaultdict(lambda: [0, 0.0, 0, 0.0])
+        for key, (volume, cost) in self._actuals.items():
+            cells[key][0] = volume
+            cells[key][1] = cost
+        for (member_id, episode_id), (_, month, cost) in self._predictions.items():
+            cell = cells[(episode_id, *self._dimensions(member_id), month)]
+            cell[2] += 1
+            cell[3] += cost
+        return cells
+
+    def rows(self, existing: Iterable[Dict] = (), updated_at: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Yield forecast_monthly_aggregate rows
+
+        Args:
+            existing: Rows (at least the key columns) already in the table;
+                those in a refreshed group without data are yielded as zeros
+            updated_at: Timestamp stamped on every row
+        """
+        cells = self.cells()
+        for row in existing:
+            key = tuple(row[column] for column in KEY_COLUMNS)
+            if key not in cells and (self.groups is None or key[1:4] in self.groups):
+                cells[key] = [0, 0, 0, 0]
+
+        for key, (actual_volume, actual_cost, predicted_volume, predicted_cost) in cells.items():
+            row = dict(zip(KEY_COLUMNS, key))
+            row.update({
+                'actual_volume': actual_volume,
+                'actual_cost': round(actual_cost, 2),
+                'predicted_volume': predicted_volume,
+                'predicted_cost': round(predicted_cost, 2)
+            })
+            if updated_at:
+                row['updated_at'] = updated_at
+            yield row
@@ -0,0 +1,159 @@
+"""
+Ingest ledger for incremental loads
+
+Records which interchanges (file content hash + ISA13 control number) and
+which whole files have already been loaded, in a small SQLite database next
+to the loader. Re-running a load against the same inputs skips everything
+the ledger has seen, so only new interchanges are parsed and written.
+
+Also keeps high-water marks (e.g. the latest source created_at already
+turned into intent events) for derivation steps that run after the load.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+DEFAULT_LEDGER_PATH = os.environ.get('CFE_LEDGER_PATH', 'ingest_ledger.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_interchange (
+    file_hash TEXT NOT NULL,
+    isa_control_number TEXT NOT NULL,
+    sender_id TEXT,
+    transaction_set TEXT,
+    file_path TEXT,
+    loaded_at TEXT NOT NULL,
+    PRIMARY KEY (file_hash, isa_control_number)
+);
+
+CREATE TABLE IF NOT EXISTS processed_file (
+    file_hash TEXT PRIMARY KEY,
+    file_path TEXT,
+    loaded_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS watermark (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class InterchangeFilter:
+    """
+    interchange_filter for SegmentTokenizer that skips already-loaded interchanges
+
+    Records the (ISA13, sender) of every interchange it lets through, so they
+    can be marked loaded once their rows are written. Plain data only, so it
+    can be sent to worker processes.
+    """
+
+    def __init__(self, skip: Iterable[str] = ()):
+        self.skip = frozenset(skip)
+        self.read: List[Tuple[str, Optional[str]]] = []
+        self.skipped = 0
+
+    def __call__(self, isa_fields: List[str]) -> bool:
+        control_number = isa_fields[13].strip() if len(isa_fields) > 13 else ''
+        if control_number in self.skip:
+            self.skipped += 1
+            return False
+        sender_id = isa_fields[6].strip() if len(isa_fields) > 6 else None
+        self.read.append((control_number, sender_id))
+        return True
+
+class IngestLedger:
+    """SQLite record of the interchanges and files already loaded, plus high-water marks"""
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH):
+        self.path = path
+        # Shared by pipeline stages running on different threads; every
+        # statement runs under the lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self) -> 'IngestLedger':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def loaded_interchanges(self, file_hash: str) -> Set[str]:
+        """ISA13 control numbers already loaded from a file with this hash"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT isa_control_number FROM processed_interchange WHERE file_hash = ?",
+                (file_hash,)
+            )
+            return {row[0] for row in rows}
+
+    def interchange_filter(self, file_hash: str) -> InterchangeFilter:
+        """Tokenizer filter that skips this file's loaded interchanges"""
+        return InterchangeFilter(self.loaded_interchanges(file_hash))
+
+    def mark_interchanges(self, file_hash: str, file_path: str, transaction_set: str,
+                          interchanges: Iterable[Tuple[str, Optional[str]]]):
+        """
+        Record interchanges as loaded
+
+        Args:
+            file_hash: Content hash of the source file
+            file_path: Source file (informational)
+            transaction_set: ST01 of the interchange contents (e.g. '837')
+            interchanges: (isa_control_number, sender_id) pairs
+        """
+        loaded_at = datetime.now().isoformat()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO processed_interchange "
+                "(file_hash, isa_control_number, sender_id, transaction_set, file_path, loaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(file_hash, control, sender, transaction_set, file_path, loaded_at)
+                 for control, sender in interchanges]
+            )
+
+    def is_file_loaded(self, file_hash: str) -> bool:
+        """Check whether a non-X12 input (members/Rx JSON) was already loaded"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM processed_file WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+        return row is not None
+
+    def mark_file(self, file_hash: str, file_path: str):
+        """Record a non-X12 input as loaded"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO processed_file (file_hash, file_path, loaded_at) VALUES (?, ?, ?)",
+                (file_hash, file_path, datetime.now().isoformat())
+            )
+
+    def get_watermark(self, name: str) -> Optional[str]:
+        """Return a stored high-water mark (None if never set)"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM watermark WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, name: str, value: str):
+        """Store a high-water mark, replacing the previous one"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermark (name, value, updated_at) VALUES (?, ?, ?)",
+                (name, value, datetime.now().isoformat())
+            )
@@ -11,13 +11,79 @@ Processes EDI files in the correct sequence to maintain referential integrity:
 import os
 import sys
 import json
+import glob
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional, Tuple
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from parsers import parse_270_271, parse_278, parse_837
+from parsers import parse_270_271, parse_278, parse_837, parse_837_columnar
+from parsers.x12_tokenizer import find_interchange_offsets, sniff_transaction_set
+from ledger import DEFAULT_LEDGER_PATH, IngestLedger, InterchangeFilter, hash_file
+from member_cache import DEFAULT_MEMBER_CACHE_PATH, MemberDimensionCache
+from metrics import RunMetrics, configure_profiling, peak_rss_bytes, profile_call
+from pg_copy import DEFAULT_COPY_BATCH_SIZE, DEFAULT_MAX_CONNECTIONS, CopyDatabaseConnection
+
+# Target size of one parse task; larger files are split on ISA boundaries
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+
+# Database write order for directory ingest (maintains referential integrity)
+LOAD_ORDER = ['270', '278', '837']
+
+# Metrics stage of each transaction set (named as in load_to_supabase)
+STAGE_NAMES = {'270': 'eligibility', '278': 'prior_auth', '837': 'claims'}
+
+# 837 shards come back as column buffers, which pickle as raw bytes
+# instead of a dict per claim header and line
+SHARD_PARSERS = {
+    '270': parse_270_271,
+    '278': parse_278,
+    '837': parse_837_columnar
+}
+
+def plan_shards(file_path: str, shard_bytes: int = DEFAULT_SHARD_BYTES) -> List[Tuple[int, Optional[int]]]:
+    """Split a file into (start, end) byte ranges of about shard_bytes, cut on ISA boundaries"""
+    if os.path.getsize(file_path) <= shard_bytes:
+        return [(0, None)]
+    
+    shards = []
+    start = 0
+    for offset in find_interchange_offsets(file_path)[1:]:
+        if offset - start >= shard_bytes:
+            shards.append((start, offset))
+            start = offset
+    shards.append((start, None))
+    return shards
+
+def parse_shard(transaction_set: str, file_path: str, start: int, end: Optional[int],
+                skip_interchanges: frozenset = frozenset()) -> Dict:
+    """Parse one shard of an EDI file (runs in a worker process)"""
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    interchange_filter = InterchangeFilter(skip_interchanges)
+    parser = SHARD_PARSERS[transaction_set]
+    records = profile_call(parser.__name__, parser, file_path, start=start, end=end,
+                           interchange_filter=interchange_filter)
+    
+    if end is None:
+        end = os.path.getsize(file_path)
+    
+    return {
+        'transaction_set': transaction_set,
+        'file_path': file_path,
+        'worker': os.getpid(),
+        'records': records,
+        'interchanges': interchange_filter.read,
+        'skipped': interchange_filter.skipped,
+        'bytes': end - start,
+        'seconds': time.perf_counter() - started,
+        'cpu_seconds': time.process_time() - cpu_started
+    }
 
 # Database connection (mock for now - replace with actual DB connection)
 class DatabaseConnection:
@@ -29,10 +95,11 @@ class DatabaseConnection:
         self.user = os.getenv('DB_USER', 'postgres')
         self.password = os.getenv('DB_PASSWORD', '')
     
-    def execute_function(self, function_name: str, data: List[Dict]) -> int:
+    def execute_function(self, function_name: str, data: Iterable[Dict]) -> int:
         """Execute PostgreSQL function with JSON data"""
-        print(f"[Mock] Calling {function_name} with {len(data)} records")
-        return len(data)
+        count = sum(1 for _ in data)
+        print(f"[Mock] Calling {function_name} with {count} records")
+        return count
     
     def execute_query(self, query: str, params: tuple = None):
         """Execute SQL query"""
@@ -42,32 +109,64 @@ class DatabaseConnection:
 class EDIDataLoader:
     """Main EDI data loading orchestrator"""
     
-    def __init__(self):
-        self.db = DatabaseConnection()
+    def __init__(self, ledger: Optional[IngestLedger] = None, db=None,
+                 member_cache: Optional[MemberDimensionCache] = None,
+                 metrics: Optional[RunMetrics] = None):
+        """
+        Args:
+            ledger: Ingest ledger for incremental loads; interchanges and
+                files it has already seen are skipped
+            db: Database connection (default: the mock DatabaseConnection;
+                pass a CopyDatabaseConnection to bulk load into PostgreSQL)
+            member_cache: Member dimension cache; only members whose source
+                record differs from it are loaded, and it is updated after
+            metrics: Per-stage run metrics (a new RunMetrics by default)
+        """
+        self.db = db or DatabaseConnection()
+        self.ledger = ledger
+        self.member_cache = member_cache
+        self.metrics = metrics or RunMetrics('load_edi_data')
+        self.file_hashes = {}
         self.stats = {
             'members': 0,
             'eligibility': 0,
             'prior_auth': 0,
             'claims': 0,
+            'skipped_interchanges': 0,
             'errors': []
         }
+        self.worker_stats = defaultdict(lambda: {'shards': 0, 'records': 0, 'bytes': 0, 'seconds': 0.0})
     
     def load_members(self, file_path: str) -> int:
         """Load member demographics from JSON export (from proprietary enrollment system)"""
         print(f"\n[1/4] Loading members from JSON: {file_path}")
         
         try:
+            cache_empty = self.member_cache is not None and len(self.member_cache) == 0
+            if self.ledger and self.ledger.is_file_loaded(self.file_hash(file_path)) and not cache_empty:
+                print("✓ Members file unchanged since last load, skipping")
+                return 0
+            
             # Parse JSON file
             with open(file_path, 'r') as f:
-                members = json.load(f)
+                members = profile_call('members', json.load, f)
             
             if not members:
                 print("⚠ No members found in JSON file")
                 return 0
             
+            if self.member_cache is not None:
+                members = list(self.member_cache.changed(members))
+                print(f"  {len(members)} new or changed members")
+            
             # Bulk insert members
             count = self.db.execute_function('load_members_batch', members)
             self.stats['members'] = count
+            if self.member_cache is not None:
+                self.member_cache.update(members)
+                self.member_cache.save()
+            if self.ledger:
+                self.ledger.mark_file(self.file_hash(file_path), file_path)
             print(f"✓ Loaded {count} members from JSON")
             return count
             
@@ -82,9 +181,12 @@ class EDIDataLoader:
         print(f"\n[2/4] Loading eligibility data from {file_path}")
         
         try:
-            inquiries = parse_270_271(file_path)
+            interchange_filter = self.interchange_filter(file_path)
+            inquiries = profile_call('parse_270_271', parse_270_271, file_path,
+                                     interchange_filter=interchange_filter)
             count = self.db.execute_function('load_270_271_batch', inquiries)
             self.stats['eligibility'] = count
+            self.mark_loaded(file_path, '270', interchange_filter)
             print(f"✓ Loaded {count} eligibility inquiries")
             return count
             
@@ -99,9 +201,11 @@ class EDIDataLoader:
         print(f"\n[3/4] Loading prior authorization data from {file_path}")
         
         try:
-            prior_auths = parse_278(file_path)
+            interchange_filter = self.interchange_filter(file_path)
+            prior_auths = profile_call('parse_278', parse_278, file_path, interchange_filter=interchange_filter)
             count = self.db.execute_function('load_278_batch', prior_auths)
             self.stats['prior_auth'] = count
+            self.mark_loaded(file_path, '278', interchange_filter)
             print(f"✓ Loaded {count} prior authorizations")
             return count
             
@@ -116,7 +220,9 @@ class EDIDataLoader:
         print(f"\n[4/4] Loading claims data from {file_path}")
         
         try:
-            headers, lines = parse_837(file_path)
+            interchange_filter = self.interchange_filter(file_path)
+            headers, lines = profile_call('parse_837', parse_837, file_path,
+                                          interchange_filter=interchange_filter)
             
             # Load headers first
             header_count = self.db.execute_function('load_837_headers_batch', headers)
@@ -125,6 +231,7 @@ class EDIDataLoader:
             line_count = self.db.execute_function('load_837_lines_batch', lines)
             
             self.stats['claims'] = header_count
+            self.mark_loaded(file_path, '837', interchange_filter)
             print(f"✓ Loaded {header_count} claims with {line_count} lines")
             return header_count
             
@@ -142,12 +249,140 @@ class EDIDataLoader:
         print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
         # Load in sequence to maintain referential integrity
-        self.load_members(os.path.join(sample_data_dir, 'members.json'))
-        self.load_eligibility_data(os.path.join(sample_data_dir, '270-eligibility-requests.edi'))
-        self.load_prior_auth_data(os.path.join(sample_data_dir, '278-prior-auth-requests.edi'))
-        self.load_claims_data(os.path.join(sample_data_dir, '837I-institutional-claims.edi'))
+        self.measure('members', self.load_members, os.path.join(sample_data_dir, 'members.json'))
+        self.measure('eligibility', self.load_eligibility_data,
+                     os.path.join(sample_data_dir, '270-eligibility-requests.edi'))
+        self.measure('prior_auth', self.load_prior_auth_data,
+                     os.path.join(sample_data_dir, '278-prior-auth-requests.edi'))
+        self.measure('claims', self.load_claims_data,
+                     os.path.join(sample_data_dir, '837I-institutional-claims.edi'))
+        
+        self.print_summary()
+    
+    def load_directory(self, input_dir: str, pattern: str = '*.edi', workers: Optional[int] = None,
+                       shard_bytes: int = DEFAULT_SHARD_BYTES):
+        """
+        Load every EDI file in a directory, parsing in parallel
+        
+        Files are classified by their ST01 transaction set and split into
+        shards on ISA interchange boundaries. Shards are parsed across a
+        process pool, while database writes still happen in
+        members -> eligibility -> PA -> claims order.
+        
+        Args:
+            input_dir: Directory containing EDI files (and optionally members.json)
+            pattern: Glob pattern for EDI files within input_dir
+            workers: Number of parser processes (default: CPU count)
+            shard_bytes: Target bytes per parse task for large files
+        """
+        print("=" * 60)
+        print("EDI Data Loader - Clinical Forecasting Engine (directory mode)")
+        print("=" * 60)
+        print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
-        # Print summary
+        members_file = os.path.join(input_dir, 'members.json')
+        if os.path.exists(members_file):
+            self.measure('members', self.load_members, members_file)
+        
+        tasks = {transaction_set: [] for transaction_set in LOAD_ORDER}
+        for file_path in sorted(glob.glob(os.path.join(input_dir, pattern))):
+            transaction_set = sniff_transaction_set(file_path)
+            if transaction_set not in tasks:
+                print(f"⚠ Skipping {file_path}: unsupported transaction set {transaction_set}")
+                continue
+            skip = frozenset(self.ledger.loaded_interchanges(self.file_hash(file_path))) if self.ledger else frozenset()
+            for start, end in plan_shards(file_path, shard_bytes):
+                tasks[transaction_set].append((file_path, start, end, skip))
+        
+        print(f"\nParsing {sum(len(t) for t in tasks.values())} shards with {workers or os.cpu_count()} workers")
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                transaction_set: [executor.submit(parse_shard, transaction_set, *task) for task in shard_tasks]
+                for transaction_set, shard_tasks in tasks.items()
+            }
+            
+            # Later transaction types keep parsing while earlier ones are written
+            for transaction_set in LOAD_ORDER:
+                for future in as_completed(futures[transaction_set]):
+                    try:
+                        self.write_shard(future.result())
+                    except Exception as e:
+                        error = f"Error loading {transaction_set} shard: {str(e)}"
+                        print(f"✗ {error}")
+                        self.stats['errors'].append(error)
+        
+        self.print_summary()
+    
+    def measure(self, stage_name: str, load, file_path: str) -> int:
+        """Run one load_* method as a metrics stage, counting its file and records"""
+        with self.metrics.stage(stage_name) as stage:
+            count = load(file_path)
+            stage.add(records=count, bytes_read=os.path.getsize(file_path) if os.path.exists(file_path) else 0)
+        return count
+    
+    def write_shard(self, result: Dict) -> int:
+        """Write the records of one parsed shard to the database"""
+        transaction_set = result['transaction_set']
+        with self.metrics.stage(STAGE_NAMES[transaction_set]) as stage:
+            count = self._write_shard(result)
+            # Wall and process CPU cover the writes; the parse ran in the worker
+            stage.add(records=count, bytes_read=result['bytes'], parse_cpu_seconds=result['cpu_seconds'])
+        return count
+    
+    def _write_shard(self, result: Dict) -> int:
+        transaction_set = result['transaction_set']
+        records = result['records']
+        
+        if transaction_set == '270':
+            count = self.db.execute_function('load_270_271_batch', records)
+            self.stats['eligibility'] += count
+        elif transaction_set == '278':
+            count = self.db.execute_function('load_278_batch', records)
+            self.stats['prior_auth'] += count
+        else:
+            headers, lines = records
+            count = self.db.execute_function('load_837_headers_batch', headers.records())
+            self.db.execute_function('load_837_lines_batch', lines.records())
+            self.stats['claims'] += count
+        
+        if self.ledger and result['interchanges']:
+            self.ledger.mark_interchanges(self.file_hash(result['file_path']), result['file_path'],
+                                          transaction_set, result['interchanges'])
+        self.stats['skipped_interchanges'] += result['skipped']
+        
+        worker = self.worker_stats[result['worker']]
+        worker['shards'] += 1
+        worker['records'] += count
+        worker['bytes'] += result['bytes']
+        worker['seconds'] += result['seconds']
+        
+        print(f"✓ {os.path.basename(result['file_path'])} [{transaction_set}]: {count} records "
+              f"in {result['seconds']:.2f}s (worker {result['worker']})")
+        return count
+    
+    def file_hash(self, file_path: str) -> str:
+        """Content hash of an input file (computed once per run)"""
+        if file_path not in self.file_hashes:
+            self.file_hashes[file_path] = hash_file(file_path)
+        return self.file_hashes[file_path]
+    
+    def interchange_filter(self, file_path: str) -> Optional[InterchangeFilter]:
+        """Tokenizer filter skipping interchanges already in the ledger (None when not incremental)"""
+        if not self.ledger:
+            return None
+        return self.ledger.interchange_filter(self.file_hash(file_path))
+    
+    def mark_loaded(self, file_path: str, transaction_set: str, interchange_filter: Optional[InterchangeFilter]):
+        """Record the interchanges just written in the ledger"""
+        if interchange_filter is None:
+            return
+        self.stats['skipped_interchanges'] += interchange_filter.skipped
+        self.ledger.mark_interchanges(self.file_hash(file_path), file_path, transaction_set,
+                                      interchange_filter.read)
+    
+    def print_summary(self):
+        """Print load counts, per-worker throughput and errors"""
         print("\n" + "=" * 60)
         print("LOAD SUMMARY")
         print("=" * 60)
@@ -155,6 +390,19 @@ class EDIDataLoader:
         print(f"Eligibility Inquiries: {self.stats['eligibility']:>6}")
         print(f"Prior Authorizations:  {self.stats['prior_auth']:>6}")
         print(f"Claims:                {self.stats['claims']:>6}")
+        self.metrics.print_summary()
+        peak_children = peak_rss_bytes(children=True)
+        if self.worker_stats and peak_children is not None:
+            print(f"  Peak worker RSS: {peak_children / 1e6:.1f} MB")
+        if self.ledger:
+            print(f"Skipped (already loaded) interchanges: {self.stats['skipped_interchanges']}")
+        
+        if self.worker_stats:
+            print("\nWorker throughput:")
+            for worker, stats in sorted(self.worker_stats.items()):
+                seconds = stats['seconds'] or 1e-9
+                print(f"  pid {worker:>7}: {stats['shards']:>4} shards, {stats['records']:>8} records, "
+                      f"{stats['records'] / seconds:>10.0f} rec/s, {stats['bytes'] / seconds / 1e6:>7.2f} MB/s")
         
         if self.stats['errors']:
             print(f"\nErrors: {len(self.stats['errors'])}")
@@ -168,8 +416,52 @@ class EDIDataLoader:
 
 def main():
     """Main entry point"""
-    loader = EDIDataLoader()
-    loader.load_all()
+    parser = argparse.ArgumentParser(description='Load EDI transactions for the Clinical Forecasting Engine')
+    parser.add_argument('--input-dir', help='Load every EDI file in this directory using a process pool')
+    parser.add_argument('--pattern', default='*.edi', help='Glob pattern for EDI files in --input-dir')
+    parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+    parser.add_argument('--shard-mb', type=int, default=DEFAULT_SHARD_BYTES // (1024 * 1024),
+                        help='Split files larger than this on ISA boundaries')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip interchanges and files already recorded in the ingest ledger')
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER_PATH, help='Ingest ledger SQLite file')
+    parser.add_argument('--member-cache', default=DEFAULT_MEMBER_CACHE_PATH,
+                        help='Member dimension cache file; with --incremental only changed members are loaded')
+    parser.add_argument('--copy', action='store_true',
+                        help='Bulk load into PostgreSQL with COPY (DATABASE_URL or DB_HOST/DB_NAME/DB_USER/DB_PASSWORD)')
+    parser.add_argument('--dsn', default=None, help='libpq connection string for --copy')
+    parser.add_argument('--copy-batch-size', type=int, default=DEFAULT_COPY_BATCH_SIZE,
+                        help='Records per COPY + merge transaction')
+    parser.add_argument('--db-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help='Pooled connections (concurrent batches) for --copy')
+    parser.add_argument('--metrics-json', help='Write a JSON run report with per-stage metrics')
+    parser.add_argument('--metrics-prom', help='Write per-stage metrics in Prometheus text format')
+    parser.add_argument('--profile', help="Comma separated parsers to profile (e.g. parse_837), or 'all'")
+    parser.add_argument('--profile-mode', choices=['cprofile', 'sample'], help='Profiler (default cprofile)')
+    parser.add_argument('--profile-dir', help='Directory for profiler output (default profiles/)')
+    args = parser.parse_args()
+    # Set before the process pool starts, so parser workers inherit it
+    configure_profiling(args.profile, args.profile_mode, args.profile_dir)
+    
+    ledger = IngestLedger(args.ledger) if args.incremental else None
+    db = CopyDatabaseConnection(args.dsn, args.copy_batch_size, args.db_connections) if args.copy else None
+    metrics = RunMetrics('load_edi_data')
+    try:
+        member_cache = MemberDimensionCache(args.member_cache) if args.incremental else None
+        loader = EDIDataLoader(ledger, db, member_cache, metrics)
+        if args.input_dir:
+            loader.load_directory(args.input_dir, args.pattern, args.workers, args.shard_mb * 1024 * 1024)
+        else:
+            loader.load_all()
+    finally:
+        if ledger:
+            ledger.close()
+        if db:
+            db.close()
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
 
 if __name__ == '__main__':
     main()
@@ -4,7 +4,9 @@ EDI Loader for Clinical Forecasting Engine
 Parses EDI files and loads data into Supabase
 
 Usage:
-  python load_to_supabase.py
+  python load_to_supabase.py [--incremental] [--ledger PATH] [--member-cache PATH] [--timeline PATH]
+                             [--metrics-json PATH] [--metrics-prom PATH]
+                             [--profile PARSERS] [--profile-mode cprofile|sample]
 """
 
 import os
@@ -12,66 +14,45 @@ import sys
 sys.path.insert(0, os.path.dirname(__file__))
 
 import json
-import re
-from datetime import datetime, timedelta
-import random
-from parsers import parse_270_271, parse_278, parse_837, parse_rx_benefit
+import asyncio
+import argparse
+import threading
+from datetime import datetime, timezone
+from functools import partial
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import numpy as np
+from batch_writer import BatchWriter
+from pipeline import AsyncBatchWriter, Pipeline, stream
+from ledger import DEFAULT_LEDGER_PATH, IngestLedger, InterchangeFilter, hash_file
+from member_cache import DEFAULT_MEMBER_CACHE_PATH, MemberDimensionCache
+from member_timeline import DEFAULT_TIMELINE_PATH, MemberTimeline
+from signal_features import build_signal_features
+from metrics import RunMetrics, configure_profiling, current_stage, profile_call, profile_iter, record_input
+from scoring import get_model, score_members
+from code_trie import CodeTrie
+from episode_classifier import EpisodeClassifier
+from forecast_cube import DIMENSION_COLUMNS, KEY_COLUMNS, MIN_PROBABILITY, Dimensions, ForecastCube, member_dimensions
+from parsers import parse_270_271, parse_278, parse_837, iter_rx_benefit
+from parsers.edi_dates import parse_edi_date, parse_edi_date_range, parse_edi_datetime
+from parsers.x12_tokenizer import SegmentTokenizer, split_repetitions
+from parsers.parse_837 import iter_claim_segments
 
 try:
     from supabase import create_client, Client
 except ImportError:
-    print("Error: supabase-py library not installed")
-    print("Install it with: pip install supabase")
-    sys.exit(1)
+    # Parsers and loaders stay importable (e.g. against a stub client);
+    # get_supabase_client() reports the missing library
+    create_client = None
+    Client = Any
 
 # ============================================================================
 # PARSER FUNCTIONS (Inlined for v0 compatibility)
 # ============================================================================
 
-def parse_edi_datetime(date_str: str, time_str: str) -> str:
-    """Convert EDI date/time to ISO format"""
-    try:
-        if len(date_str) == 8:
-            dt = datetime.strptime(date_str, '%Y%m%d')
-        elif len(date_str) == 6:
-            dt = datetime.strptime(date_str, '%y%m%d')
-        else:
-            return None
-        
-        if time_str and len(time_str) >= 4:
-            hour = int(time_str[:2])
-            minute = int(time_str[2:4])
-            dt = dt.replace(hour=hour, minute=minute)
-        
-        return dt.isoformat()
-    except:
-        return None
-
-def parse_edi_date(date_str: str) -> str:
-    """Convert EDI date to ISO format"""
-    try:
-        if '-' in date_str:
-            date_str = date_str.split('-')[0]
-        
-        if len(date_str) == 8:
-            return datetime.strptime(date_str, '%Y%m%d').date().isoformat()
-        elif len(date_str) == 6:
-            return datetime.strptime(date_str, '%y%m%d').date().isoformat()
-    except:
-        return None
-
-def parse_270_271(file_path: str):
-    """Parse 270/271 EDI eligibility inquiries"""
-    inquiries = []
-    
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    transactions = re.findall(r'ST\*270.*?SE\*\d+\*\d+~', content, re.DOTALL)
-    
-    for transaction in transactions:
-        segments = transaction.split('~')
-        
+def parse_270_271(file_path: str, **reader_options):
+    """Parse 270/271 EDI eligibility inquiries, yielding one at a time"""
+    for envelope, segments in SegmentTokenizer(file_path, **reader_options).transactions('270'):
         inquiry = {
             'inquiry_date': None,
             'member_id': None,
@@ -80,8 +61,7 @@ def parse_270_271(file_path: str):
             'coverage_status': 'unknown'
         }
         
-        for segment in segments:
-            fields = segment.split('*')
+        for fields in segments:
             if not fields:
                 continue
                 
@@ -100,25 +80,15 @@ def parse_270_271(file_path: str):
                     inquiry['provider_npi'] = fields[9]
             
             elif segment_id == 'EQ' and len(fields) >= 2:
-                inquiry['service_type_codes'].append(fields[1])
+                inquiry['service_type_codes'].extend(split_repetitions(fields[1], envelope['delimiters']))
         
         if inquiry['member_id']:
-            inquiries.append(inquiry)
-    
-    return inquiries
+            yield inquiry
 
-def parse_278(file_path: str):
-    """Parse 278 EDI prior authorization requests"""
-    prior_auths = []
-    
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    transactions = re.findall(r'ST\*278.*?SE\*\d+\*\d+~', content, re.DOTALL)
-    
-    for transaction in transactions:
-        segments = transaction.split('~')
-        
+def parse_278(file_path: str, **reader_options):
+    """Parse 278 EDI prior authorization requests, yielding one at a time"""
+    for envelope, segments in SegmentTokenizer(file_path, **reader_options).transactions('278'):
+        component = envelope['delimiters'].component_separator
         pa = {
             'auth_number': None,
             'request_date': None,
@@ -130,8 +100,7 @@ def parse_278(file_path: str):
             'status': 'pending'
         }
         
-        for segment in segments:
-            fields = segment.split('*')
+        for fields in segments:
             if not fields:
                 continue
                 
@@ -156,72 +125,68 @@ def parse_278(file_path: str):
             
             elif segment_id == 'HI':
                 for i in range(1, len(fields)):
-                    if ':' in fields[i]:
-                        code = fields[i].split(':')[1]
+                    if component in fields[i]:
+                        code = fields[i].split(component)[1]
                         pa['diagnosis_codes'].append(code)
             
             elif segment_id == 'SV2' and len(fields) >= 2:
-                if ':' in fields[1]:
-                    proc_code = fields[1].split(':')[1]
+                if component in fields[1]:
+                    proc_code = fields[1].split(component)[1]
                     pa['procedure_codes'].append(proc_code)
         
         if pa['member_id'] and pa['auth_number']:
-            prior_auths.append(pa)
-    
-    return prior_auths
+            yield pa
 
-def parse_837(file_path: str):
-    """Parse 837 EDI claims"""
-    headers = []
-    lines = []
-    
-    with open(file_path, 'r') as f:
-        content = f.read()
+def parse_837(file_path: str, **reader_options):
+    """Parse 837 EDI claims, yielding (header, lines) one claim at a time"""
+    tokenizer = SegmentTokenizer(file_path, **reader_options)
     
-    claims = re.findall(r'CLM\*.*?(?=CLM\*|SE\*)', content, re.DOTALL)
-    
-    for claim_text in claims:
-        segments = claim_text.split('~')
-        
+    # Member and billing provider come from the enclosing HL loops
+    for loops, segments in iter_claim_segments(tokenizer):
+        component = tokenizer.delimiters.component_separator
         header = {
             'claim_id': None,
-            'member_id': None,
-            'claim_type': 'institutional',
+            'member_id': loops['patient_id'] or loops['subscriber_id'],
+            'claim_type': loops['claim_type'],
             'service_from_date': None,
             'service_to_date': None,
-            'billing_provider_npi': None,
+            'billing_provider_npi': loops['billing_provider_npi'],
             'total_billed': 0,
             'total_paid': 0
         }
         
         line_num = 0
+        claim_lines = []
+        in_line_loop = False
         
-        for segment in segments:
-            fields = segment.split('*')
+        for fields in segments:
             if not fields:
                 continue
                 
             segment_id = fields[0]
             
-            if segment_id == 'CLM' and len(fields) >= 3:
+            if segment_id == 'CLM' and len(fields) > 2:
                 header['claim_id'] = fields[1]
                 header['total_billed'] = float(fields[2]) if fields[2] else 0
             
-            elif segment_id == 'DTP' and len(fields) >= 3:
+            elif segment_id == 'LX':
+                in_line_loop = True
+            
+            # DTP*472 inside the line loop dates the current service line
+            elif segment_id == 'DTP' and in_line_loop:
+                if claim_lines and len(fields) > 3 and fields[1] == '472':
+                    claim_lines[-1]['service_date'] = parse_edi_date_range(fields[3])[0]
+            
+            elif segment_id == 'DTP' and len(fields) > 3:
                 date_qualifier = fields[1]
                 if date_qualifier == '434':
-                    header['service_from_date'] = parse_edi_date(fields[3])
+                    header['service_from_date'], header['service_to_date'] = parse_edi_date_range(fields[3])
                 elif date_qualifier == '435':
                     header['service_to_date'] = parse_edi_date(fields[3])
             
-            elif segment_id == 'NM1' and len(fields) >= 3:
-                entity_type = fields[1]
-                if entity_type == 'IL' and len(fields) >= 9:
-                    header['member_id'] = fields[9]
-                elif entity_type == '85' and len(fields) >= 9:
-                    header['billing_provider_npi'] = fields[9]
-            
             elif segment_id in ['SV1', 'SV2']:
+                in_line_loop = True
+                header['claim_type'] = header['claim_type'] or ('professional' if segment_id == 'SV1' else 'institutional')
                 line_num += 1
                 line = {
                     'claim_id': header['claim_id'],
@@ -231,283 +196,794 @@ def parse_837(file_path: str):
                     'billed_amount': 0
                 }
                 
-                if segment_id == 'SV1' and len(fields) >= 2:
-                    if ':' in fields[1]:
-                        line['procedure_code'] = fields[1].split(':')[1]
-                    if len(fields) >= 3:
+                if segment_id == 'SV1' and len(fields) > 1:
+                    if component in fields[1]:
+                        line['procedure_code'] = fields[1].split(component)[1]
+                    if len(fields) > 2:
                         line['billed_amount'] = float(fields[2]) if fields[2] else 0
                 
-                elif segment_id == 'SV2' and len(fields) >= 3:
-                    if ':' in fields[2]:
-                        line['procedure_code'] = fields[2].split(':')[1]
-                    if len(fields) >= 4:
+                elif segment_id == 'SV2' and len(fields) > 2:
+                    if component in fields[2]:
+                        line['procedure_code'] = fields[2].split(component)[1]
+                    if len(fields) > 3:
                         line['billed_amount'] = float(fields[3]) if fields[3] else 0
                 
-                lines.append(line)
+                claim_lines.append(line)
+        
+        # 837P claims carry no statement period; their dates span the service lines
+        service_dates = [line['service_date'] for line in claim_lines if line['service_date']]
+        if service_dates:
+            header['service_from_date'] = header['service_from_date'] or min(service_dates)
+            header['service_to_date'] = header['service_to_date'] or max(service_dates)
         
         if header['claim_id'] and header['member_id']:
-            headers.append(header)
-    
-    return {'headers': headers, 'lines': lines}
-
-def parse_rx_benefit(file_path: str):
-    """Parse Rx benefit inquiry JSON"""
-    with open(file_path, 'r') as f:
-        data = json.load(f)
-    return data.get('inquiries', [])
+            yield header, claim_lines
 
 # ============================================================================
 # DATA LOADING FUNCTIONS
 # ============================================================================
 
+# Chronic conditions that make a member a TKA prediction candidate (knee
+# osteoarthritis); matched dotted or undotted through a CodeTrie
+TKA_CONDITION_PATTERNS = ['M17.*']
+TKA_CONDITIONS = CodeTrie.from_patterns(TKA_CONDITION_PATTERNS, 'ICD10')
+
+# Rows per page when reading back from PostgREST (its default max-rows)
+PAGE_SIZE = 1000
+
+# Member IDs per in_() filter, keeping request URLs well under server limits
+MEMBER_ID_CHUNK_SIZE = 200
+
+# Columns generate_intent_events reads from each source table
+INTENT_SOURCE_COLUMNS = {
+    'eligibility_inquiry_event': 'event_id,member_id,inquiry_date,created_at',
+    'prior_auth_request': 'auth_id,member_id,auth_number,request_date,request_category,'
+                          'procedure_codes,diagnosis_codes,created_at'
+}
+
+# Primary key of each source table; with created_at it forms the unique
+# (created_at, key) high-water mark, since created_at alone is shared by
+# every row of one batch upsert
+INTENT_SOURCE_KEYS = {
+    'eligibility_inquiry_event': 'event_id',
+    'prior_auth_request': 'auth_id',
+}
+
+# Client whose episode_code_mapping rules classify intent events
+CLIENT_ID = os.environ.get('CFE_CLIENT_ID', 'default')
+
+# clinical_intent_event columns the member timeline is built from
+TIMELINE_COLUMNS = 'member_id,episode_id,event_type,event_date,signal_strength,metadata'
+
+# Source rows kept in the timeline next to the intent events (condition
+# tenure and Rx escalation features), with the timeline event type of each
+TIMELINE_SOURCES = {
+    'member_chronic_condition': ('chronic_condition', 'member_id,icd10_code,diagnosis_date'),
+    'rx_benefit_inquiry': ('rx_benefit_inquiry', 'inquiry_id,member_id,inquiry_date,drug_class'),
+}
+
+CODE_MAPPING_COLUMNS = ('episode_id,code_type,code_value,is_primary,signal_strength,'
+                        'effective_date,expiration_date,client_id')
+
 def get_supabase_client() -> Client:
     """Initialize Supabase client"""
     url = os.environ.get("CFE_PUBLIC_SUPABASE_URL") or os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("CFE_PUBLIC_SUPABASE_ANON_KEY") or os.environ.get("SUPABASE_ANON_KEY")
     
+    if create_client is None:
+        raise ImportError("supabase-py library not installed. Install it with: pip install supabase")
+    
     if not url or not key:
         raise ValueError("Missing Supabase credentials. Set CFE_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables")
     
     return create_client(url, key)
 
-def load_members(supabase: Client):
-    """Load member data from JSON file"""
-    print("\n[1/7] Loading member demographics...")
+# Stages print from worker threads; whole lines only
+_log_lock = threading.Lock()
+
+def log(message: str):
+    """Print a progress line, prefixed with the stage it belongs to (stages run concurrently)"""
+    stage = current_stage()
+    with _log_lock:
+        print(f"[{stage.name}] {message}" if stage else message, flush=True)
+
+def load_members(supabase: Client, ledger: Optional[IngestLedger] = None,
+                 member_cache: Optional[MemberDimensionCache] = None,
+                 timeline: Optional[MemberTimeline] = None,
+                 previous_dimensions: Optional[Dict[str, Dimensions]] = None) -> Set[str]:
+    """
+    Load member data from JSON file, returning the member IDs written
+    
+    Args:
+        supabase: Supabase client
+        ledger: Ingest ledger for incremental runs
+        member_cache: Member dimension cache, updated with every member
+            written. On incremental runs only members whose source record
+            differs from the cache are upserted
+        timeline: Member timeline index; chronic condition diagnoses are
+            added to it as condition signals
+        previous_dimensions: Filled with the former (region, network,
+            plan_type) of every reloaded member whose group changed, so the
+            forecast refresh also rebuilds the group the member left
+    """
+    log("Loading member demographics...")
     
-    with open('sample-data/members.json') as f:
-        members_data = json.load(f)
+    file_path = 'sample-data/members.json'
+    file_hash = hash_file(file_path) if ledger else None
+    cache_ready = member_cache is not None and len(member_cache) > 0
+    if ledger and ledger.is_file_loaded(file_hash) and (member_cache is None or cache_ready):
+        log("✓ Members file unchanged since last load, skipping")
+        return set()
+    
+    record_input(file_path)
+    with open(file_path) as f:
+        members_data = profile_call('members', json.load, f)
+    if current_stage():
+        current_stage().add(records=len(members_data))
+    
+    if ledger and cache_ready:
+        members_data = list(member_cache.changed(members_data))
+        log(f"{len(members_data)} new or changed members")
+    
+    if previous_dimensions is not None and ledger:
+        # Read before the upserts replace them: from the cache, or from the
+        # member table when there is no cache to compare against
+        member_ids = [member['member_id'] for member in members_data]
+        if cache_ready:
+            previous = member_cache.categories(member_ids)
+        else:
+            previous = fetch_for_members(lambda: supabase.table('member')
+                                         .select(','.join(('member_id',) + DIMENSION_COLUMNS)), member_ids)
+        previous = {row['member_id']: member_dimensions(row) for row in previous}
+        for member in members_data:
+            before = previous.get(member['member_id'])
+            if before is not None and before != member_dimensions(member):
+                previous_dimensions[member['member_id']] = before
     
-    members = []
-    chronic_conditions = []
+    with BatchWriter(supabase, 'member') as member_writer, \
+            BatchWriter(supabase, 'member_chronic_condition', depends_on=member_writer) as condition_writer:
+        for member in members_data:
+            write_member(member, member_writer, condition_writer)
+            if timeline is not None:
+                timeline.add(condition_signal(member['member_id'], condition)
+                             for condition in member.get('chronic_conditions', []))
     
-    for member in members_data:
-        # Prepare member record
-        member_record = {
+    # The cache only records members once their upserts have landed
+    if member_cache is not None:
+        member_cache.update(members_data)
+        member_cache.save()
+    if ledger:
+        ledger.mark_file(file_hash, file_path)
+    
+    log(f"✓ Loaded {member_writer.rows_written} members")
+    if condition_writer.rows_written:
+        log(f"✓ Loaded {condition_writer.rows_written} chronic conditions")
+    return {member['member_id'] for member in members_data}
+
+def write_member(member: dict, member_writer: BatchWriter, condition_writer: BatchWriter):
+    """Queue one member and its chronic conditions for upsert"""
+    member_writer.write({
+        'member_id': member['member_id'],
+        'first_name': member['first_name'],
+        'last_name': member['last_name'],
+        'date_of_birth': member['date_of_birth'],
+        'gender': member['gender'],
+        'address_street': member.get('address', {}).get('street'),
+        'address_city': member.get('address', {}).get('city'),
+        'address_state': member.get('address', {}).get('state'),
+        'address_zip': member.get('address', {}).get('zip_code'),
+        'phone': member.get('phone'),
+        'email': member.get('email'),
+        'plan_type': member['plan_type'],
+        'network': member['network'],
+        'geographic_region': member['geographic_region'],
+        'enrollment_date': member['enrollment_date'],
+        'enrollment_status': member['enrollment_status'],
+        'termination_date': member.get('termination_date'),
+        'pcp_npi': member.get('primary_care_provider', {}).get('npi'),
+        'pcp_name': member.get('primary_care_provider', {}).get('name'),
+        'pcp_specialty': member.get('primary_care_provider', {}).get('specialty'),
+        'risk_score': member.get('risk_score'),
+        'hcc_score': member.get('hcc_score')
+    })
+    
+    for condition in member.get('chronic_conditions', []):
+        condition_writer.write({
             'member_id': member['member_id'],
-            'first_name': member['first_name'],
-            'last_name': member['last_name'],
-            'date_of_birth': member['date_of_birth'],
-            'gender': member['gender'],
-            'address_street': member.get('address', {}).get('street'),
-            'address_city': member.get('address', {}).get('city'),
-            'address_state': member.get('address', {}).get('state'),
-            'address_zip': member.get('address', {}).get('zip_code'),
-            'phone': member.get('phone'),
-            'email': member.get('email'),
-            'plan_type': member['plan_type'],
-            'network': member['network'],
-            'geographic_region': member['geographic_region'],
-            'enrollment_date': member['enrollment_date'],
-            'enrollment_status': member['enrollment_status'],
-            'termination_date': member.get('termination_date'),
-            'pcp_npi': member.get('primary_care_provider', {}).get('npi'),
-            'pcp_name': member.get('primary_care_provider', {}).get('name'),
-            'pcp_specialty': member.get('primary_care_provider', {}).get('specialty'),
-            'risk_score': member.get('risk_score'),
-            'hcc_score': member.get('hcc_score')
-        }
-        members.append(member_record)
-        
-        # Prepare chronic conditions
-        for condition in member.get('chronic_conditions', []):
-            chronic_conditions.append({
-                'member_id': member['member_id'],
-                'icd10_code': condition['icd10_code'],
-                'description': condition['description'],
-                'diagnosis_date': condition['diagnosis_date']
-            })
-    
-    # Insert members
-    result = supabase.table('member').upsert(members).execute()
-    print(f"  ✓ Loaded {len(members)} members")
-    
-    # Insert chronic conditions
-    if chronic_conditions:
-        result = supabase.table('member_chronic_condition').upsert(chronic_conditions).execute()
-        print(f"  ✓ Loaded {len(chronic_conditions)} chronic conditions")
-
-def load_eligibility_inquiries(supabase: Client):
-    """Parse 270/271 EDI files and load eligibility inquiries"""
-    print("\n[2/7] Loading eligibility inquiries (270/271)...")
+            'icd10_code': condition['icd10_code'],
+            'description': condition['description'],
+            'diagnosis_date': condition['diagnosis_date']
+        })
+
+def condition_signal(member_id: str, condition: dict) -> dict:
+    """Timeline signal of a chronic condition diagnosis"""
+    return {
+        'member_id': member_id,
+        'event_type': TIMELINE_SOURCES['member_chronic_condition'][0],
+        'event_date': condition.get('diagnosis_date'),
+        'category': condition.get('icd10_code'),
+        'event_source_id': f"{member_id}:{condition.get('icd10_code')}"
+    }
+
+def rx_signal(inquiry: dict) -> dict:
+    """Timeline signal of an Rx benefit inquiry, categorised by drug class"""
+    return {
+        'member_id': inquiry.get('member_id'),
+        'event_type': TIMELINE_SOURCES['rx_benefit_inquiry'][0],
+        'event_date': inquiry.get('inquiry_date'),
+        'category': inquiry.get('drug_class'),
+        'event_source_id': inquiry.get('inquiry_id')
+    }
+
+async def load_eligibility_inquiries(supabase: Client, ledger: Optional[IngestLedger] = None) -> Set[str]:
+    """Parse 270/271 EDI files and load eligibility inquiries, returning the member IDs touched"""
+    log("Loading eligibility inquiries (270/271)...")
     
     file_path = 'sample-data/270-eligibility-requests.edi'
     if not os.path.exists(file_path):
-        print(f"  ⚠ File not found: {file_path}, skipping...")
-        return
+        log(f"⚠ File not found: {file_path}, skipping...")
+        return set()
     
-    inquiries = parse_270_271(file_path)
+    file_hash, interchange_filter = await asyncio.to_thread(start_incremental, ledger, file_path)
+    touched = set()
     
-    if inquiries:
-        result = supabase.table('eligibility_inquiry_event').upsert(inquiries).execute()
-        print(f"  ✓ Loaded {len(inquiries)} eligibility inquiries")
+    async with AsyncBatchWriter(supabase, 'eligibility_inquiry_event') as writer:
+        async def write(records):
+            await writer.awrite_all(track_members(records, touched))
+        record_input(file_path)
+        await stream(profile_iter('parse_270_271', parse_270_271(file_path, interchange_filter=interchange_filter)), write)
+    
+    finish_incremental(ledger, file_path, '270', file_hash, interchange_filter)
+    if writer.rows_written:
+        log(f"✓ Loaded {writer.rows_written} eligibility inquiries")
+    return touched
 
-def load_prior_auths(supabase: Client):
-    """Parse 278 EDI files and load prior authorization requests"""
-    print("\n[3/7] Loading prior authorizations (278)...")
+async def load_prior_auths(supabase: Client, ledger: Optional[IngestLedger] = None) -> Set[str]:
+    """Parse 278 EDI files and load prior authorization requests, returning the member IDs touched"""
+    log("Loading prior authorizations (278)...")
     
     file_path = 'sample-data/278-prior-auth-requests.edi'
     if not os.path.exists(file_path):
-        print(f"  ⚠ File not found: {file_path}, skipping...")
-        return
+        log(f"⚠ File not found: {file_path}, skipping...")
+        return set()
     
-    prior_auths = parse_278(file_path)
+    file_hash, interchange_filter = await asyncio.to_thread(start_incremental, ledger, file_path)
+    touched = set()
     
-    if prior_auths:
-        result = supabase.table('prior_auth_request').upsert(prior_auths).execute()
-        print(f"  ✓ Loaded {len(prior_auths)} prior authorization requests")
+    async with AsyncBatchWriter(supabase, 'prior_auth_request') as writer:
+        async def write(records):
+            await writer.awrite_all(track_members(records, touched))
+        record_input(file_path)
+        await stream(profile_iter('parse_278', parse_278(file_path, interchange_filter=interchange_filter)), write)
+    
+    finish_incremental(ledger, file_path, '278', file_hash, interchange_filter)
+    if writer.rows_written:
+        log(f"✓ Loaded {writer.rows_written} prior authorization requests")
+    return touched
 
-def load_rx_benefit_inquiries(supabase: Client):
-    """Parse Rx benefit inquiry JSON and load pharmacy benefit checks"""
-    print("\n[4/7] Loading Rx benefit inquiries...")
+async def load_rx_benefit_inquiries(supabase: Client, ledger: Optional[IngestLedger] = None,
+                                    timeline: Optional[MemberTimeline] = None) -> Set[str]:
+    """
+    Stream Rx benefit inquiries (JSON, NDJSON or NCPDP D.0) and load them,
+    returning the member IDs touched; each inquiry is also added to the
+    timeline (if given) as an Rx signal
+    """
+    log("Loading Rx benefit inquiries...")
     
     file_path = 'sample-data/rx-benefit-inquiries.json'
     if not os.path.exists(file_path):
-        print(f"  ⚠ File not found: {file_path}, skipping...")
-        return
+        log(f"⚠ File not found: {file_path}, skipping...")
+        return set()
     
-    inquiries = parse_rx_benefit(file_path)
+    # Not X12, so the whole file is the unit of incremental loading
+    file_hash = await asyncio.to_thread(hash_file, file_path) if ledger else None
+    if ledger and ledger.is_file_loaded(file_hash):
+        log("✓ Rx benefit file unchanged since last load, skipping")
+        return set()
     
-    if inquiries:
-        result = supabase.table('rx_benefit_inquiry').upsert(inquiries).execute()
-        print(f"  ✓ Loaded {len(inquiries)} Rx benefit inquiries")
+    touched = set()
+    async with AsyncBatchWriter(supabase, 'rx_benefit_inquiry') as writer:
+        async def write(records):
+            if timeline is not None:
+                timeline.add(rx_signal(record) for record in records)
+            await writer.awrite_all(track_members(records, touched))
+        record_input(file_path)
+        await stream(profile_iter('iter_rx_benefit', iter_rx_benefit(file_path)), write)
+    
+    if ledger:
+        ledger.mark_file(file_hash, file_path)
+    if writer.rows_written:
+        log(f"✓ Loaded {writer.rows_written} Rx benefit inquiries")
+    return touched
 
-def load_claims(supabase: Client):
-    """Parse 837 EDI files and load claims"""
-    print("\n[5/7] Loading claims (837)...")
+async def load_claims(supabase: Client, ledger: Optional[IngestLedger] = None) -> Set[str]:
+    """Parse 837 EDI files and load claims, returning the member IDs touched"""
+    log("Loading claims (837)...")
     
     file_path = 'sample-data/837I-institutional-claims.edi'
     if not os.path.exists(file_path):
-        print(f"  ⚠ File not found: {file_path}, skipping...")
-        return
+        log(f"⚠ File not found: {file_path}, skipping...")
+        return set()
     
-    claims_data = parse_837(file_path)
+    file_hash, interchange_filter = await asyncio.to_thread(start_incremental, ledger, file_path)
+    touched = set()
     
-    if claims_data:
-        headers = claims_data['headers']
-        lines = claims_data['lines']
+    # Lines reference their header, so header batches land before line batches
+    async with AsyncBatchWriter(supabase, 'claim_header') as header_writer, \
+            AsyncBatchWriter(supabase, 'claim_line', depends_on=header_writer) as line_writer:
+        async def write(claims):
+            for header, lines in claims:
+                touched.add(header.get('member_id'))
+                await header_writer.awrite(header)
+                await line_writer.awrite_all(lines)
+        record_input(file_path)
+        await stream(profile_iter('parse_837', parse_837(file_path, interchange_filter=interchange_filter)), write)
+    
+    finish_incremental(ledger, file_path, '837', file_hash, interchange_filter)
+    touched.discard(None)
+    if header_writer.rows_written:
+        log(f"✓ Loaded {header_writer.rows_written} claim headers")
+    if line_writer.rows_written:
+        log(f"✓ Loaded {line_writer.rows_written} claim lines")
+    return touched
+
+def start_incremental(ledger: Optional[IngestLedger], file_path: str) -> Tuple[Optional[str], Optional[InterchangeFilter]]:
+    """Hash an EDI file and build a filter skipping its loaded interchanges ((None, None) for a full load)"""
+    if not ledger:
+        return None, None
+    file_hash = hash_file(file_path)
+    interchange_filter = ledger.interchange_filter(file_hash)
+    if interchange_filter.skip:
+        log(f"✓ {len(interchange_filter.skip)} interchanges already loaded, skipping them")
+    return file_hash, interchange_filter
+
+def finish_incremental(ledger: Optional[IngestLedger], file_path: str, transaction_set: str,
+                       file_hash: Optional[str], interchange_filter: Optional[InterchangeFilter]):
+    """Record the interchanges just written (only after every batch has landed)"""
+    if ledger:
+        ledger.mark_interchanges(file_hash, file_path, transaction_set, interchange_filter.read)
+
+def track_members(records: Iterable[dict], touched: Set[str]) -> Iterator[dict]:
+    """Pass records through, collecting their member IDs"""
+    for record in records:
+        if record.get('member_id'):
+            touched.add(record['member_id'])
+        yield record
+
+async def generate_intent_events(supabase: Client, ledger: Optional[IngestLedger] = None,
+                                 timeline: Optional[MemberTimeline] = None):
+    """
+    Generate clinical intent events from eligibility and PA data
+    
+    Args:
+        supabase: Supabase client
+        ledger: Ingest ledger holding the (created_at, key) high-water mark
+            of each source table; only newer source rows are turned into events.
+            None derives events from every source row.
+        timeline: Member timeline index; every generated event is added to it
+    """
+    log("Generating clinical intent events...")
+    
+    watermarks = {table: decode_watermark(ledger.get_watermark(f'{table}.created_at')) if ledger else None
+                  for table in INTENT_SOURCE_COLUMNS}
+    latest = dict(watermarks)
+    
+    # Episode rules are loaded once and matched in memory
+    classifier = await asyncio.to_thread(load_episode_classifier, supabase)
+    
+    # Source pages are read on a worker thread while transform workers
+    # classify the previous pages and the writer upserts their events
+    async with AsyncBatchWriter(supabase, 'clinical_intent_event') as writer:
+        async def emit(event):
+            if timeline is not None:
+                timeline.add((event,))
+            await writer.awrite(event)
         
-        result = supabase.table('claim_header').upsert(headers).execute()
-        print(f"  ✓ Loaded {len(headers)} claim headers")
+        # Create intent events from eligibility inquiries. A 270 carries no
+        # clinical codes, so each page is classified by its members' chronic
+        # condition diagnoses (one bulk fetch per page)
+        async def classify_eligibility(page):
+            table = 'eligibility_inquiry_event'
+            diagnoses = await asyncio.to_thread(
+                member_diagnoses, supabase, {elig['member_id'] for elig in page if elig.get('member_id')})
+            for elig in page:
+                latest[table] = max_watermark(latest[table], row_watermark(table, elig))
+                episode = classifier.classify_record(
+                    elig, CLIENT_ID, extra_codes={'ICD10': diagnoses.get(elig.get('member_id'), [])})
+                await emit({
+                    'member_id': elig.get('member_id'),
+                    'episode_id': episode.episode_id,
+                    'event_type': 'eligibility_check',
+                    'event_date': elig.get('inquiry_date'),
+                    'source_transaction': 'eligibility_270',
+                    'signal_strength': 0.3,
+                    'metadata': {'transaction_id': elig.get('transaction_id')}
+                })
         
-        if lines:
-            result = supabase.table('claim_line').upsert(lines).execute()
-            print(f"  ✓ Loaded {len(lines)} claim lines")
-
-def generate_intent_events(supabase: Client):
-    """Generate clinical intent events from eligibility and PA data"""
-    print("\n[6/7] Generating clinical intent events...")
-    
-    # Fetch eligibility inquiries
-    elig_result = supabase.table('eligibility_inquiry_event').select('*').execute()
-    eligibility_inquiries = elig_result.data or []
-    
-    # Fetch prior auths
-    pa_result = supabase.table('prior_auth_request').select('*').execute()
-    prior_auths = pa_result.data or []
-    
-    # Fetch referrals (278 transactions with referral type)
-    referral_result = supabase.table('prior_auth_request').select('*').eq('request_category', 'AR').execute()
-    referrals = referral_result.data or []
-    
-    intent_events = []
-    
-    # Create intent events from eligibility inquiries
-    for elig in eligibility_inquiries:
-        intent_events.append({
-            'member_id': elig.get('member_id'),
-            'episode_id': elig.get('episode_id', 'TKA'),  # Default to TKA for demo
-            'event_type': 'eligibility_check',
-            'event_date': elig.get('inquiry_date'),
-            'source_transaction': 'eligibility_270',
-            'signal_strength': 0.3,
-            'metadata': {'transaction_id': elig.get('transaction_id')}
-        })
+        # One pass over prior_auth_request yields both PA and referral events
+        # (referrals are 278 transactions with request_category AR)
+        async def classify_prior_auths(page):
+            table = 'prior_auth_request'
+            for pa in page:
+                latest[table] = max_watermark(latest[table], row_watermark(table, pa))
+                episode = classifier.classify_record(pa, CLIENT_ID)
+                if pa.get('request_category') == 'AR':
+                    await emit({
+                        'member_id': pa.get('member_id'),
+                        'episode_id': episode.episode_id,
+                        'event_type': 'referral',
+                        'event_date': pa.get('request_date'),
+                        'source_transaction': 'referral_278',
+                        'signal_strength': 0.5,
+                        'metadata': {'auth_number': pa.get('auth_number')}
+                    })
+                else:
+                    await emit({
+                        'member_id': pa.get('member_id'),
+                        'episode_id': episode.episode_id,
+                        'event_type': 'prior_auth',
+                        'event_date': pa.get('request_date'),
+                        'source_transaction': 'prior_auth_278',
+                        'signal_strength': 0.7,
+                        'metadata': {'auth_number': pa.get('auth_number')}
+                    })
+        
+        for table, classify in (('eligibility_inquiry_event', classify_eligibility),
+                                ('prior_auth_request', classify_prior_auths)):
+            rows = fetch_since(lambda table=table: supabase.table(table).select(INTENT_SOURCE_COLUMNS[table]),
+                               INTENT_SOURCE_KEYS[table], watermarks[table])
+            await stream(rows, classify, chunk_size=PAGE_SIZE)
     
-    # Create intent events from prior auths
-    for pa in prior_auths:
-        if pa.get('request_category') != 'AR':  # Exclude referrals
-            intent_events.append({
-                'member_id': pa.get('member_id'),
-                'episode_id': pa.get('episode_id', 'TKA'),
-                'event_type': 'prior_auth',
-                'event_date': pa.get('request_date'),
-                'source_transaction': 'prior_auth_278',
-                'signal_strength': 0.7,
-                'metadata': {'auth_number': pa.get('auth_number')}
-            })
-    
-    # Create intent events from referrals
-    for ref in referrals:
-        intent_events.append({
-            'member_id': ref.get('member_id'),
-            'episode_id': ref.get('episode_id', 'TKA'),
-            'event_type': 'referral',
-            'event_date': ref.get('request_date'),
-            'source_transaction': 'referral_278',
-            'signal_strength': 0.5,
-            'metadata': {'auth_number': ref.get('auth_number')}
-        })
+    # Only advance the marks once every event batch has landed
+    if ledger:
+        for table, value in latest.items():
+            if value and value != watermarks[table]:
+                ledger.set_watermark(f'{table}.created_at', json.dumps(value))
     
-    if intent_events:
-        result = supabase.table('clinical_intent_event').upsert(intent_events).execute()
-        print(f"  ✓ Generated {len(intent_events)} clinical intent events")
+    if writer.rows_written:
+        log(f"✓ Generated {writer.rows_written} clinical intent events")
+    elif ledger:
+        log("✓ No new source rows since the last run")
     else:
-        print("  ⚠ No intent events generated (no source data found)")
+        log("⚠ No intent events generated (no source data found)")
 
-def generate_predictions(supabase: Client):
-    """Generate prediction results based on intent signals and member risk scores"""
-    print("\n[7/7] Generating prediction results...")
+def save_timeline(supabase: Client, timeline: MemberTimeline, bootstrap: bool = False):
+    """
+    Persist the member timeline once every signal source has landed
     
-    # Fetch members with TKA-related chronic conditions
-    members_result = supabase.table('member_chronic_condition').select('member_id, icd10_code, diagnosis_date').in_('icd10_code', ['M17.11', 'M17.12', 'M17.0']).execute()
-    tka_members = members_result.data or []
+    With bootstrap (an incremental run starting from an empty index) the
+    timeline is first rebuilt from clinical_intent_event and the source
+    tables, since earlier runs' rows were never added to it
+    """
+    if bootstrap:
+        timeline.clear()
+        timeline.add(fetch_all(lambda: supabase.table('clinical_intent_event').select(TIMELINE_COLUMNS)
+                               .order('member_id').order('event_date').order('created_at')))
+        timeline.add(condition_signal(row['member_id'], row) for row in fetch_all(
+            lambda: supabase.table('member_chronic_condition')
+            .select(TIMELINE_SOURCES['member_chronic_condition'][1]).order('member_id').order('icd10_code')))
+        timeline.add(rx_signal(row) for row in fetch_all(
+            lambda: supabase.table('rx_benefit_inquiry')
+            .select(TIMELINE_SOURCES['rx_benefit_inquiry'][1]).order('inquiry_id')))
+    timeline.save()
+    log(f"✓ Timeline: {len(timeline)} signals for {timeline.member_count} members")
+
+def generate_predictions(supabase: Client, member_ids: Optional[Set[str]] = None,
+                         member_cache: Optional[MemberDimensionCache] = None,
+                         timeline: Optional[MemberTimeline] = None):
+    """
+    Generate prediction results based on intent signals and member risk scores
     
-    # Fetch intent events for these members
-    member_ids = list(set([m['member_id'] for m in tka_members]))
+    Args:
+        supabase: Supabase client
+        member_ids: Only rescore these members (incremental runs); None
+            scores every eligible member
+        member_cache: Member dimension cache; when populated, eligibility
+            and member features are read from it instead of the database
+        timeline: Member timeline index (kept current by the load stages);
+            time-decayed, per-signal-type features are built from it
+            instead of counting clinical_intent_event rows
+    """
+    log("Generating prediction results...")
     
-    predictions = []
+    if member_ids is not None and not member_ids:
+        log("✓ No members touched by new data, skipping")
+        return
     
-    for member_data in tka_members:
-        member_id = member_data['member_id']
-        
-        # Fetch intent signals for this member
-        signals_result = supabase.table('clinical_intent_event').select('*').eq('member_id', member_id).execute()
-        signals = signals_result.data or []
-        
-        # Calculate probability based on signals
-        signal_count = len(signals)
-        base_probability = 0.5
-        signal_boost = min(signal_count * 0.1, 0.4)
-        probability_score = min(base_probability + signal_boost, 0.95)
-        
-        # Predict event date (30-120 days from now)
-        days_ahead = random.randint(30, 120)
-        predicted_date = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
-        
-        predictions.append({
-            'member_id': member_id,
-            'episode_id': 'TKA',
-            'prediction_date': datetime.now().strftime('%Y-%m-%d'),
-            'predicted_event_date': predicted_date,
-            'probability_score': round(probability_score, 2),
-            'model_version': 'v1.0-rule-based',
-            'confidence_interval_low': round(max(probability_score - 0.15, 0.0), 2),
-            'confidence_interval_high': round(min(probability_score + 0.15, 1.0), 2),
-            'feature_importance': {
-                'chronic_condition': 0.6,
-                'intent_signals': 0.3,
-                'demographics': 0.1
-            }
-        })
+    # Members with TKA-related chronic conditions; a member with several
+    # M17.x codes is only scored once
+    use_cache = member_cache is not None and len(member_cache) > 0
+    if use_cache:
+        member_ids = member_cache.members_with_conditions(TKA_CONDITIONS, member_ids)
+    else:
+        # The LIKE prefixes narrow the query, the trie does the exact
+        # dotted/undotted match
+        condition_filter = ','.join(f'icd10_code.like.{pattern}' for pattern in TKA_CONDITIONS.like_patterns('*'))
+        condition_rows = fetch_for_members(lambda: supabase.table('member_chronic_condition')
+                                           .select('member_id,icd10_code')
+                                           .or_(condition_filter), member_ids)
+        member_ids = sorted({row['member_id'] for row in condition_rows if row['icd10_code'] in TKA_CONDITIONS})
+    
+    if not member_ids:
+        log("⚠ No predictions generated (no eligible members found)")
+        return
+    
+    if timeline is not None:
+        # One vectorized pass over the in-process index, no database read
+        features = build_signal_features(timeline, member_ids, 'TKA', condition_codes=TKA_CONDITIONS)
+    else:
+        # One bulk pass over intent events instead of a query per member
+        signal_counts = count_intent_signals(supabase, member_ids)
+        features = {'signal_count': np.fromiter((signal_counts.get(m, 0) for m in member_ids),
+                                                dtype=np.int64, count=len(member_ids))}
+    
+    if use_cache:
+        # Joined in-process; NaN where a member has no score
+        for field in ('risk_score', 'hcc_score'):
+            features[field] = member_cache.column(field, member_ids).astype(np.float64)
     
-    if predictions:
-        result = supabase.table('prediction_result').upsert(predictions).execute()
-        print(f"  ✓ Generated {len(predictions)} prediction results")
+    # Whole population scored in one vectorized call; CFE_MODEL_VERSION picks the model
+    model = get_model()
+    
+    with BatchWriter(supabase, 'prediction_result') as writer:
+        writer.write_all(score_members(member_ids, features, 'TKA', model))
+    
+    log(f"✓ Generated {writer.rows_written} prediction results")
+
+def aggregate_forecasts(supabase: Client, member_ids: Optional[Set[str]] = None,
+                        member_cache: Optional[MemberDimensionCache] = None,
+                        previous_dimensions: Optional[Dict[str, Dimensions]] = None):
+    """
+    Refresh the forecast_monthly_aggregate cube read by the dashboard
+    
+    Args:
+        supabase: Supabase client
+        member_ids: Members touched by this load (incremental runs); only
+            their (region, network, plan_type) groups are rebuilt. None
+            rebuilds the whole cube
+        member_cache: Member dimension cache; when populated, member
+            dimensions come from it instead of a member table scan
+        previous_dimensions: Former group of members that moved to another
+            (region, network, plan_type); those groups are rebuilt too so
+            they drop the moved members' outcomes and predictions
+    """
+    log("Aggregating monthly forecast cube...")
+    
+    if member_ids is not None and not member_ids:
+        log("✓ No members touched by new data, skipping")
+        return
+    
+    # The group of every touched member decides which members' outcomes
+    # and predictions are re-read
+    if member_cache is not None and len(member_cache) > 0:
+        member_rows = member_cache.rows()
     else:
-        print("  ⚠ No predictions generated (no eligible members found)")
+        member_rows = fetch_all(lambda: supabase.table('member')
+                                .select(','.join(('member_id',) + DIMENSION_COLUMNS))
+                                .order('member_id'))
+    dimensions = {row['member_id']: member_dimensions(row) for row in member_rows}
+    groups = None
+    if member_ids is not None:
+        groups = {dimensions.get(m) or member_dimensions({}) for m in member_ids}
+        groups.update((previous_dimensions or {}).values())
+        member_ids = {m for m, dims in dimensions.items() if dims in groups} | set(member_ids)
+        # Past about half the members, one unfiltered scan beats chunked in_() filters
+        if len(member_ids) * 2 > len(dimensions):
+            member_ids = None
+
+    average_costs = {row['episode_id']: row.get('average_cost')
+                     for row in fetch_all(lambda: supabase.table('episode_definition')
+                                          .select('episode_id,average_cost').order('episode_id'))}
+    cube = ForecastCube(dimensions, average_costs, groups)
+    
+    for outcome in fetch_for_members(lambda: supabase.table('clinical_outcome_event')
+                                     .select('member_id,episode_id,procedure_date,total_cost')
+                                     .eq('is_voided', False), member_ids):
+        cube.add_outcome(outcome)
+    for prediction in fetch_for_members(lambda: supabase.table('prediction_result')
+                                        .select('member_id,episode_id,prediction_date,predicted_event_date,'
+                                                'probability_score,predicted_cost')
+                                        .gte('probability_score', MIN_PROBABILITY), member_ids):
+        cube.add_prediction(prediction)
+    
+    # Cells already in the cube that the rebuilt groups no longer fill are zeroed
+    existing = fetch_all(lambda: supabase.table('forecast_monthly_aggregate')
+                         .select(','.join(KEY_COLUMNS)).order('episode_id').order('month'))
+    updated_at = datetime.now(timezone.utc).isoformat()
+    
+    with BatchWriter(supabase, 'forecast_monthly_aggregate', on_conflict=','.join(KEY_COLUMNS)) as writer:
+        writer.write_all(cube.rows(existing, updated_at))
+    
+    scope = 'all groups' if groups is None else f'{len(groups)} groups'
+    log(f"✓ Refreshed {writer.rows_written} forecast cells ({scope})")
+
+def fetch_all(build_query: Callable[[], Any], page_size: int = PAGE_SIZE) -> Iterator[dict]:
+    """
+    Yield every row of a query, paging with range()
+    
+    PostgREST caps each response (1000 rows by default), so a single
+    execute() silently truncates large result sets. build_query must return
+    a fresh, ordered query builder for each page.
+    """
+    offset = 0
+    while True:
+        rows = build_query().range(offset, offset + page_size - 1).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            break
+        offset += page_size
+
+def load_episode_classifier(supabase: Client) -> EpisodeClassifier:
+    """Fetch episode_code_mapping once and compile it into an in-memory index"""
+    rows = fetch_all(lambda: supabase.table('episode_code_mapping').select(CODE_MAPPING_COLUMNS).order('id'))
+    classifier = EpisodeClassifier(rows)
+    log(f"✓ Compiled {len(classifier)} episode code rules")
+    return classifier
+
+def member_diagnoses(supabase: Client, member_ids: Set[str]) -> Dict[str, List[str]]:
+    """Chronic condition ICD-10 codes per member, in one chunked bulk fetch"""
+    diagnoses = {}
+    if not member_ids:
+        return diagnoses
+    rows = fetch_for_members(lambda: supabase.table('member_chronic_condition').select('member_id,icd10_code'),
+                             member_ids)
+    for row in rows:
+        diagnoses.setdefault(row['member_id'], []).append(row['icd10_code'])
+    return diagnoses
+
+def fetch_since(build_query: Callable[[], Any], key_column: str, watermark: Optional[Tuple[str, str]] = None,
+                page_size: int = PAGE_SIZE) -> Iterator[dict]:
+    """
+    Page through rows after a (created_at, key) high-water mark, oldest
+    first (all rows when None)
+    
+    created_at defaults to the transaction time, so every row of one batch
+    upsert shares it. Offset pages over a tied sort key can skip or repeat
+    rows, so pages are keyset-paged on the unique (created_at, key) pair
+    instead, each page starting after the last row of the previous one.
+    """
+    after = watermark
+    while True:
+        query = build_query()
+        if after:
+            created_at, key = (quote_filter_value(value) for value in after)
+            query = query.or_(f'created_at.gt.{created_at},'
+                              f'and(created_at.eq.{created_at},{key_column}.gt.{key})')
+        rows = query.order('created_at').order(key_column).limit(page_size).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            break
+        after = (rows[-1]['created_at'], rows[-1][key_column])
+
+def quote_filter_value(value: str) -> str:
+    """Double-quote a value for a PostgREST logic filter (timestamps contain ':' and '+')"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def row_watermark(table: str, row: dict) -> Optional[Tuple[str, str]]:
+    """(created_at, key) high-water mark of one source row"""
+    if not row.get('created_at'):
+        return None
+    return row['created_at'], str(row.get(INTENT_SOURCE_KEYS[table]) or '')
+
+def decode_watermark(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Stored high-water mark as (created_at, key)
+    
+    Marks written before keys were recorded hold a bare timestamp; the empty
+    key re-reads that timestamp's rows once rather than risk skipping them.
+    """
+    if not value:
+        return None
+    if value.startswith('['):
+        created_at, key = json.loads(value)
+        return created_at, key
+    return value, ''
+
+def max_watermark(current: Optional[Tuple[str, str]], value: Optional[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+    """Later of two (created_at, key) marks, ignoring missing values"""
+    if not value:
+        return current
+    return value if not current or value > current else current
+
+def fetch_for_members(build_query: Callable[[], Any], member_ids: Optional[Iterable[str]] = None,
+                      order_by: str = 'member_id') -> Iterator[dict]:
+    """
+    Yield every row of a query, restricted to member_ids when given
+    
+    Member IDs are sent in chunks of MEMBER_ID_CHUNK_SIZE and each chunk is
+    paged with fetch_all. build_query must return a fresh query builder.
+    """
+    if member_ids is None:
+        yield from fetch_all(lambda: build_query().order(order_by))
+        return
+    
+    member_ids = sorted(member_ids)
+    for i in range(0, len(member_ids), MEMBER_ID_CHUNK_SIZE):
+        chunk = member_ids[i:i + MEMBER_ID_CHUNK_SIZE]
+        yield from fetch_all(lambda: build_query().in_('member_id', chunk).order(order_by))
+
+def count_intent_signals(supabase: Client, member_ids: List[str]) -> Counter:
+    """Count clinical intent events per member with bulk, member_id-only fetches"""
+    rows = fetch_for_members(lambda: supabase.table('clinical_intent_event').select('member_id'), member_ids)
+    return Counter(row['member_id'] for row in rows)
+
+# Stages whose return value is the set of member IDs they wrote
+LOAD_STAGES = ('members', 'eligibility', 'prior_auth', 'rx_benefit', 'claims')
+
+def build_pipeline(supabase: Client, ledger: Optional[IngestLedger] = None,
+                   member_cache: Optional[MemberDimensionCache] = None,
+                   metrics: Optional[RunMetrics] = None,
+                   timeline: Optional[MemberTimeline] = None) -> Pipeline:
+    """
+    Declare the load as a DAG; referential integrity comes from depends_on
+    
+    Full runs regenerate everything; incremental runs only derive events
+    from new source rows and rescore members touched by the load stages
+    """
+    pipeline = Pipeline(metrics)
+    
+    # Full runs rebuild the timeline from this run's signals; an empty index
+    # on an incremental run is rebuilt from the database once loaded
+    bootstrap_timeline = False
+    if timeline is not None:
+        if not ledger:
+            timeline.clear()
+        bootstrap_timeline = bool(ledger) and len(timeline) == 0
+    
+    def touched_members() -> Optional[Set[str]]:
+        if not ledger:
+            return None
+        touched = set().union(*(pipeline.results[name] for name in LOAD_STAGES))
+        log(f"{len(touched)} members touched by new data")
+        return touched
+    
+    def predictions():
+        member_ids = touched_members()
+        generate_predictions(supabase, member_ids, member_cache, timeline)
+        return member_ids
+    
+    # Groups that members moved out of, recorded by load_members for the forecast refresh
+    previous_dimensions: Dict[str, Dimensions] = {}
+    
+    pipeline.add('members', partial(load_members, supabase, ledger, member_cache, timeline, previous_dimensions))
+    # Every source table references member
+    pipeline.add('eligibility', partial(load_eligibility_inquiries, supabase, ledger), depends_on=['members'])
+    pipeline.add('prior_auth', partial(load_prior_auths, supabase, ledger), depends_on=['members'])
+    pipeline.add('rx_benefit', partial(load_rx_benefit_inquiries, supabase, ledger, timeline), depends_on=['members'])
+    pipeline.add('claims', partial(load_claims, supabase, ledger), depends_on=['members'])
+    pipeline.add('intent_events', partial(generate_intent_events, supabase, ledger, timeline),
+                 depends_on=['eligibility', 'prior_auth'])
+    scoring_inputs = [*LOAD_STAGES, 'intent_events']
+    if timeline is not None:
+        pipeline.add('timeline', partial(save_timeline, supabase, timeline, bootstrap_timeline),
+                     depends_on=scoring_inputs)
+        scoring_inputs.append('timeline')
+    pipeline.add('predictions', predictions, depends_on=scoring_inputs)
+    # Outcomes come from the claims; predictions returns the touched members
+    pipeline.add('forecasts', lambda: aggregate_forecasts(supabase, pipeline.results['predictions'], member_cache,
+                                                          previous_dimensions),
+                 depends_on=['predictions', 'claims'])
+    return pipeline
 
 def main():
     """Main execution"""
+    parser = argparse.ArgumentParser(description='Load EDI data into Supabase')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip interchanges/files already in the ingest ledger, derive intent '
+                             'events from new source rows only and rescore touched members')
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER_PATH, help='Ingest ledger SQLite file')
+    parser.add_argument('--member-cache', default=DEFAULT_MEMBER_CACHE_PATH,
+                        help='Member dimension cache file (incremental runs upsert only changed members)')
+    parser.add_argument('--timeline', default=DEFAULT_TIMELINE_PATH,
+                        help='Member timeline index file (per-member signal history used for scoring)')
+    parser.add_argument('--metrics-json', help='Write a JSON run report with per-stage metrics')
+    parser.add_argument('--metrics-prom', help='Write per-stage metrics in Prometheus text format')
+    parser.add_argument('--profile', help="Comma separated parsers to profile (e.g. parse_837), or 'all'")
+    parser.add_argument('--profile-mode', choices=['cprofile', 'sample'], help='Profiler (default cprofile)')
+    parser.add_argument('--profile-dir', help='Directory for profiler output (default profiles/)')
+    args = parser.parse_args()
+    configure_profiling(args.profile, args.profile_mode, args.profile_dir)
+    
     print("="*60)
     print("Clinical Forecasting Engine - EDI Data Loader")
     print("="*60)
@@ -515,19 +991,21 @@ def main():
     # Load environment variables
     # Removed load_env_file() as it's no longer needed with the new env variable logic
     
+    ledger = IngestLedger(args.ledger) if args.incremental else None
+    # Full runs only keep the member cache and timeline in memory (scoring
+    # still reads them); incremental runs persist them for the next run
+    member_cache = MemberDimensionCache(args.member_cache if args.incremental else None)
+    metrics = RunMetrics('load_to_supabase')
+    timeline = MemberTimeline(args.timeline if args.incremental else None)
+    
     try:
         # Initialize Supabase client
         supabase = get_supabase_client()
         print("\n✓ Connected to Supabase")
         
-        # Load data in sequence (maintains referential integrity)
-        load_members(supabase)
-        load_eligibility_inquiries(supabase)
-        load_prior_auths(supabase)
-        load_rx_benefit_inquiries(supabase)
-        load_claims(supabase)
-        generate_intent_events(supabase)
-        generate_predictions(supabase)
+        # Stages run as soon as the stages they depend on have finished
+        asyncio.run(build_pipeline(supabase, ledger, member_cache, metrics, timeline).run())
+        metrics.print_summary()
         
         print("\n" + "="*60)
         print("✓ Data loading complete!")
@@ -536,6 +1014,14 @@ def main():
     except Exception as e:
         print(f"\n✗ Error: {str(e)}")
         sys.exit(1)
+    finally:
+        if ledger:
+            ledger.close()
+        # Written for failed runs too, to show how far the load got
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,296 @@
+"""
+Member dimension cache
+
+Compact, array-backed copy of the member attributes the loaders join on:
+region, network, plan type, risk and HCC scores and a chronic-condition
+bitset, one fixed-width record per member. Text attributes are dictionary
+encoded (uint16 codes), condition codes are bits in a uint64 bitset and
+records are kept sorted by member_id, so a batch of members is joined with
+one np.searchsorted call instead of a database round trip, at about 40
+bytes per member for 10-character IDs.
+
+The cache is persisted to a single file (a JSON header followed by the raw
+records) and opened with np.memmap, so later runs start without re-reading
+members.json or querying the member table.
+
+Each record also carries a 64-bit hash of the member's source record, so
+changed() picks out only the new or modified members of a reload and the
+loader upserts just those.
+"""
+
+import hashlib
+import json
+import os
+import struct
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MEMBER_CACHE_PATH = os.environ.get('CFE_MEMBER_CACHE_PATH', 'member_cache.bin')
+
+MAGIC = b'CFEMDC01'
+PREFIX = struct.Struct('<8sI')
+
+# Records start on an aligned offset so the memory map is cheap to read
+ALIGNMENT = 64
+
+# Dictionary-encoded member columns; code 0 is reserved for missing values
+CATEGORY_FIELDS = ('geographic_region', 'network', 'plan_type')
+SCORE_FIELDS = ('risk_score', 'hcc_score')
+
+class MemberDimensions(NamedTuple):
+    member_id: str
+    geographic_region: Optional[str]
+    network: Optional[str]
+    plan_type: Optional[str]
+    risk_score: Optional[float]
+    hcc_score: Optional[float]
+    conditions: Tuple[str, ...]
+
+def member_hash(member: Dict) -> int:
+    """64-bit digest of a source member record, for change detection"""
+    encoded = json.dumps(member, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), 'little')
+
+def record_dtype(id_width: int, condition_words: int) -> np.dtype:
+    """Record layout for member IDs up to id_width bytes and condition_words * 64 condition codes"""
+    return np.dtype([('member_id', f'S{max(id_width, 1)}')] +
+                    [(field, '<u2') for field in CATEGORY_FIELDS] +
+                    [(field, '<f4') for field in SCORE_FIELDS] +
+                    [('conditions', '<u8', (max(condition_words, 1),)),
+                     ('row_hash', '<u8')])
+
+def data_offset(header_size: int) -> int:
+    """File offset of the first record for a JSON header of header_size bytes"""
+    return -(-(PREFIX.size + header_size) // ALIGNMENT) * ALIGNMENT
+
+class MemberDimensionCache:
+    """Sorted, fixed-width member records with O(log n) vectorized lookups"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Cache file; loaded (memory-mapped) if it exists and
+                written by save()
+        """
+        self.path = path
+        self.vocabularies: Dict[str, List[Optional[str]]] = {field: [None] for field in CATEGORY_FIELDS}
+        self.conditions: List[str] = []
+        self._records = np.empty(0, dtype=record_dtype(1, 1))
+        if path and os.path.exists(path):
+            self._open(path)
+        self._reindex()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, member_id: str) -> bool:
+        return self.index([member_id])[0] >= 0
+
+    def _open(self, path: str):
+        with open(path, 'rb') as f:
+            magic, header_size = PREFIX.unpack(f.read(PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a member dimension cache")
+            header = json.loads(f.read(header_size))
+
+        self.vocabularies = header['vocabularies']
+        self.conditions = header['conditions']
+        dtype = record_dtype(header['id_width'], header['condition_words'])
+        if header['count']:
+            self._records = np.memmap(path, dtype=dtype, mode='r', offset=data_offset(header_size),
+                                      shape=(header['count'],))
+        else:
+            self._records = np.empty(0, dtype=dtype)
+
+    def _reindex(self):
+        self._codes = {field: {value: code for code, value in enumerate(values)}
+                       for field, values in self.vocabularies.items()}
+        self._condition_bits = {code: bit for bit, code in enumerate(self.conditions)}
+
+    def save(self, path: Optional[str] = None):
+        """Write the cache atomically (temp file + rename); in-memory without a path"""
+        path = path or self.path
+        if not path:
+            return
+        records = self._records
+        header = json.dumps({
+            'count': len(records),
+            'id_width': records.dtype['member_id'].itemsize,
+            'condition_words': records.dtype['conditions'].shape[0],
+            'vocabularies': self.vocabularies,
+            'conditions': self.conditions
+        }).encode()
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, len(header)))
+            f.write(header)
+            f.write(b'\0' * (data_offset(len(header)) - PREFIX.size - len(header)))
+            f.write(records.tobytes())
+        os.replace(temp_path, path)
+        self.path = path
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def index(self, member_ids: Iterable[str]) -> np.ndarray:
+        """Record position of each member ID, -1 where the member is unknown"""
+        # Unsized bytes dtype, so IDs longer than the stored width never match truncated
+        ids = np.array([m.encode() for m in member_ids], dtype=bytes)
+        if not len(ids):
+            return np.empty(0, dtype=np.int64)
+        stored = self._records['member_id']
+        positions = np.searchsorted(stored, ids)
+        found = positions < len(stored)
+        found[found] = stored[positions[found]] == ids[found]
+        return np.where(found, positions, -1)
+
+    def column(self, field: str, member_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        Raw column values (dictionary codes for text fields, NaN for missing
+        scores), for every member or for member_ids in order; unknown members
+        get 0 / NaN
+        """
+        values = self._records[field]
+        if member_ids is None:
+            return np.array(values)
+        positions = self.index(member_ids)
+        found = positions >= 0
+        result = np.full(len(positions), np.nan if values.dtype.kind == 'f' else 0, dtype=values.dtype)
+        result[found] = values[positions[found]]
+        return result
+
+    def get(self, member_id: str) -> Optional[MemberDimensions]:
+        """Decoded dimensions of one member"""
+        position = self.index([member_id])[0]
+        if position < 0:
+            return None
+        record = self._records[position]
+        return MemberDimensions(
+            member_id,
+            *(self.vocabularies[field][record[field]] for field in CATEGORY_FIELDS),
+            *(None if np.isnan(record[field]) else round(float(record[field]), 2) for field in SCORE_FIELDS),
+            tuple(self._decode_conditions(record['conditions']))
+        )
+
+    def rows(self) -> Iterator[Dict]:
+        """Every member as a dict keyed like the member table (without conditions)"""
+        columns = {'member_id': np.char.decode(self._records['member_id']).tolist()}
+        for field in CATEGORY_FIELDS:
+            columns[field] = np.array(self.vocabularies[field], dtype=object)[self._records[field]].tolist()
+        for field in SCORE_FIELDS:
+            values = self._records[field].astype(np.float64)
+            columns[field] = [None if v != v else round(v, 2) for v in values.tolist()]
+        for values in zip(*columns.values()):
+            yield dict(zip(columns, values))
+
+    def categories(self, member_ids: Iterable[str]) -> Iterator[Dict]:
+        """Region, network and plan type of the cached members among member_ids, keyed like the member table"""
+        member_ids = list(member_ids)
+        positions = self.index(member_ids)
+        found = np.nonzero(positions >= 0)[0]
+        records = self._records[positions[found]]
+        columns = {'member_id': [member_ids[i] for i in found.tolist()]}
+        for field in CATEGORY_FIELDS:
+            columns[field] = np.array(self.vocabularies[field], dtype=object)[records[field]].tolist()
+        for values in zip(*columns.values()):
+            yield dict(zip(columns, values))
+
+    def members_with_conditions(self, codes, member_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Member IDs with at least one chronic condition in codes (any container
+        supporting `in`, e.g. a CodeTrie), sorted; optionally limited to member_ids
+        """
+        mask = np.zeros(self._records.dtype['conditions'].shape[0], dtype=np.uint64)
+        for bit, code in enumerate(self.conditions):
+            if code in codes:
+                mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        if not mask.any():
+            return []
+
+        records = self._records
+        if member_ids is not None:
+            positions = self.index(member_ids)
+            records = records[np.unique(positions[positions >= 0])]
+        matched = (records['conditions'] & mask).any(axis=1)
+        return np.char.decode(records['member_id'][matched]).tolist()
+
+    def _decode_conditions(self, words: np.ndarray) -> Iterator[str]:
+        for bit, code in enumerate(self.conditions):
+            if int(words[bit // 64]) >> (bit % 64) & 1:
+                yield code
+
+    # ------------------------------------------------------------------
+    # Change detection and updates
+    # ------------------------------------------------------------------
+
+    def changed(self, members: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield the source member records that are new or differ from the cache"""
+        members = iter(members)
+        while True:
+            page = list(islice(members, 10000))
+            if not page:
+                return
+            positions = self.index(member['member_id'] for member in page)
+            hashes = np.fromiter((member_hash(member) for member in page), dtype=np.uint64, count=len(page))
+            changed = positions < 0
+            known = ~changed
+            changed[known] = self._records['row_hash'][positions[known]] != hashes[known]
+            for member, is_changed in zip(page, changed.tolist()):
+                if is_changed:
+                    yield member
+
+    def update(self, members: Iterable[Dict]):
+        """Insert or replace members from source records (members.json format)"""
+        members = list(members)
+        if not members:
+            return
+
+        # Later duplicates win, as they would in a sequence of upserts
+        latest = {member['member_id']: member for member in members}
+        for member in latest.values():
+            for field in CATEGORY_FIELDS:
+                value = member.get(field)
+                if value not in self._codes[field]:
+                    self._codes[field][value] = len(self.vocabularies[field])
+                    self.vocabularies[field].append(value)
+            for condition in member.get('chronic_conditions') or []:
+                code = condition.get('icd10_code')
+                if code and code not in self._condition_bits:
+                    self._condition_bits[code] = len(self.conditions)
+                    self.conditions.append(code)
+        if any(len(values) > 0xFFFF for values in self.vocabularies.values()):
+            raise ValueError("More than 65535 distinct values in a member dimension")
+
+        id_width = max([self._records.dtype['member_id'].itemsize] + [len(m.encode()) for m in latest])
+        dtype = record_dtype(id_width, -(-len(self.conditions) // 64))
+        updates = np.zeros(len(latest), dtype=dtype)
+        for i, (member_id, member) in enumerate(latest.items()):
+            record = updates[i]
+            record['member_id'] = member_id.encode()
+            for field in CATEGORY_FIELDS:
+                record[field] = self._codes[field][member.get(field)]
+            for field in SCORE_FIELDS:
+                record[field] = np.nan if member.get(field) is None else member[field]
+            for condition in member.get('chronic_conditions') or []:
+                bit = self._condition_bits.get(condition.get('icd10_code'))
+                if bit is not None:
+                    record['conditions'][bit // 64] |= np.uint64(1 << (bit % 64))
+            record['row_hash'] = member_hash(member)
+
+        # Records not being replaced are copied into the (possibly wider)
+        # layout, then everything is re-sorted by member_id
+        existing = self._records[np.isin(self._records['member_id'], updates['member_id'], invert=True)]
+        widened = np.zeros(len(existing), dtype=dtype)
+        for field in dtype.names:
+            if field == 'conditions':
+                words = existing.dtype['conditions'].shape[0]
+                widened['conditions'][:, :words] = existing['conditions']
+            else:
+                widened[field] = existing[field]
+
+        records = np.concatenate([widened, updates])
+        self._records = records[np.argsort(records['member_id'], kind='stable')]
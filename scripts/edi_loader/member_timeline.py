@@ -0,0 +1,375 @@
+"""
+Member signal timeline index
+
+In-process copy of every member's intent signals, so scoring can ask "what
+did member X do in the last N days" without a query per member or a full
+clinical_intent_event fetch. Signals are grouped by member and sorted by
+day in contiguous column arrays (day, event type, episode, category,
+strength); offsets[i]:offsets[i + 1] is member i's slice, like a CSR matrix.
+
+Because every signal also has a (member, day) sort key, windowed counts,
+recency-weighted strength sums and first/last lookups are binary searches:
+O(log n) per member, done for a whole batch of members in one
+np.searchsorted call. Exponentially decayed sums locate each member's
+window the same way and sum it with one np.add.reduceat over weights cached
+per half-life.
+
+The loader adds signals as it derives intent events (plus chronic
+condition diagnoses and Rx benefit inquiries) and saves the index to
+a single file (a JSON header followed by the raw arrays), which is opened
+with np.memmap, so scoring jobs start without re-reading the database.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+DEFAULT_TIMELINE_PATH = os.environ.get('CFE_TIMELINE_PATH', 'member_timeline.bin')
+
+MAGIC = b'CFETML01'
+PREFIX = struct.Struct('<8sI')
+
+# Arrays start on aligned offsets so the memory map is cheap to read
+ALIGNMENT = 64
+
+# Dictionary-encoded signal columns; code 0 is reserved for missing values
+CATEGORY_FIELDS = ('event_type', 'episode_id', 'category')
+
+# Signal columns stored per signal, with their on-disk types
+SIGNAL_COLUMNS = {
+    'day': '<i4',           # days since 1970-01-01
+    'event_type': '<u2',
+    'episode_id': '<u2',
+    'category': '<u2',      # e.g. drug class of an Rx signal
+    'strength': '<f4',
+    'signal_key': '<u8',    # identity of the signal, for de-duplication
+}
+
+# Days are shifted into uint32 range for the (member, day) sort keys
+_DAY_BIAS = 1 << 31
+
+DateLike = Union[str, np.datetime64, None]
+
+def signal_key(signal: Dict) -> int:
+    """64-bit identity of a signal; re-adding the same signal replaces it"""
+    identity = signal.get('intent_event_id') or signal.get('event_source_id')
+    if identity is None:
+        # Loader-derived events carry their source transaction in metadata
+        metadata = signal.get('metadata') or {}
+        identity = ','.join(f"{key}={metadata[key]}" for key in sorted(metadata))
+    encoded = '\x1f'.join((str(signal.get('member_id')), str(signal.get('event_type')),
+                           str(signal.get('episode_id')), str(signal.get('event_date'))[:19],
+                           str(identity))).encode()
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), 'little')
+
+def to_day(value: DateLike) -> int:
+    """Days since 1970-01-01 of an ISO date/timestamp or datetime64"""
+    if isinstance(value, str):
+        value = value[:10]
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+def data_offset(position: int) -> int:
+    """Next aligned file offset at or after position"""
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+class MemberTimeline:
+    """Per-member, day-sorted signal arrays with O(log n) window queries"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Index file; loaded (memory-mapped) if it exists and
+                written by save()
+        """
+        self.path = path
+        self.vocabularies: Dict[str, List[Optional[str]]] = {field: [None] for field in CATEGORY_FIELDS}
+        self.member_ids = np.empty(0, dtype='S1')
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in SIGNAL_COLUMNS.items()}
+        self._pending: List[Dict] = []
+        # Pipeline stages may add from different threads
+        self._pending_lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._open(path)
+        self._reindex()
+
+    def __len__(self) -> int:
+        """Number of signals"""
+        self._merge()
+        return len(self.columns['day'])
+
+    @property
+    def member_count(self) -> int:
+        self._merge()
+        return len(self.member_ids)
+
+    def _open(self, path: str):
+        with open(path, 'rb') as f:
+            magic, header_size = PREFIX.unpack(f.read(PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a member timeline")
+            header = json.loads(f.read(header_size))
+
+        self.vocabularies = header['vocabularies']
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            if spec['length']:
+                arrays[name] = np.memmap(path, dtype=spec['dtype'], mode='r', offset=spec['offset'],
+                                         shape=(spec['length'],))
+            else:
+                arrays[name] = np.empty(0, dtype=spec['dtype'])
+        self.member_ids = arrays.pop('member_ids')
+        self.offsets = arrays.pop('offsets')
+        self.columns = arrays
+
+    def _reindex(self):
+        self._codes = {field: {value: code for code, value in enumerate(values)}
+                       for field, values in self.vocabularies.items()}
+        self._sort_keys = None
+        self._decay_weight_cache = {}
+
+    def save(self, path: Optional[str] = None):
+        """Write the index atomically (temp file + rename); in-memory without a path"""
+        self._merge()
+        path = path or self.path
+        if not path:
+            return
+        arrays = {'member_ids': self.member_ids, 'offsets': self.offsets, **self.columns}
+
+        # Header size depends on the offsets it records, so lay out with a
+        # generous fixed header allowance
+        specs = {name: {'dtype': array.dtype.str, 'length': len(array)} for name, array in arrays.items()}
+        header_room = data_offset(PREFIX.size + len(json.dumps({
+            'vocabularies': self.vocabularies, 'arrays': specs})) + 64 * len(specs) + 256)
+        position = header_room
+        for name, array in arrays.items():
+            specs[name]['offset'] = position
+            position = data_offset(position + array.nbytes)
+        header = json.dumps({'vocabularies': self.vocabularies, 'arrays': specs}).encode()
+        if PREFIX.size + len(header) > header_room:
+            raise ValueError("Timeline header larger than its reserved space")
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.write(b'\0' * (specs[name]['offset'] - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(temp_path, path)
+        self.path = path
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def add(self, signals: Iterable[Dict]):
+        """
+        Queue signals (clinical_intent_event-shaped dicts: member_id,
+        event_date, event_type, episode_id, signal_strength and an optional
+        category); they are merged in on the next query or save()
+        """
+        signals = [signal for signal in signals if signal.get('member_id') and signal.get('event_date')]
+        with self._pending_lock:
+            self._pending.extend(signals)
+
+    def clear(self):
+        """Drop every signal (e.g. before a full rebuild)"""
+        self.vocabularies = {field: [None] for field in CATEGORY_FIELDS}
+        self.member_ids = np.empty(0, dtype='S1')
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in SIGNAL_COLUMNS.items()}
+        self._pending = []
+        self._reindex()
+
+    def _merge(self):
+        with self._pending_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+
+        for signal in pending:
+            for field in CATEGORY_FIELDS:
+                value = signal.get(field)
+                if value not in self._codes[field]:
+                    self._codes[field][value] = len(self.vocabularies[field])
+                    self.vocabularies[field].append(value)
+        if any(len(values) > 0xFFFF for values in self.vocabularies.values()):
+            raise ValueError("More than 65535 distinct values in a timeline column")
+
+        count = len(pending)
+        new_members = np.array([s['member_id'].encode() for s in pending])
+        new_columns = {
+            'day': np.array([str(s['event_date'])[:10] for s in pending], dtype='datetime64[D]').astype(np.int32),
+            **{field: np.fromiter((self._codes[field][s.get(field)] for s in pending), dtype=np.uint16, count=count)
+               for field in CATEGORY_FIELDS},
+            'strength': np.array([np.nan if s.get('signal_strength') is None else float(s['signal_strength'])
+                                  for s in pending], dtype=np.float32),
+            'signal_key': np.fromiter((signal_key(s) for s in pending), dtype=np.uint64, count=count),
+        }
+
+        members = np.concatenate([np.repeat(self.member_ids, np.diff(self.offsets)), new_members])
+        columns = {name: np.concatenate([self.columns[name], new_columns[name]]) for name in SIGNAL_COLUMNS}
+
+        # Re-added signals replace the earlier copy (last one wins)
+        reversed_keys = columns['signal_key'][::-1]
+        _, last = np.unique(reversed_keys, return_index=True)
+        keep = np.sort(len(reversed_keys) - 1 - last)
+
+        members = members[keep]
+        columns = {name: values[keep] for name, values in columns.items()}
+        order = np.lexsort((columns['day'], members))
+
+        members = members[order]
+        self.columns = {name: values[order] for name, values in columns.items()}
+        self.member_ids, starts = np.unique(members, return_index=True)
+        self.offsets = np.append(starts, len(members)).astype(np.int64)
+        self._sort_keys = None
+        self._decay_weight_cache = {}
+
+    def select(self, event_types: Optional[Sequence[str]] = None,
+               episode_ids: Optional[Sequence[str]] = None) -> 'MemberTimeline':
+        """In-memory timeline restricted to some event types and/or episodes"""
+        self._merge()
+        mask = np.ones(len(self.columns['day']), dtype=bool)
+        for field, values in (('event_type', event_types), ('episode_id', episode_ids)):
+            if values is not None:
+                mask &= np.isin(self.columns[field], self.codes(field, values))
+
+        subset = MemberTimeline()
+        subset.vocabularies = {field: list(values) for field, values in self.vocabularies.items()}
+        members = np.repeat(np.arange(len(self.member_ids)), np.diff(self.offsets))[mask]
+        kept, starts = np.unique(members, return_index=True)
+        subset.member_ids = self.member_ids[kept]
+        subset.offsets = np.append(starts, len(members)).astype(np.int64)
+        subset.columns = {name: np.asarray(values)[mask] for name, values in self.columns.items()}
+        subset._reindex()
+        return subset
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def index(self, member_ids: Iterable[str]) -> np.ndarray:
+        """Position of each member ID in member_ids, -1 where the member has no signals"""
+        self._merge()
+        # Unsized bytes dtype, so IDs longer than the stored width never match truncated
+        ids = np.array([m.encode() for m in member_ids], dtype=bytes)
+        if not len(ids):
+            return np.empty(0, dtype=np.int64)
+        positions = np.searchsorted(self.member_ids, ids)
+        found = positions < len(self.member_ids)
+        found[found] = self.member_ids[positions[found]] == ids[found]
+        return np.where(found, positions, -1)
+
+    def gather(self, member_ids: Sequence[str]):
+        """
+        Signal positions of several members at once
+
+        Returns:
+            (rows, positions): for every signal of the requested members, the
+            index of its member in member_ids and its position in columns
+        """
+        members = self.index(member_ids)
+        found = np.nonzero(members >= 0)[0]
+        starts = self.offsets[members[found]]
+        lengths = self.offsets[members[found] + 1] - starts
+        rows = np.repeat(found, lengths)
+        # Concatenated ranges starts[i]:starts[i] + lengths[i]
+        range_starts = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum(), dtype=np.int64) + np.repeat(starts - range_starts, lengths)
+        return rows, positions
+
+    def codes(self, field: str, values: Iterable[Optional[str]]) -> List[int]:
+        """Dictionary codes of the values of a text column that occur in the timeline"""
+        self._merge()
+        return [self._codes[field][value] for value in values if value in self._codes[field]]
+
+    def member_signals(self, member_id: str) -> Dict[str, np.ndarray]:
+        """One member's signal columns (views), sorted by day"""
+        position = self.index([member_id])[0]
+        if position < 0:
+            return {name: values[:0] for name, values in self.columns.items()}
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return {name: values[start:end] for name, values in self.columns.items()}
+
+    def window_counts(self, member_ids: Sequence[str], start: DateLike = None, end: DateLike = None) -> np.ndarray:
+        """Signals per member with start <= day <= end (either bound optional)"""
+        low, high = self._bounds(member_ids, start, end)
+        return high - low
+
+    def decayed_sums(self, member_ids: Sequence[str], as_of: DateLike, half_life_days: float,
+                     start: DateLike = None) -> np.ndarray:
+        """
+        Recency-weighted signal strength per member: sum of strength *
+        0.5 ** (age / half_life_days) over signals on or before as_of
+        (and on or after start); missing strengths count as 0
+        """
+        low, high = self._bounds(member_ids, start, as_of)
+        weights, reference = self._decay_weights(half_life_days)
+        # Each member's window is summed on its own (one reduceat call for
+        # the batch), so old, tiny weights keep their precision instead of
+        # cancelling in a difference of two large running totals
+        bounds = np.empty(2 * len(low), dtype=np.int64)
+        bounds[0::2], bounds[1::2] = low, high
+        sums = np.add.reduceat(weights, bounds)[0::2] if len(bounds) else np.zeros(0)
+        # reduceat yields weights[low] for an empty window
+        sums = np.where(high > low, sums, 0.0)
+        return sums * np.exp2((reference - to_day(as_of)) / half_life_days)
+
+    def first_signal(self, member_ids: Sequence[str], start: DateLike = None) -> np.ndarray:
+        """Day (datetime64[D]) of each member's first signal on or after start; NaT if none"""
+        low, high = self._bounds(member_ids, start, None)
+        return self._days_at(low, low < high)
+
+    def last_signal(self, member_ids: Sequence[str], as_of: DateLike = None) -> np.ndarray:
+        """Day (datetime64[D]) of each member's last signal on or before as_of; NaT if none"""
+        low, high = self._bounds(member_ids, None, as_of)
+        return self._days_at(high - 1, low < high)
+
+    def _days_at(self, positions: np.ndarray, found: np.ndarray) -> np.ndarray:
+        days = np.full(len(positions), np.datetime64('NaT'), dtype='datetime64[D]')
+        days[found] = self.columns['day'][positions[found]].astype('datetime64[D]')
+        return days
+
+    def _bounds(self, member_ids: Sequence[str], start: DateLike, end: DateLike):
+        """[low, high) signal positions per member for the day window (empty for unknown members)"""
+        positions = self.index(member_ids)
+        found = positions >= 0
+        member = np.where(found, positions, 0).astype(np.uint64) << np.uint64(32)
+
+        keys = self._keys()
+        low_day = np.uint64(0 if start is None else to_day(start) + _DAY_BIAS)
+        high_day = np.uint64((1 << 32) - 1 if end is None else to_day(end) + _DAY_BIAS)
+        low = np.searchsorted(keys, member | low_day, side='left')
+        high = np.searchsorted(keys, member | high_day, side='right')
+        high = np.where(found, high, low)
+        return low, high
+
+    def _keys(self) -> np.ndarray:
+        """(member position << 32 | biased day) per signal; sorted like the signals"""
+        self._merge()
+        if self._sort_keys is None:
+            members = np.repeat(np.arange(len(self.member_ids), dtype=np.uint64), np.diff(self.offsets))
+            days = (self.columns['day'].astype(np.int64) + _DAY_BIAS).astype(np.uint64)
+            self._sort_keys = (members << np.uint64(32)) | days
+        return self._sort_keys
+
+    def _decay_weights(self, half_life_days: float):
+        """
+        strength * 2 ** ((day - reference) / half_life) per signal, cached per
+        half-life, with a trailing 0 so every window bound is a valid index
+        """
+        self._merge()
+        if half_life_days not in self._decay_weight_cache:
+            days = self.columns['day'].astype(np.float64)
+            # Relative to the latest day, so the weights never overflow
+            reference = days.max() if len(days) else 0.0
+            weights = np.nan_to_num(self.columns['strength'].astype(np.float64)) * np.exp2((days - reference) / half_life_days)
+            self._decay_weight_cache[half_life_days] = (np.append(weights, 0.0), reference)
+        return self._decay_weight_cache[half_life_days]
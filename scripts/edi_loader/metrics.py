@@ -0,0 +1,401 @@
+"""
+Run metrics and parser profiling for the loaders
+
+RunMetrics collects one StageMetrics per pipeline stage: wall and CPU time,
+records and bytes read, rows written, upsert/COPY batch latency histogram
+and retries, plus the run's peak RSS. It can be written as a JSON run
+report and as a Prometheus text-format file (e.g. for the node_exporter
+textfile collector).
+
+The stage being measured is tracked in a ContextVar, so writers created
+inside a stage (BatchWriter, CopyDatabaseConnection) report into it without
+being passed a metrics object, and concurrent pipeline stages (separate
+asyncio tasks / threads) don't mix their numbers.
+
+Parsers can be profiled without editing code: set CFE_PROFILE to a comma
+separated list of parser names (or 'all'), CFE_PROFILE_MODE to 'cprofile'
+(default; writes .prof files for pstats/snakeviz) or 'sample' (a
+low-overhead stack sampler writing folded stacks for flamegraph.pl /
+speedscope), and CFE_PROFILE_DIR for the output directory.
+"""
+
+import cProfile
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then reported as None
+    resource = None
+
+# Upper bounds (seconds) of the batch latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Seconds between stack samples in 'sample' profiling mode
+SAMPLE_INTERVAL = 0.005
+
+_current_stage: ContextVar[Optional['StageMetrics']] = ContextVar('cfe_current_stage', default=None)
+
+def current_stage() -> Optional['StageMetrics']:
+    """The stage being measured in this context (None outside RunMetrics.stage)"""
+    return _current_stage.get()
+
+def record_input(file_path: str):
+    """Count an input file's size as bytes read by the current stage"""
+    stage = current_stage()
+    if stage is not None:
+        stage.add(bytes_read=os.path.getsize(file_path))
+
+def peak_rss_bytes(children: bool = False) -> Optional[int]:
+    """Peak resident set size of this process (or of its largest finished child)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative, Prometheus style)"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """Observations <= each bucket bound, with +Inf last"""
+        return list(itertools.accumulate(self.counts))
+
+    def to_dict(self) -> Dict:
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'buckets': dict(zip(bounds, self.cumulative()))
+        }
+
+class StageMetrics:
+    """Counters and timings for one stage; safe to update from writer threads"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.parse_cpu_seconds = 0.0
+        self.records = 0
+        self.bytes_read = 0
+        self.rows_written = 0
+        self.batches = 0
+        self.retries = 0
+        self.batch_seconds = Histogram()
+        self._lock = threading.Lock()
+
+    @property
+    def records_per_second(self) -> Optional[float]:
+        return self.records / self.wall_seconds if self.wall_seconds else None
+
+    def add(self, records: int = 0, bytes_read: int = 0, parse_cpu_seconds: float = 0.0):
+        """Count records read by the stage"""
+        with self._lock:
+            self.records += records
+            self.bytes_read += bytes_read
+            self.parse_cpu_seconds += parse_cpu_seconds
+
+    def observe_batch(self, rows: int, seconds: float, retries: int = 0):
+        """Record one written batch"""
+        with self._lock:
+            self.rows_written += rows
+            self.batches += 1
+            self.retries += retries
+            self.batch_seconds.observe(seconds)
+
+    def to_dict(self) -> Dict:
+        rate = self.records_per_second
+        return {
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'parse_cpu_seconds': round(self.parse_cpu_seconds, 6),
+            'records': self.records,
+            'records_per_second': round(rate, 1) if rate is not None else None,
+            'bytes_read': self.bytes_read,
+            'rows_written': self.rows_written,
+            'batches': self.batches,
+            'retries': self.retries,
+            'batch_latency_seconds': self.batch_seconds.to_dict()
+        }
+
+class RunMetrics:
+    """Per-stage metrics of one loader run"""
+
+    def __init__(self, run: str):
+        self.run = run
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self.stages: Dict[str, StageMetrics] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """
+        Measure a block as the named stage
+
+        Re-entering a stage adds to its totals. cpu_seconds is process CPU
+        over the block, so stages that overlap share it; parse_cpu_seconds
+        is measured on the parser thread only.
+        """
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageMetrics(name)
+        token = _current_stage.set(stage)
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield stage
+        finally:
+            stage.wall_seconds += time.perf_counter() - started
+            stage.cpu_seconds += time.process_time() - cpu_started
+            _current_stage.reset(token)
+
+    def report(self) -> Dict:
+        """Structured run report"""
+        return {
+            'run': self.run,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(time.perf_counter() - self._started, 6),
+            'cpu_seconds': round(time.process_time() - self._cpu_started, 6),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'peak_rss_children_bytes': peak_rss_bytes(children=True),
+            'stages': {name: stage.to_dict() for name, stage in self.stages.items()}
+        }
+
+    def write_json(self, path: str):
+        _write_atomic(path, json.dumps(self.report(), indent=2) + '\n')
+
+    def write_prometheus(self, path: str):
+        """Write the report in the Prometheus text exposition format"""
+        _write_atomic(path, self.prometheus_text())
+
+    def prometheus_text(self) -> str:
+        report = self.report()
+        run = _label_value(self.run)
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: Iterable):
+            lines.append(f"# HELP cfe_{name} {help_text}")
+            lines.append(f"# TYPE cfe_{name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ','.join(f'{key}="{_label_value(val)}"' for key, val in labels.items())
+                lines.append(f"cfe_{name}{{{label_text}}} {value}")
+
+        metric('run_wall_seconds', 'gauge', 'Wall-clock time of the run',
+               [({'run': run}, report['wall_seconds'])])
+        metric('run_cpu_seconds', 'gauge', 'Process CPU time of the run',
+               [({'run': run}, report['cpu_seconds'])])
+        metric('peak_rss_bytes', 'gauge', 'Peak resident set size of the loader process',
+               [({'run': run}, report['peak_rss_bytes'])])
+        metric('peak_rss_children_bytes', 'gauge', 'Peak resident set size of parser worker processes',
+               [({'run': run}, report['peak_rss_children_bytes'])])
+
+        stage_metrics = [
+            ('stage_wall_seconds', 'gauge', 'Wall-clock time spent in the stage', 'wall_seconds'),
+            ('stage_cpu_seconds', 'gauge', 'Process CPU time while the stage ran', 'cpu_seconds'),
+            ('stage_parse_cpu_seconds', 'gauge', 'CPU time of the stage parser thread', 'parse_cpu_seconds'),
+            ('stage_records_total', 'counter', 'Records read by the stage', 'records'),
+            ('stage_records_per_second', 'gauge', 'Records read per wall-clock second', 'records_per_second'),
+            ('stage_bytes_read_total', 'counter', 'Input bytes read by the stage', 'bytes_read'),
+            ('stage_rows_written_total', 'counter', 'Rows written by the stage', 'rows_written'),
+            ('stage_batches_total', 'counter', 'Batches written by the stage', 'batches'),
+            ('stage_retries_total', 'counter', 'Batch retries in the stage', 'retries'),
+        ]
+        for name, kind, help_text, key in stage_metrics:
+            metric(name, kind, help_text,
+                   [({'run': run, 'stage': stage}, values[key]) for stage, values in report['stages'].items()])
+
+        lines.append("# HELP cfe_batch_latency_seconds Latency of written batches")
+        lines.append("# TYPE cfe_batch_latency_seconds histogram")
+        for name, stage in self.stages.items():
+            labels = f'run="{run}",stage="{_label_value(name)}"'
+            histogram = stage.batch_seconds
+            for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.cumulative()):
+                lines.append(f'cfe_batch_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"cfe_batch_latency_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"cfe_batch_latency_seconds_count{{{labels}}} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def print_summary(self):
+        """One line per stage"""
+        print("\nStage metrics:")
+        for name, stage in self.stages.items():
+            rate = stage.records_per_second
+            latency = stage.batch_seconds
+            mean_ms = latency.sum / latency.count * 1000 if latency.count else 0
+            print(f"  {name:<16} {stage.wall_seconds:>8.2f}s wall {stage.cpu_seconds:>8.2f}s cpu "
+                  f"{stage.records:>10} rec {rate or 0:>10.0f} rec/s {stage.bytes_read / 1e6:>8.1f} MB "
+                  f"{stage.batches:>6} batches {mean_ms:>7.1f} ms/batch {stage.retries:>4} retries")
+        peak = peak_rss_bytes()
+        if peak is not None:
+            print(f"  Peak RSS: {peak / 1e6:.1f} MB")
+
+def _label_value(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _write_atomic(path: str, text: str):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+# ============================================================================
+# Parser profiling
+# ============================================================================
+
+_profile_sequence = itertools.count()
+
+def configure_profiling(targets: Optional[str] = None, mode: Optional[str] = None,
+                        out_dir: Optional[str] = None):
+    """
+    Set the profiling options (through the environment, so parser worker
+    processes started afterwards inherit them)
+    """
+    if targets is not None:
+        os.environ['CFE_PROFILE'] = targets
+    if mode is not None:
+        os.environ['CFE_PROFILE_MODE'] = mode
+    if out_dir is not None:
+        os.environ['CFE_PROFILE_DIR'] = out_dir
+
+def profiling_enabled(name: str) -> bool:
+    targets = {target.strip() for target in os.environ.get('CFE_PROFILE', '').split(',') if target.strip()}
+    return 'all' in targets or name in targets
+
+def profile_iter(name: str, iterable: Iterable) -> Iterable:
+    """Profile a parser generator while it is consumed (returned as-is unless enabled)"""
+    if not profiling_enabled(name):
+        return iterable
+    return _profiled_iter(name, iterable)
+
+def profile_call(name: str, func: Callable, *args, **kwargs) -> Any:
+    """Call a parser function, profiling it when enabled"""
+    if not profiling_enabled(name):
+        return func(*args, **kwargs)
+    with _profiler(name) as profiler:
+        with profiler:
+            return func(*args, **kwargs)
+
+def _profiled_iter(name: str, iterable: Iterable) -> Iterator:
+    iterator = iter(iterable)
+    with _profiler(name) as profiler:
+        while True:
+            # Only time spent inside the generator is profiled, not the consumer's
+            with profiler:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+@contextmanager
+def _profiler(name: str):
+    out_dir = os.environ.get('CFE_PROFILE_DIR', 'profiles')
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{name}-{os.getpid()}-{next(_profile_sequence)}")
+
+    if os.environ.get('CFE_PROFILE_MODE', 'cprofile') == 'sample':
+        profiler = _StackSampler()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            profiler.write(f"{base}.folded")
+            print(f"  Profile ({name}): {profiler.samples} samples -> {base}.folded")
+    else:
+        profiler = _CProfileToggle()
+        try:
+            yield profiler
+        finally:
+            profiler.profile.dump_stats(f"{base}.prof")
+            print(f"  Profile ({name}): {base}.prof")
+
+class _CProfileToggle:
+    """cProfile.Profile enabled only inside `with` blocks"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+
+class _StackSampler:
+    """
+    Samples the stack of the thread that runs inside `with` blocks every
+    SAMPLE_INTERVAL seconds from a background thread, counting collapsed
+    stacks
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._thread_id = None
+        self._active = threading.Event()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='cfe-stack-sampler', daemon=True)
+        self._sampler.start()
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._active.set()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._active.clear()
+
+    def stop(self):
+        self._stopped.set()
+        self._active.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._active.wait()
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None and self._active.is_set() and not self._stopped.is_set():
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Parquet export stage for parsed EDI transactions
+
+Writes eligibility inquiries, prior auths, claim headers, claim lines and Rx
+benefit inquiries to Hive-partitioned Parquet datasets:
+
+  <out_dir>/<table>/load_date=YYYY-MM-DD/payer=<payer id>/part-*.parquet
+
+Rows are buffered per partition and flushed as one row group every
+row_group_size rows, so memory stays bounded however large the input is.
+Columns are typed (dates as date32, timestamps, float64 amounts, dictionary-
+encoded codes and NPIs), and every row group carries min/max statistics, so
+readers such as pyarrow.dataset, DuckDB or Spark can prune partitions and
+row groups (e.g. payer = 'X' AND from_date >= ...) instead of paging claims
+history back out of Postgres.
+
+The payer partition is the NM1*PR payer of the 837 subscriber loop, the
+payer ID of a 270, and the interchange receiver (ISA08) of a 278; rows
+without one go under payer=unknown.
+
+Usage:
+  python parquet_export.py --input-dir /data/edi/inbound --out /data/lake
+  python parquet_export.py --file ../../sample-data/rx-benefit-inquiries.json --out /data/lake
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import glob
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from parsers import iter_rx_benefit
+from parsers.claim_columns import HEADER_SCHEMA, LINE_SCHEMA
+from parsers.parse_270_271 import parse_single_270_271
+from parsers.parse_278 import parse_single_278
+from parsers.parse_837 import iter_claim_segments, parse_single_claim
+from parsers.x12_tokenizer import SegmentTokenizer, join_segments, sniff_transaction_set
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # The rest of the loader doesn't need pyarrow; ParquetSink reports it
+    pa = None
+    pq = None
+
+DEFAULT_ROW_GROUP_SIZE = int(os.environ.get('CFE_PARQUET_ROW_GROUP_SIZE', 100_000))
+
+# Rows buffered across all partitions of a table before every buffer is flushed
+DEFAULT_MAX_BUFFERED_ROWS = int(os.environ.get('CFE_PARQUET_MAX_BUFFERED_ROWS', 1_000_000))
+
+UNKNOWN_PAYER = 'unknown'
+
+# Files exported as Rx benefit inquiries when no transaction set is given
+RX_EXTENSIONS = ('.json', '.ndjson', '.ncpdp')
+
+# Field -> column kind per table; kinds follow parsers/claim_columns.py,
+# plus 'list' for repeated codes
+TABLE_SCHEMAS = {
+    'eligibility_inquiry_event': {
+        'inquiry_ts': 'datetime',
+        'source_channel': 'category',
+        'payer_id': 'category',
+        'member_id': 'text',
+        'provider_npi': 'category',
+        'service_type_codes': 'list',
+        'place_of_service': 'category',
+        'network_indicator': 'category',
+        'coverage_status': 'category',
+        'raw_270_ref': 'text'
+    },
+    'prior_auth_request': {
+        'pa_id': 'text',
+        'request_ts': 'datetime',
+        'decision_ts': 'datetime',
+        'status': 'category',
+        'member_id': 'text',
+        'requesting_provider_npi': 'category',
+        'servicing_provider_npi': 'category',
+        'service_from_date': 'date',
+        'service_to_date': 'date',
+        'place_of_service': 'category',
+        'diagnosis_codes': 'list',
+        'procedure_codes': 'list',
+        'clinical_type': 'category',
+        'line_of_business': 'category',
+        'plan_id': 'category',
+        'urgency': 'category'
+    },
+    'claim_header': HEADER_SCHEMA,
+    'claim_line': LINE_SCHEMA,
+    'rx_benefit_inquiry': {
+        'inquiry_id': 'text',
+        'member_id': 'text',
+        'inquiry_date': 'datetime',
+        'ndc_code': 'category',
+        'drug_name': 'category',
+        'drug_class': 'category',
+        'prescriber_npi': 'category',
+        'pharmacy_npi': 'category',
+        'days_supply': 'int',
+        'quantity': 'float',
+        'coverage_status': 'category',
+        'copay_amount': 'float',
+        'indication': 'text',
+        'raw_transaction_data': 'text'
+    }
+}
+
+def _to_date(value) -> Optional[date]:
+    if not value or isinstance(value, date):
+        return value or None
+    return date.fromisoformat(value[:10])
+
+def _to_datetime(value) -> Optional[datetime]:
+    """ISO string -> naive UTC datetime (partner JSON may carry a Z suffix)"""
+    if not value:
+        return None
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+# kind -> value conversion before building an Arrow column
+CONVERTERS = {
+    'date': _to_date,
+    'datetime': _to_datetime
+}
+
+def arrow_schema(table: str):
+    """Arrow schema for one exported table"""
+    types = {
+        'text': pa.string(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'date': pa.date32(),
+        'datetime': pa.timestamp('s'),
+        'float': pa.float64(),
+        'int': pa.int32(),
+        'list': pa.list_(pa.string())
+    }
+    return pa.schema([(name, types[kind]) for name, kind in TABLE_SCHEMAS[table].items()])
+
+def partition_dir(load_date: str, payer: Optional[str]) -> str:
+    """Hive-style partition path; payer IDs are URI-encoded as pyarrow expects"""
+    return os.path.join(f"load_date={load_date}", f"payer={quote(payer or UNKNOWN_PAYER, safe='')}")
+
+class ParquetSink:
+    """Partitioned Parquet writer for one table, streamed in row groups"""
+
+    def __init__(self, out_dir: str, table: str, load_date: Optional[str] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS, file_prefix: Optional[str] = None):
+        """
+        Args:
+            out_dir: Dataset root; the table is written under out_dir/table
+            table: Table name, a key of TABLE_SCHEMAS
+            load_date: load_date partition value (default: today)
+            row_group_size: Rows per row group
+            max_buffered_rows: Rows held across all partitions before flushing them all
+            file_prefix: Data file name prefix (default: part-<timestamp>-<pid>),
+                so repeated and parallel exports never overwrite each other
+        """
+        if pa is None:
+            raise ImportError("pyarrow library not installed. Install it with: pip install pyarrow")
+
+        self.root = os.path.join(out_dir, table)
+        self.table = table
+        self.load_date = load_date or date.today().isoformat()
+        self.row_group_size = row_group_size
+        self.max_buffered_rows = max_buffered_rows
+        self.file_prefix = file_prefix or f"part-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.schema = arrow_schema(table)
+        self.converters = [(name, CONVERTERS.get(kind)) for name, kind in TABLE_SCHEMAS[table].items()]
+
+        self.rows_written = 0
+        self.row_groups_written = 0
+        self.files: List[str] = []
+
+        self._buffers: Dict[str, List[Dict]] = {}
+        self._writers: Dict[str, 'pq.ParquetWriter'] = {}
+        self._buffered = 0
+
+    def __enter__(self) -> 'ParquetSink':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, row: Dict, payer: Optional[str] = None):
+        """Add one row to the payer's partition, writing a row group once it is full"""
+        partition = partition_dir(self.load_date, payer)
+        buffer = self._buffers.setdefault(partition, [])
+        buffer.append(row)
+        self._buffered += 1
+
+        if len(buffer) >= self.row_group_size:
+            self._flush(partition)
+        elif self._buffered >= self.max_buffered_rows:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered partition as a row group"""
+        for partition in list(self._buffers):
+            self._flush(partition)
+
+    def close(self):
+        """Flush remaining rows and close every data file"""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def _flush(self, partition: str):
+        rows = self._buffers.pop(partition, None)
+        if not rows:
+            return
+        self._buffered -= len(rows)
+
+        columns = []
+        for name, convert in self.converters:
+            values = [row.get(name) for row in rows]
+            if convert:
+                values = [convert(value) for value in values]
+            columns.append(values)
+        batch = pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema)
+
+        writer = self._writers.get(partition)
+        if writer is None:
+            directory = os.path.join(self.root, partition)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{self.file_prefix}.parquet")
+            writer = self._writers[partition] = pq.ParquetWriter(path, self.schema, compression='zstd')
+            self.files.append(path)
+
+        writer.write_table(batch, row_group_size=len(rows))
+        self.rows_written += len(rows)
+        self.row_groups_written += 1
+
+def iter_export_rows(file_path: str, transaction_set: str) -> Iterator[Tuple[str, Optional[str], Dict]]:
+    """
+    Stream (table, payer, row) from one input file
+
+    Args:
+        file_path: EDI file, or Rx benefit file (JSON, NDJSON or NCPDP D.0) for transaction_set 'rx'
+        transaction_set: '270', '278', '837' or 'rx'
+    """
+    if transaction_set == 'rx':
+        for inquiry in iter_rx_benefit(file_path):
+            yield 'rx_benefit_inquiry', inquiry.get('payer_id'), inquiry
+        return
+
+    tokenizer = SegmentTokenizer(file_path)
+
+    if transaction_set == '837':
+        for loops, claim_segments in iter_claim_segments(tokenizer):
+            header, lines = parse_single_claim(claim_segments, tokenizer.delimiters, loops)
+            if header:
+                yield 'claim_header', loops['payer_id'], header
+                for line in lines:
+                    yield 'claim_line', loops['payer_id'], line
+
+    elif transaction_set == '270':
+        for envelope, segments in tokenizer.transactions('270'):
+            delimiters = envelope['delimiters']
+            inquiry = parse_single_270_271(segments, join_segments(segments, delimiters), delimiters)
+            if inquiry:
+                yield 'eligibility_inquiry_event', inquiry['payer_id'] or envelope.get('receiver_id'), inquiry
+
+    elif transaction_set == '278':
+        for envelope, segments in tokenizer.transactions('278'):
+            pa_request = parse_single_278(segments, envelope['delimiters'])
+            if pa_request:
+                yield 'prior_auth_request', envelope.get('receiver_id'), pa_request
+
+class ParquetExporter:
+    """One ParquetSink per table, opened on first use"""
+
+    def __init__(self, out_dir: str, load_date: Optional[str] = None, **sink_options):
+        self.out_dir = out_dir
+        self.load_date = load_date
+        self.sink_options = sink_options
+        self.sinks: Dict[str, ParquetSink] = {}
+
+    def __enter__(self) -> 'ParquetExporter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def export_file(self, file_path: str, transaction_set: Optional[str] = None) -> int:
+        """Export one file (transaction set sniffed from ST01 unless given); returns rows written"""
+        if transaction_set is None:
+            transaction_set = 'rx' if file_path.endswith(RX_EXTENSIONS) else sniff_transaction_set(file_path)
+        if transaction_set not in ('270', '278', '837', 'rx'):
+            raise ValueError(f"Unsupported transaction set {transaction_set!r} in {file_path}")
+
+        count = 0
+        for table, payer, row in iter_export_rows(file_path, transaction_set):
+            sink = self.sinks.get(table)
+            if sink is None:
+                sink = self.sinks[table] = ParquetSink(self.out_dir, table, self.load_date, **self.sink_options)
+            sink.write(row, payer)
+            count += 1
+        return count
+
+    def close(self):
+        for sink in self.sinks.values():
+            sink.close()
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Export parsed EDI transactions to partitioned Parquet')
+    parser.add_argument('--input-dir', help='Export every matching file in this directory')
+    parser.add_argument('--pattern', default='*.edi', help='Glob pattern for files in --input-dir')
+    parser.add_argument('--file', action='append', default=[], help='Export this file (repeatable)')
+    parser.add_argument('--out', required=True, help='Dataset root directory')
+    parser.add_argument('--load-date', default=None, help='load_date partition value (default: today)')
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    files = list(args.file)
+    if args.input_dir:
+        files += sorted(glob.glob(os.path.join(args.input_dir, args.pattern)))
+    if not files:
+        parser.error('Nothing to export: pass --input-dir or --file')
+
+    with ParquetExporter(args.out, args.load_date, row_group_size=args.row_group_size) as exporter:
+        for file_path in files:
+            count = exporter.export_file(file_path)
+            print(f"✓ {os.path.basename(file_path)}: {count} rows")
+
+    for table, sink in sorted(exporter.sinks.items()):
+        print(f"  {table:<26} {sink.rows_written:>10} rows  {sink.row_groups_written:>5} row groups  "
+              f"{len(sink.files):>4} files")
+
+if __name__ == '__main__':
+    main()
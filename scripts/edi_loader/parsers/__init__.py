@@ -1,12 +1,16 @@
 """
 EDI X12 Transaction Parsers
 
-Parsers for HIPAA EDI transactions used in clinical forecasting.
+Parsers for HIPAA EDI transactions used in clinical forecasting, plus the
+Rx benefit inquiry parser (JSON or NCPDP D.0).
 """
 
-from .parse_270_271 import parse_270_271
-from .parse_278 import parse_278
-from .parse_837 import parse_837
-from .parse_rx_benefit import parse_rx_benefit
+from .parse_270_271 import parse_270_271, iter_270_271
+from .parse_278 import parse_278, iter_278
+from .parse_837 import parse_837, iter_837, parse_837_columnar
+from .parse_rx_benefit import parse_rx_benefit, iter_rx_benefit
 
-__all__ = ['parse_270_271', 'parse_278', 'parse_837', 'parse_rx_benefit']
+__all__ = [
+    'parse_270_271', 'parse_278', 'parse_837', 'parse_rx_benefit',
+    'iter_270_271', 'iter_278', 'iter_837', 'iter_rx_benefit', 'parse_837_columnar'
+]
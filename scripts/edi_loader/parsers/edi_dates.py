@@ -0,0 +1,100 @@
+"""
+Shared EDI date/time conversion
+
+X12 dates arrive as D8 (CCYYMMDD), RD8 (CCYYMMDD-CCYYMMDD) or the older
+six-digit YYMMDD, and times as TM (HHMM[SS]). The values are sliced by hand
+instead of going through datetime.strptime, and results are memoized on
+the raw string, since claims files repeat the same service dates millions
+of times.
+
+Output is identical to the strptime-based helpers these replace: ISO dates
+('2024-12-15'), ISO datetimes ('2024-12-15T09:23:00'), None when invalid.
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Distinct raw values kept per function; a few years of dates x times fits easily
+DATE_CACHE_SIZE = 65536
+
+def _parse_day(date_str: str) -> Optional[date]:
+    """D8 or YYMMDD to a date (None when not a valid calendar date)"""
+    if not date_str.isdecimal() or not date_str.isascii():
+        return None
+    try:
+        if len(date_str) == 8:
+            return date(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:]))
+        if len(date_str) == 6:
+            # Same pivot as strptime's %y: 69-99 -> 1900s, 00-68 -> 2000s
+            year = int(date_str[:2])
+            year += 1900 if year >= 69 else 2000
+            return date(year, int(date_str[2:4]), int(date_str[4:]))
+    except ValueError:
+        return None
+    return None
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_edi_date(date_str: str) -> Optional[str]:
+    """
+    Convert an EDI date to ISO format
+
+    Args:
+        date_str: D8/YYMMDD date, or an RD8 range (its start date is used)
+
+    Returns:
+        'YYYY-MM-DD', or None if the value is not a valid date
+    """
+    if not date_str:
+        return None
+    if '-' in date_str:
+        date_str = date_str.split('-')[0]
+    day = _parse_day(date_str)
+    return day.isoformat() if day else None
+
+def parse_edi_date_range(value: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Convert an RD8 range (or a single D8 date) to ISO (start, end) dates
+
+    A single date is returned as both start and end.
+    """
+    if not value:
+        return None, None
+    start, _, end = value.partition('-')
+    return parse_edi_date(start), parse_edi_date(end or start)
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_edi_datetime(date_str: str, time_str: Optional[str]) -> Optional[str]:
+    """
+    Convert an EDI date and time to ISO format
+
+    Args:
+        date_str: D8 or YYMMDD date
+        time_str: TM time (HHMM, seconds ignored); missing or short values mean midnight
+
+    Returns:
+        'YYYY-MM-DDTHH:MM:SS', or None if either part is invalid
+    """
+    if not date_str:
+        return None
+    day = _parse_day(date_str)
+    if day is None:
+        return None
+
+    if time_str and len(time_str) >= 4:
+        try:
+            return datetime(day.year, day.month, day.day, int(time_str[:2]), int(time_str[2:4])).isoformat()
+        except ValueError:
+            return None
+    return datetime(day.year, day.month, day.day).isoformat()
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_edi_time(time_str: str) -> Optional[str]:
+    """Convert a TM time (HHMM or HHMMSS) to 'HH:MM:SS' (None when invalid)"""
+    if not time_str or len(time_str) not in (4, 6) or not time_str.isdecimal() or not time_str.isascii():
+        return None
+    hour, minute = int(time_str[:2]), int(time_str[2:4])
+    second = int(time_str[4:6]) if len(time_str) == 6 else 0
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}:{second:02d}"
@@ -2,39 +2,37 @@
 Parser for 270/271 EDI Eligibility Inquiry/Response transactions
 """
 
-import re
-from datetime import datetime
-from typing import List, Dict
+from typing import Iterator, List, Dict
 
-def parse_270_271(file_path: str) -> List[Dict]:
+from .edi_dates import parse_edi_datetime
+from .x12_tokenizer import DEFAULT_DELIMITERS, Delimiters, SegmentTokenizer, join_segments, split_repetitions
+
+def parse_270_271(file_path: str, **reader_options) -> List[Dict]:
     """
     Parse 270/271 EDI file and return list of eligibility inquiry events
     
     Args:
         file_path: Path to EDI file containing 270/271 transactions
+        reader_options: Passed to SegmentTokenizer (chunk_size, start, end, interchange_filter)
         
     Returns:
         List of dictionaries with parsed eligibility data
     """
-    inquiries = []
-    
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    # Split into individual transactions (ST...SE)
-    transactions = re.findall(r'ST\*270.*?SE\*\d+\*\d+~', content, re.DOTALL)
+    return list(iter_270_271(file_path, **reader_options))
+
+def iter_270_271(file_path: str, **reader_options) -> Iterator[Dict]:
+    """Stream eligibility inquiry events from a 270/271 EDI file one at a time"""
+    tokenizer = SegmentTokenizer(file_path, **reader_options)
     
-    for transaction in transactions:
-        inquiry = parse_single_270_271(transaction)
+    for envelope, segments in tokenizer.transactions('270'):
+        delimiters = envelope['delimiters']
+        inquiry = parse_single_270_271(segments, join_segments(segments, delimiters), delimiters)
         if inquiry:
-            inquiries.append(inquiry)
-    
-    return inquiries
+            yield inquiry
 
-def parse_single_270_271(transaction: str) -> Dict:
-    """Parse a single 270/271 transaction"""
-    
-    segments = transaction.split('~')
+def parse_single_270_271(segments: List[List[str]], raw_text: str = None,
+                         delimiters: Delimiters = DEFAULT_DELIMITERS) -> Dict:
+    """Parse a single tokenized 270/271 transaction"""
     
     inquiry = {
         'inquiry_ts': None,
@@ -46,12 +44,10 @@ def parse_single_270_271(transaction: str) -> Dict:
         'place_of_service': None,
         'network_indicator': 'unknown',
         'coverage_status': 'unknown',
-        'raw_270_ref': transaction
+        'raw_270_ref': raw_text
     }
     
-    for segment in segments:
-        fields = segment.split('*')
-        
+    for fields in segments:
         if not fields:
             continue
             
@@ -90,13 +86,13 @@ def parse_single_270_271(transaction: str) -> Dict:
             if len(fields) >= 3:
                 date_qualifier = fields[1]
                 if date_qualifier == '291':  # Service date
-                    inquiry['inquiry_ts'] = inquiry['inquiry_ts'] or parse_edi_date(fields[3])
+                    inquiry['inquiry_ts'] = inquiry['inquiry_ts'] or parse_edi_datetime(fields[3], '0000')
         
         # EQ - Eligibility/Benefit Inquiry
         elif segment_id == 'EQ':
             if len(fields) >= 2:
-                service_type = fields[1]
-                inquiry['service_type_codes'].append(service_type)
+                # EQ01 repeats (e.g. 2^BT) in 5010
+                inquiry['service_type_codes'].extend(split_repetitions(fields[1], delimiters))
         
         # EB - Eligibility/Benefit Information (from 271 response)
         elif segment_id == 'EB':
@@ -116,28 +112,3 @@ def parse_single_270_271(transaction: str) -> Dict:
                         inquiry['network_indicator'] = 'out'
     
     return inquiry if inquiry['member_id'] else None
-
-def parse_edi_datetime(date_str: str, time_str: str) -> str:
-    """Convert EDI date/time to ISO format"""
-    try:
-        # Date: YYYYMMDD or YYMMDD
-        if len(date_str) == 8:
-            dt = datetime.strptime(date_str, '%Y%m%d')
-        elif len(date_str) == 6:
-            dt = datetime.strptime(date_str, '%y%m%d')
-        else:
-            return None
-        
-        # Time: HHMM
-        if time_str and len(time_str) >= 4:
-            hour = int(time_str[:2])
-            minute = int(time_str[2:4])
-            dt = dt.replace(hour=hour, minute=minute)
-        
-        return dt.isoformat()
-    except:
-        return None
-
-def parse_edi_date(date_str: str) -> str:
-    """Convert EDI date to ISO format"""
-    return parse_edi_datetime(date_str, '0000')
@@ -2,39 +2,37 @@
 Parser for 278 EDI Prior Authorization Request/Response transactions
 """
 
-import re
-from datetime import datetime
-from typing import List, Dict
+from typing import Iterator, List, Dict
 
-def parse_278(file_path: str) -> List[Dict]:
+from .edi_dates import parse_edi_date_range, parse_edi_datetime
+from .x12_tokenizer import DEFAULT_DELIMITERS, Delimiters, SegmentTokenizer
+
+def parse_278(file_path: str, **reader_options) -> List[Dict]:
     """
     Parse 278 EDI file and return list of prior authorization events
     
     Args:
         file_path: Path to EDI file containing 278 transactions
+        reader_options: Passed to SegmentTokenizer (chunk_size, start, end, interchange_filter)
         
     Returns:
         List of dictionaries with parsed PA data
     """
-    prior_auths = []
-    
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    # Split into individual transactions
-    transactions = re.findall(r'ST\*278.*?SE\*\d+\*\d+~', content, re.DOTALL)
+    return list(iter_278(file_path, **reader_options))
+
+def iter_278(file_path: str, **reader_options) -> Iterator[Dict]:
+    """Stream prior authorization events from a 278 EDI file one at a time"""
+    tokenizer = SegmentTokenizer(file_path, **reader_options)
     
-    for transaction in transactions:
-        pa = parse_single_278(transaction)
+    for envelope, segments in tokenizer.transactions('278'):
+        pa = parse_single_278(segments, envelope['delimiters'])
         if pa:
-            prior_auths.append(pa)
-    
-    return prior_auths
+            yield pa
 
-def parse_single_278(transaction: str) -> Dict:
-    """Parse a single 278 transaction"""
+def parse_single_278(segments: List[List[str]], delimiters: Delimiters = DEFAULT_DELIMITERS) -> Dict:
+    """Parse a single tokenized 278 transaction"""
     
-    segments = transaction.split('~')
+    component = delimiters.component_separator
     
     pa = {
         'pa_id': None,
@@ -55,9 +53,7 @@ def parse_single_278(transaction: str) -> Dict:
         'urgency': 'standard'
     }
     
-    for segment in segments:
-        fields = segment.split('*')
-        
+    for fields in segments:
         if not fields:
             continue
             
@@ -95,9 +91,8 @@ def parse_single_278(transaction: str) -> Dict:
                 date_qualifier = fields[1]
                 date_value = fields[3]
                 
-                if date_qualifier == '472':  # Service date
-                    pa['service_from_date'] = parse_edi_date(date_value)
-                    pa['service_to_date'] = pa['service_from_date']
+                if date_qualifier == '472':  # Service date (D8 or RD8 range)
+                    pa['service_from_date'], pa['service_to_date'] = parse_edi_date_range(date_value)
                 
                 elif date_qualifier == 'AAH':  # Decision date
                     pa['decision_ts'] = parse_edi_datetime(date_value, '0000')
@@ -106,16 +101,16 @@ def parse_single_278(transaction: str) -> Dict:
         elif segment_id == 'HI':
             for i in range(1, len(fields)):
                 code_info = fields[i]
-                if ':' in code_info:
-                    code = code_info.split(':')[1]
+                if component in code_info:
+                    code = code_info.split(component)[1]
                     pa['diagnosis_codes'].append(code)
         
         # SV2 - Institutional Service Line
         elif segment_id == 'SV2':
             if len(fields) >= 2:
                 revenue_code = fields[1]
-                if ':' in revenue_code:
-                    proc_code = revenue_code.split(':')[1]
+                if component in revenue_code:
+                    proc_code = revenue_code.split(component)[1]
                     pa['procedure_codes'].append(proc_code)
         
         # HSD - Health Care Services Delivery
@@ -143,32 +138,3 @@ def parse_single_278(transaction: str) -> Dict:
         pa['servicing_provider_npi'] = pa['requesting_provider_npi']
     
     return pa if pa['member_id'] and pa['pa_id'] else None
-
-def parse_edi_datetime(date_str: str, time_str: str) -> str:
-    """Convert EDI date/time to ISO format"""
-    try:
-        if len(date_str) == 8:
-            dt = datetime.strptime(date_str, '%Y%m%d')
-        elif len(date_str) == 6:
-            dt = datetime.strptime(date_str, '%y%m%d')
-        else:
-            return None
-        
-        if time_str and len(time_str) >= 4:
-            hour = int(time_str[:2])
-            minute = int(time_str[2:4])
-            dt = dt.replace(hour=hour, minute=minute)
-        
-        return dt.isoformat()
-    except:
-        return None
-
-def parse_edi_date(date_str: str) -> str:
-    """Convert EDI date to ISO format"""
-    try:
-        if len(date_str) == 8:
-            return datetime.strptime(date_str, '%Y%m%d').date().isoformat()
-        elif len(date_str) == 6:
-            return datetime.strptime(date_str, '%y%m%d').date().isoformat()
-    except:
-        return None
@@ -2,16 +2,19 @@
 Parser for 837 EDI Healthcare Claims (Institutional and Professional)
 """
 
-import re
-from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 
-def parse_837(file_path: str) -> Tuple[List[Dict], List[Dict]]:
+from .claim_columns import HEADER_SCHEMA, LINE_SCHEMA, ColumnTable
+from .edi_dates import parse_edi_date, parse_edi_date_range, parse_edi_datetime
+from .x12_tokenizer import DEFAULT_DELIMITERS, Delimiters, SegmentTokenizer
+
+def parse_837(file_path: str, **reader_options) -> Tuple[List[Dict], List[Dict]]:
     """
     Parse 837I/837P EDI file and return claims headers and lines
     
     Args:
         file_path: Path to EDI file containing 837 transactions
+        reader_options: Passed to SegmentTokenizer (chunk_size, start, end, interchange_filter)
         
     Returns:
         Tuple of (claim_headers, claim_lines)
@@ -19,34 +22,179 @@ def parse_837(file_path: str) -> Tuple[List[Dict], List[Dict]]:
     headers = []
     lines = []
     
-    with open(file_path, 'r') as f:
-        content = f.read()
+    for header, claim_lines in iter_837(file_path, **reader_options):
+        headers.append(header)
+        lines.extend(claim_lines)
+    
+    return headers, lines
+
+def parse_837_columnar(file_path: str, **reader_options) -> Tuple[ColumnTable, ColumnTable]:
+    """
+    Parse 837I/837P EDI file into columnar claim header and line tables
     
-    # Split into individual claims
-    claims = re.findall(r'CLM\*.*?(?=CLM\*|SE\*)', content, re.DOTALL)
+    Same records as parse_837, held in typed column buffers instead of
+    one dict per header and line (see claim_columns.py).
     
-    for claim_text in claims:
-        header, claim_lines = parse_single_claim(claim_text)
-        if header:
-            headers.append(header)
-            lines.extend(claim_lines)
+    Args:
+        file_path: Path to EDI file containing 837 transactions
+        reader_options: Passed to SegmentTokenizer (chunk_size, start, end, interchange_filter)
+        
+    Returns:
+        Tuple of (claim_headers, claim_lines) ColumnTables
+    """
+    headers = ColumnTable(HEADER_SCHEMA)
+    lines = ColumnTable(LINE_SCHEMA)
+    
+    for header, claim_lines in iter_837(file_path, **reader_options):
+        headers.append(header)
+        lines.extend(claim_lines)
     
     return headers, lines
 
-def parse_single_claim(claim_text: str) -> Tuple[Dict, List[Dict]]:
-    """Parse a single claim and its lines"""
+def iter_837(file_path: str, **reader_options) -> Iterator[Tuple[Dict, List[Dict]]]:
+    """Stream (claim_header, claim_lines) pairs from an 837 EDI file"""
+    tokenizer = SegmentTokenizer(file_path, **reader_options)
+    
+    for loops, claim_segments in iter_claim_segments(tokenizer):
+        header, claim_lines = parse_single_claim(claim_segments, tokenizer.delimiters, loops)
+        if header:
+            yield header, claim_lines
+
+# HL03 hierarchical level codes of the 837 loops that enclose a claim
+BILLING_PROVIDER_LEVEL = '20'
+SUBSCRIBER_LEVEL = '22'
+PATIENT_LEVEL = '23'
+
+# Implementation guide (ST03 / GS08, e.g. 005010X222A1) -> claim type
+IMPLEMENTATION_CLAIM_TYPES = {
+    'X222': 'professional',
+    'X223': 'institutional',
+}
+
+def claim_type_for(version: Optional[str]) -> Optional[str]:
+    """Claim type of an 837 implementation convention reference (None if unknown)"""
+    if not version:
+        return None
+    for guide, claim_type in IMPLEMENTATION_CLAIM_TYPES.items():
+        if guide in version:
+            return claim_type
+    return None
+
+def new_loop_context(claim_type: Optional[str] = None) -> Dict:
+    """Values collected from the HL loops enclosing a claim"""
+    return {
+        'claim_type': claim_type,
+        'billing_provider_npi': None,
+        'billing_provider_name': None,
+        'subscriber_id': None,
+        'claim_filing_indicator': None,
+        'payer_id': None,
+        'patient_id': None
+    }
+
+def iter_claim_segments(tokenizer: SegmentTokenizer) -> Iterator[Tuple[Dict, List[List[str]]]]:
+    """
+    Yield (loops, claim_segments) for each claim in the 837 transactions of a file
+    
+    A single pass over the segments tracks the HL hierarchy: billing
+    provider (HL 20, NM1*85) -> subscriber (HL 22, SBR/NM1*IL/NM1*PR) ->
+    patient (HL 23, NM1*QC) -> claim (CLM) -> service lines (LX/SV1/SV2).
+    A claim closes at the next CLM, HL or SE and is yielded together with
+    a copy of its enclosing loop values, so only one claim's segments are
+    held in memory however large the transaction is.
+    """
+    in_837 = False
+    claim_segments = None
+    loops = new_loop_context()
+    level = None
+    group_version = None
+    
+    for fields in tokenizer.segments():
+        segment_id = fields[0]
+        
+        if segment_id == 'GS':
+            group_version = fields[8] if len(fields) > 8 else None
+            continue
+        
+        if segment_id == 'ST':
+            in_837 = len(fields) > 1 and fields[1] == '837'
+            # ST03 names the implementation guide; older files only carry GS08
+            version = fields[3] if len(fields) > 3 and fields[3] else group_version
+            transaction_claim_type = claim_type_for(version)
+            loops = new_loop_context(transaction_claim_type)
+            level = None
+            continue
+        
+        if not in_837:
+            continue
+        
+        if segment_id in ('CLM', 'HL', 'SE') and claim_segments:
+            yield dict(loops), claim_segments
+            claim_segments = None
+        
+        if claim_segments is not None:
+            claim_segments.append(fields)
+        
+        elif segment_id == 'CLM':
+            claim_segments = [fields]
+        
+        elif segment_id == 'HL':
+            level = fields[3] if len(fields) > 3 else None
+            # Entering a loop resets it and everything beneath it
+            if level == BILLING_PROVIDER_LEVEL:
+                loops = new_loop_context(transaction_claim_type)
+            elif level == SUBSCRIBER_LEVEL:
+                loops = dict(new_loop_context(transaction_claim_type),
+                             billing_provider_npi=loops['billing_provider_npi'],
+                             billing_provider_name=loops['billing_provider_name'])
+            elif level == PATIENT_LEVEL:
+                loops['patient_id'] = None
+        
+        elif segment_id == 'NM1' and len(fields) > 1:
+            entity_type = fields[1]
+            if entity_type == '85' and level == BILLING_PROVIDER_LEVEL:
+                loops['billing_provider_name'] = fields[3] if len(fields) > 3 else None
+                loops['billing_provider_npi'] = fields[9] if len(fields) > 9 else None
+            elif entity_type == 'IL' and level == SUBSCRIBER_LEVEL:
+                loops['subscriber_id'] = fields[9] if len(fields) > 9 else None
+            elif entity_type == 'PR' and level == SUBSCRIBER_LEVEL:
+                loops['payer_id'] = fields[9] if len(fields) > 9 else None
+            elif entity_type == 'QC' and level == PATIENT_LEVEL:
+                loops['patient_id'] = fields[9] if len(fields) > 9 and fields[9] else None
+        
+        elif segment_id == 'SBR' and level == SUBSCRIBER_LEVEL:
+            loops['claim_filing_indicator'] = fields[9] if len(fields) > 9 else None
+        
+        elif segment_id == 'SE':
+            in_837 = False
+
+def parse_single_claim(segments: List[List[str]], delimiters: Delimiters = DEFAULT_DELIMITERS,
+                       loops: Optional[Dict] = None) -> Tuple[Dict, List[Dict]]:
+    """
+    Parse a single tokenized claim and its lines
+    
+    Args:
+        segments: Claim segments, CLM through its last service line
+        delimiters: Interchange delimiters
+        loops: Enclosing HL loop values from iter_claim_segments; the member
+            and billing provider come from here when the claim doesn't
+            carry them itself, and the claim type from the transaction's
+            implementation guide (otherwise from its SV1/SV2 lines)
+    """
     
-    segments = claim_text.split('~')
+    component = delimiters.component_separator
+    loops = loops or {}
     
     header = {
         'claim_id': None,
-        'member_id': None,
-        'claim_type': 'institutional',
+        'member_id': loops.get('patient_id') or loops.get('subscriber_id'),
+        'claim_type': loops.get('claim_type'),
         'from_date': None,
         'thru_date': None,
         'received_ts': None,
         'claim_status': 'paid',
-        'billing_provider_npi': None,
+        'claim_frequency_code': '1',
+        'billing_provider_npi': loops.get('billing_provider_npi'),
         'rendering_provider_npi': None,
         'facility_npi': None,
         'place_of_service': None,
@@ -61,10 +209,11 @@ def parse_single_claim(claim_text: str) -> Tuple[Dict, List[Dict]]:
     lines = []
     line_num = 0
     current_line = None
+    # Set once the service line loop (LX) starts; DTPs after it are line dates
+    in_line_loop = False
+    professional_lines = False
     
-    for segment in segments:
-        fields = segment.split('*')
-        
+    for fields in segments:
         if not fields:
             continue
             
@@ -72,18 +221,28 @@ def parse_single_claim(claim_text: str) -> Tuple[Dict, List[Dict]]:
         
         # CLM - Claim Information
         if segment_id == 'CLM':
-            if len(fields) >= 3:
+            if len(fields) > 2:
                 header['claim_id'] = fields[1]
                 header['total_billed_amt'] = float(fields[2]) if fields[2] else 0
+            # CLM05-3 frequency: 1 original, 7 replacement, 8 void
+            if len(fields) > 5 and component in fields[5]:
+                parts = fields[5].split(component)
+                if len(parts) > 2 and parts[2]:
+                    header['claim_frequency_code'] = parts[2]
+        
+        # DTP - Service line dates (loop 2400)
+        elif segment_id == 'DTP' and in_line_loop:
+            if current_line and len(fields) > 3 and fields[1] == '472':  # Service date (D8 or RD8)
+                current_line['service_date'] = parse_edi_date_range(fields[3])[0]
         
-        # DTP - Claim Dates
+        # DTP - Claim Dates (loop 2300)
         elif segment_id == 'DTP':
-            if len(fields) >= 3:
+            if len(fields) > 3:
                 date_qualifier = fields[1]
                 date_value = fields[3]
                 
-                if date_qualifier == '434':  # Statement from date
-                    header['from_date'] = parse_edi_date(date_value)
+                if date_qualifier == '434':  # Statement period (RD8) or from date (D8)
+                    header['from_date'], header['thru_date'] = parse_edi_date_range(date_value)
                 elif date_qualifier == '435':  # Statement through date
                     header['thru_date'] = parse_edi_date(date_value)
                 elif date_qualifier == '050':  # Received date
@@ -94,24 +253,32 @@ def parse_single_claim(claim_text: str) -> Tuple[Dict, List[Dict]]:
             if len(fields) >= 3:
                 entity_type = fields[1]
                 
-                if entity_type == 'IL':  # Member
-                    if len(fields) >= 9:
+                # Inside a claim NM1*IL is another payer's subscriber (COB);
+                # only use it when the file has no subscriber loop
+                if entity_type == 'IL' and not header['member_id']:  # Member
+                    if len(fields) > 9:
                         header['member_id'] = fields[9]
                 
-                elif entity_type == '85':  # Billing provider
-                    if len(fields) >= 9:
+                elif entity_type == '85' and not header['billing_provider_npi']:  # Billing provider
+                    if len(fields) > 9:
                         header['billing_provider_npi'] = fields[9]
                 
                 elif entity_type in ['82', '71']:  # Rendering provider
-                    if len(fields) >= 9:
+                    if len(fields) > 9:
                         header['rendering_provider_npi'] = fields[9]
                 
                 elif entity_type == '77':  # Service facility
-                    if len(fields) >= 9:
+                    if len(fields) > 9:
                         header['facility_npi'] = fields[9]
         
+        # LX - Service line number: the line loop starts here
+        elif segment_id == 'LX':
+            in_line_loop = True
+            current_line = None
+        
         # SV1 - Professional Service Line (837P)
         elif segment_id == 'SV1':
+            in_line_loop = professional_lines = True
             line_num += 1
             current_line = {
                 'claim_id': header['claim_id'],
@@ -126,24 +293,26 @@ def parse_single_claim(claim_text: str) -> Tuple[Dict, List[Dict]]:
                 'line_status': 'paid'
             }
             
-            if len(fields) >= 2:
+            if len(fields) > 1:
                 proc_info = fields[1]
-                if ':' in proc_info:
-                    parts = proc_info.split(':')
+                if component in proc_info:
+                    parts = proc_info.split(component)
                     current_line['procedure_code'] = parts[1] if len(parts) > 1 else None
                     if len(parts) > 2:
                         current_line['modifier1'] = parts[2]
             
-            if len(fields) >= 3:
+            if len(fields) > 2:
                 current_line['billed_amt'] = float(fields[2]) if fields[2] else 0
             
-            if len(fields) >= 5:
-                current_line['units'] = int(fields[5]) if fields[5] else 1
+            # SV104 service unit count
+            if len(fields) > 4:
+                current_line['units'] = float(fields[4]) if fields[4] else 1
             
             lines.append(current_line)
         
         # SV2 - Institutional Service Line (837I)
         elif segment_id == 'SV2':
+            in_line_loop = True
             line_num += 1
             current_line = {
                 'claim_id': header['claim_id'],
@@ -158,66 +327,37 @@ def parse_single_claim(claim_text: str) -> Tuple[Dict, List[Dict]]:
                 'line_status': 'paid'
             }
             
-            if len(fields) >= 2:
+            if len(fields) > 1:
                 rev_code = fields[1]
-                if ':' in rev_code:
-                    current_line['revenue_code'] = rev_code.split(':')[1]
+                if component in rev_code:
+                    current_line['revenue_code'] = rev_code.split(component)[1]
             
-            if len(fields) >= 3:
+            if len(fields) > 2:
                 proc_code = fields[2]
-                if ':' in proc_code:
-                    current_line['procedure_code'] = proc_code.split(':')[1]
+                if component in proc_code:
+                    current_line['procedure_code'] = proc_code.split(component)[1]
             
-            if len(fields) >= 4:
+            if len(fields) > 3:
                 current_line['billed_amt'] = float(fields[3]) if fields[3] else 0
             
-            if len(fields) >= 5:
+            # SV205 service unit count
+            if len(fields) > 5:
                 current_line['units'] = float(fields[5]) if fields[5] else 1
             
             lines.append(current_line)
-        
-        # DTP on service line
-        elif segment_id == 'DTP' and current_line:
-            if len(fields) >= 3:
-                date_qualifier = fields[1]
-                if date_qualifier == '472':  # Service date
-                    current_line['service_date'] = parse_edi_date(fields[3])
+    
+    if not header['claim_type']:
+        # No implementation guide in the envelope: SV1 lines are professional
+        header['claim_type'] = 'professional' if professional_lines else 'institutional'
+    
+    # 837P claims carry no statement period; their dates span the service lines
+    service_dates = [line['service_date'] for line in lines if line['service_date']]
+    if service_dates:
+        header['from_date'] = header['from_date'] or min(service_dates)
+        header['thru_date'] = header['thru_date'] or max(service_dates)
     
     # Calculate totals
     header['total_paid_amt'] = sum(line['paid_amt'] for line in lines)
     header['total_allowed_amt'] = sum(line['allowed_amt'] for line in lines)
     
     return (header, lines) if header['claim_id'] and header['member_id'] else (None, [])
-
-def parse_edi_datetime(date_str: str, time_str: str) -> str:
-    """Convert EDI date/time to ISO format"""
-    try:
-        if len(date_str) == 8:
-            dt = datetime.strptime(date_str, '%Y%m%d')
-        elif len(date_str) == 6:
-            dt = datetime.strptime(date_str, '%y%m%d')
-        else:
-            return None
-        
-        if time_str and len(time_str) >= 4:
-            hour = int(time_str[:2])
-            minute = int(time_str[2:4])
-            dt = dt.replace(hour=hour, minute=minute)
-        
-        return dt.isoformat()
-    except:
-        return None
-
-def parse_edi_date(date_str: str) -> str:
-    """Convert EDI date to ISO format"""
-    try:
-        # Handle date ranges (e.g., "20241201-20241205")
-        if '-' in date_str:
-            date_str = date_str.split('-')[0]
-        
-        if len(date_str) == 8:
-            return datetime.strptime(date_str, '%Y%m%d').date().isoformat()
-        elif len(date_str) == 6:
-            return datetime.strptime(date_str, '%y%m%d').date().isoformat()
-    except:
-        return None
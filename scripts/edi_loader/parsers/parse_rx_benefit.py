@@ -1,50 +1,313 @@
 """
 Rx Benefit Inquiry Parser
-Parses pharmacy benefit check data (NCPDP format or JSON for prototype)
+Parses pharmacy benefit check data: JSON (array or NDJSON) or NCPDP D.0
+
+All formats are streamed one inquiry at a time, so memory stays flat
+regardless of file size:
+
+- JSON array ('[{...}, ...]', the prototype export) is decoded object by
+  object from a fixed-size read buffer
+- NDJSON (one object per line) is decoded line by line
+- NCPDP Telecommunication D.0 is read one transmission per line: a request
+  (56-character header followed by segments) optionally followed, after a
+  group separator, by its response. Fields are picked out by their
+  two-character field IDs through a precompiled field map
+
+The format is sniffed from the first non-blank character unless given.
 """
 
 import json
-from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from .edi_dates import parse_edi_date
+
+# Read size for the streaming JSON array decoder
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+FORMATS = ('json', 'ndjson', 'ncpdp')
+
+# NCPDP D.0 separators
+SEGMENT_SEPARATOR = '\x1e'
+GROUP_SEPARATOR = '\x1d'
+FIELD_SEPARATOR = '\x1c'
+
+NCPDP_VERSION = 'D0'
+
+# Fixed-position header fields: name -> (start, end)
+REQUEST_HEADER = {
+    'bin': (0, 6),                      # 101-A1
+    'version': (6, 8),                  # 102-A2
+    'transaction_code': (8, 10),        # 103-A3
+    'pcn': (10, 20),                    # 104-A4
+    'service_provider_id': (23, 38),    # 201-B1 (NPI when 202-B2 is '01')
+    'date_of_service': (38, 46),        # 401-D1 CCYYMMDD
+}
+RESPONSE_HEADER = {
+    'version': (0, 2),
+    'transaction_code': (2, 4),
+    'service_provider_id': (8, 23),
+    'date_of_service': (23, 31),
+}
+REQUEST_HEADER_LENGTH = 56
+RESPONSE_HEADER_LENGTH = 31
+
+# Transaction response status (112-AN) values that mean the claim would pay
+ACCEPTED_STATUSES = frozenset('PDCAQS')
+
+# Reject code (511-FB) for "prior authorization required"
+PRIOR_AUTH_REJECT_CODE = '75'
+
+def _text(value: str) -> Optional[str]:
+    return value.strip() or None
+
+def _integer(value: str) -> Optional[int]:
+    value = value.strip()
+    return int(value) if value.isdigit() else None
+
+def _quantity(value: str) -> Optional[float]:
+    # 9(7)v999: three implied decimals
+    value = value.strip()
+    return int(value) / 1000 if value.isdigit() else None
+
+# Signed overpunch: the last character carries the sign and last digit
+_OVERPUNCH = {**{c: (1, d) for d, c in enumerate('{ABCDEFGHI')},
+              **{c: (-1, d) for d, c in enumerate('}JKLMNOPQR')}}
+
+def _amount(value: str) -> Optional[float]:
+    # s9(6)v99 dollars, signed overpunch, two implied decimals
+    value = value.strip()
+    if not value:
+        return None
+    sign, last = _OVERPUNCH.get(value[-1], (1, None))
+    digits = value[:-1] + str(last) if last is not None else value
+    return sign * int(digits) / 100 if digits.isdigit() else None
+
+def _ndc(value: str) -> Optional[str]:
+    value = value.strip()
+    # 11-digit NDCs are stored 5-4-2, like the JSON export
+    if len(value) == 11 and value.isdigit():
+        return f"{value[:5]}-{value[5:9]}-{value[9:]}"
+    return value or None
+
+# Field ID -> (record key, converter); only these fields are kept
+FIELD_MAP: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    'C2': ('member_id', _text),                 # 302-C2 cardholder ID
+    'D2': ('prescription_ref', _text),          # 402-D2 prescription/service reference number
+    'D7': ('ndc_code', _ndc),                   # 407-D7 product/service ID
+    'E7': ('quantity', _quantity),              # 442-E7 quantity dispensed
+    'D5': ('days_supply', _integer),            # 405-D5 days supply
+    'DB': ('prescriber_npi', _text),            # 411-DB prescriber ID
+    'DO': ('indication', _text),                # 424-DO diagnosis code
+    'AN': ('response_status', _text),           # 112-AN transaction response status
+    'F5': ('copay_amount', _amount),            # 505-F5 patient pay amount
+}
+
+# 511-FB reject codes repeat, so they are collected separately
+REJECT_CODE_FIELD = 'FB'
+
+def iter_rx_benefit(file_path: str, file_format: Optional[str] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream Rx benefit inquiries one at a time
+
+    Args:
+        file_path: JSON array, NDJSON or NCPDP D.0 file
+        file_format: 'json', 'ndjson' or 'ncpdp' (default: sniffed)
+        chunk_size: Read size for JSON arrays
+    """
+    file_format = file_format or sniff_rx_format(file_path)
+    # NCPDP is single-byte; latin-1 never fails on vendor extension bytes
+    with open(file_path, 'r', encoding='latin-1' if file_format == 'ncpdp' else 'utf-8') as f:
+        if file_format == 'json':
+            records = (_parse_inquiry(record) for record in iter_json_array(f, chunk_size))
+        elif file_format == 'ndjson':
+            records = (_parse_inquiry(json.loads(line)) for line in f if line.strip())
+        elif file_format == 'ncpdp':
+            records = (parse_ncpdp_transmission(line.rstrip('\r\n')) for line in f if line.strip())
+        else:
+            raise ValueError(f"Unknown Rx benefit format {file_format!r} (expected one of {', '.join(FORMATS)})")
+
+        for inquiry in records:
+            if inquiry:
+                yield inquiry
+
+def parse_rx_benefit(file_path: str, file_format: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Parse Rx benefit inquiry file and return list of inquiries"""
+    return list(iter_rx_benefit(file_path, file_format))
+
+def sniff_rx_format(file_path: str) -> str:
+    """'json' for an array, 'ndjson' for objects per line, otherwise 'ncpdp'"""
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                return 'json'
+            stripped = chunk.lstrip()
+            if stripped:
+                first = stripped[:1]
+                return 'json' if first == b'[' else 'ndjson' if first == b'{' else 'ncpdp'
+
+def iter_json_array(f: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Decode the elements of a top-level JSON array incrementally
+
+    Only the current read buffer (plus an element spanning its end) is
+    resident, however large the array is.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and separators, refilling the buffer as needed
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer = f.read(chunk_size)
+            pos = 0
+            eof = not buffer
+
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of JSON array")
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError("Rx benefit JSON must be an array of inquiries")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+            # A number or literal cut by the buffer end (e.g. '45' of '456',
+            # '-1' of '-1.5') decodes as a shorter value: unless a separator
+            # follows it, read on and decode again
+            rest = buffer[end:].lstrip(' \t\r\n')
+            truncated = not eof and rest[:1] not in (',', ']')
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            truncated = True
+        if truncated:
+            # The element continues past the buffer: keep its start, read on
+            more = f.read(chunk_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+
+        yield value
+        pos = end
+
+def parse_ncpdp_transmission(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse one NCPDP D.0 benefit check (request, optionally followed by its
+    response after a group separator) into an rx_benefit_inquiry record
+
+    NCPDP claims carry no drug name or class, so those are left empty.
+    """
+    header = {}
+    values = {}
+    reject_codes = []
+
+    for part in line.split(GROUP_SEPARATOR):
+        # Field IDs are unique across segments, so segments can be flattened
+        # and split once; the header is the first piece
+        fields = part.replace(SEGMENT_SEPARATOR, FIELD_SEPARATOR).split(FIELD_SEPARATOR)
+        header.update(_parse_header(fields[0]))
+        values.update([(field[:2], field[2:]) for field in fields[1:]])
+        if FIELD_SEPARATOR + REJECT_CODE_FIELD in part:
+            reject_codes.extend(field[2:].strip() for field in fields if field[:2] == REJECT_CODE_FIELD)
+
+    if header.get('version') != NCPDP_VERSION:
+        return None
+
+    record = {key: convert(values[field_id]) for field_id, (key, convert) in FIELD_MAP.items()
+              if field_id in values}
+    member_id = record.get('member_id')
+    date_of_service = header.get('date_of_service', '')
+    inquiry_date = parse_edi_date(date_of_service)
+    if not member_id or not inquiry_date:
+        return None
+
+    status = record.pop('response_status', None)
+    if status is None:
+        coverage_status = None
+    elif status in ACCEPTED_STATUSES:
+        coverage_status = 'Covered'
+    elif PRIOR_AUTH_REJECT_CODE in reject_codes:
+        coverage_status = 'Prior Auth Required'
+    else:
+        coverage_status = 'Not Covered'
+
+    prescription_ref = record.pop('prescription_ref', None) or ''
+    return {
+        'inquiry_id': f"RX-{member_id}-{date_of_service}-{prescription_ref or record.get('ndc_code') or ''}",
+        'member_id': member_id,
+        'inquiry_date': inquiry_date,
+        'ndc_code': record.get('ndc_code'),
+        'drug_name': None,
+        'drug_class': None,
+        'prescriber_npi': record.get('prescriber_npi'),
+        'pharmacy_npi': header.get('service_provider_id'),
+        'days_supply': record.get('days_supply'),
+        'quantity': record.get('quantity'),
+        'coverage_status': coverage_status,
+        'copay_amount': record.get('copay_amount'),
+        'indication': record.get('indication'),
+        'raw_transaction_data': json.dumps({
+            'ncpdp_version': 'D.0',
+            'bin': header.get('bin'),
+            'pcn': header.get('pcn'),
+            'transaction_code': header.get('transaction_code'),
+            'reject_codes': reject_codes
+        }, separators=(',', ':'))
+    }
+
+def _parse_header(segment: str) -> Dict[str, Optional[str]]:
+    """Fixed-position fields of a request or response transmission header"""
+    if len(segment) >= REQUEST_HEADER_LENGTH and segment[6:8] == NCPDP_VERSION:
+        layout = REQUEST_HEADER
+    elif len(segment) >= RESPONSE_HEADER_LENGTH and segment[:2] == NCPDP_VERSION:
+        layout = RESPONSE_HEADER
+    else:
+        return {}
+    return {name: segment[start:end].strip() or None for name, (start, end) in layout.items()}
+
+def _parse_inquiry(inquiry: Dict) -> Dict[str, Any]:
+    """Parse individual Rx benefit inquiry (JSON export)"""
+    return {
+        'inquiry_id': inquiry['inquiry_id'],
+        'member_id': inquiry['member_id'],
+        'inquiry_date': inquiry['inquiry_date'],
+        'ndc_code': inquiry.get('ndc_code'),
+        'drug_name': inquiry.get('drug_name'),
+        'drug_class': inquiry.get('drug_class'),
+        'prescriber_npi': inquiry.get('prescriber_npi'),
+        'pharmacy_npi': inquiry.get('pharmacy_npi'),
+        'days_supply': inquiry.get('days_supply'),
+        'quantity': inquiry.get('quantity'),
+        'coverage_status': inquiry.get('coverage_status'),
+        'copay_amount': inquiry.get('copay_amount'),
+        'indication': inquiry.get('indication'),
+        'raw_transaction_data': inquiry.get('raw_transaction_data', '')
+    }
 
 class ParseRxBenefit:
     """Parser for Rx benefit inquiry transactions"""
-    
-    def __init__(self, file_path: str):
+
+    def __init__(self, file_path: str, file_format: Optional[str] = None):
         self.file_path = file_path
-        self.inquiries = []
-    
+        self.file_format = file_format
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter_rx_benefit(self.file_path, self.file_format)
+
     def parse(self) -> List[Dict[str, Any]]:
-        """
-        Parse Rx benefit inquiry file
-        For prototype, expects JSON format
-        Production would parse NCPDP D.0 format
-        """
-        with open(self.file_path, 'r') as f:
-            data = json.load(f)
-        
-        for inquiry in data:
-            parsed = self._parse_inquiry(inquiry)
-            if parsed:
-                self.inquiries.append(parsed)
-        
-        return self.inquiries
-    
-    def _parse_inquiry(self, inquiry: Dict) -> Dict[str, Any]:
-        """Parse individual Rx benefit inquiry"""
-        return {
-            'inquiry_id': inquiry['inquiry_id'],
-            'member_id': inquiry['member_id'],
-            'inquiry_date': inquiry['inquiry_date'],
-            'ndc_code': inquiry['ndc_code'],
-            'drug_name': inquiry['drug_name'],
-            'drug_class': inquiry['drug_class'],
-            'prescriber_npi': inquiry['prescriber_npi'],
-            'pharmacy_npi': inquiry['pharmacy_npi'],
-            'days_supply': inquiry['days_supply'],
-            'quantity': inquiry['quantity'],
-            'coverage_status': inquiry['coverage_status'],
-            'copay_amount': inquiry['copay_amount'],
-            'indication': inquiry['indication'],
-            'raw_transaction_data': inquiry.get('raw_transaction_data', '')
-        }
+        """Parse the whole file into a list (prefer iterating for large files)"""
+        return list(self)
@@ -0,0 +1,318 @@
+"""
+Streaming segment tokenizer shared by the X12 parsers
+
+Reads an EDI file in fixed-size chunks and yields one segment at a time, so
+memory stays flat regardless of file size. Transactions (ST...SE) can be
+iterated together with their ISA/GS envelope context.
+
+Delimiters are never assumed: each interchange declares its own in the ISA
+header, which is sniffed once per interchange before its segments are split.
+"""
+
+import codecs
+import mmap
+import os
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Read size for each chunk pulled from disk
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# The ISA segment is fixed width: 106 characters including the terminator
+ISA_LENGTH = 106
+ISA_ELEMENT_COUNT = 16
+
+class Delimiters(NamedTuple):
+    """Delimiters declared by an ISA interchange header"""
+    segment_terminator: str
+    element_separator: str
+    component_separator: str
+    repetition_separator: Optional[str]
+
+# Used when a file has no ISA header (e.g. a bare ST...SE extract)
+DEFAULT_DELIMITERS = Delimiters('~', '*', ':', '^')
+
+def sniff_delimiters(header: str) -> Delimiters:
+    """
+    Read the delimiters from the start of an ISA segment
+
+    Args:
+        header: Text starting at 'ISA', at least through the segment terminator
+
+    Returns:
+        Delimiters declared by the interchange
+    """
+    if not header.startswith('ISA') or len(header) < 4:
+        raise ValueError(f"Not an ISA header: {header[:20]!r}")
+
+    element = header[3]
+
+    # Fast path: properly padded header, delimiters sit at fixed offsets
+    if len(header) >= ISA_LENGTH and header[103] == element and header.count(element, 0, 104) == ISA_ELEMENT_COUNT:
+        repetition = header[82]
+        terminator = header[105]
+        component = header[104]
+    else:
+        # Some senders pad ISA06/ISA08 incorrectly; walk the 16 separators instead
+        positions = []
+        pos = 2
+        for _ in range(ISA_ELEMENT_COUNT):
+            pos = header.find(element, pos + 1)
+            if pos < 0:
+                raise ValueError(f"Truncated ISA header: {header[:ISA_LENGTH]!r}")
+            positions.append(pos)
+
+        last = positions[-1]
+        if len(header) < last + 3:
+            raise ValueError(f"Truncated ISA header: {header[:ISA_LENGTH]!r}")
+        repetition = header[positions[10] + 1:positions[11]]
+        component = header[last + 1]
+        terminator = header[last + 2]
+
+    return Delimiters(terminator, element, component, _repetition_separator(repetition))
+
+def _repetition_separator(isa11: str) -> Optional[str]:
+    """ISA11 is the repetition separator in 00501; 004010 and earlier put 'U' there"""
+    if len(isa11) != 1 or isa11.isalnum():
+        return None
+    return isa11
+
+class SegmentTokenizer:
+    """
+    Chunked reader that yields X12 segments as lists of elements
+
+    start/end restrict reading to a byte range of the file, which must begin
+    on an ISA header (see find_interchange_offsets) so shards of one large
+    file can be tokenized independently.
+
+    interchange_filter is called with the elements of each ISA segment; when
+    it returns False the whole interchange (through its IEA) is skipped.
+    """
+
+    def __init__(self, file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 start: int = 0, end: Optional[int] = None,
+                 interchange_filter: Optional[Callable[[List[str]], bool]] = None):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.start = start
+        self.end = end
+        self.interchange_filter = interchange_filter
+        self.delimiters = DEFAULT_DELIMITERS
+        self.bytes_read = 0
+        self.segment_count = 0
+
+    def segments(self) -> Iterator[List[str]]:
+        """Yield every segment in the file, split into elements"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        buffer = ''
+        eof = False
+        sniff = True
+        trust_isa = False
+        skipping = False
+        interchange_filter = self.interchange_filter
+
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.start)
+            while True:
+                # Make sure a complete ISA header is buffered before sniffing it
+                if sniff:
+                    buffer = buffer.lstrip()
+                    while not eof and len(buffer) < ISA_LENGTH:
+                        buffer, eof = self._fill(f, decoder, buffer)
+                        buffer = buffer.lstrip()
+                    if buffer.startswith('ISA'):
+                        self.delimiters = sniff_delimiters(buffer)
+                        trust_isa = True
+                    sniff = False
+                elif not eof:
+                    buffer, eof = self._fill(f, decoder, buffer)
+
+                terminator, separator = self.delimiters[:2]
+                pieces = buffer.split(terminator)
+                # Last piece is an incomplete segment (or empty) - carry it over
+                buffer = '' if eof else pieces.pop()
+
+                for index, piece in enumerate(pieces):
+                    piece = piece.strip('\r\n')
+                    if not piece:
+                        continue
+                    fields = piece.split(separator)
+
+                    # A new interchange may declare different delimiters;
+                    # re-split the rest of the buffer if it does
+                    if fields[0][:3] == 'ISA':
+                        if trust_isa:
+                            trust_isa = False
+                        elif fields[0] != 'ISA' or not self._same_delimiters(fields):
+                            rest = pieces[index:] if eof else pieces[index:] + [buffer]
+                            buffer = terminator.join(rest)
+                            sniff = True
+                            break
+
+                        if interchange_filter is not None:
+                            skipping = not interchange_filter(fields)
+
+                    if skipping:
+                        if fields[0] == 'IEA':
+                            skipping = False
+                        continue
+
+                    self.segment_count += 1
+                    yield fields
+
+                if eof and not sniff:
+                    break
+
+    def _fill(self, f, decoder, buffer: str) -> Tuple[str, bool]:
+        """Append the next chunk of the file to the buffer"""
+        size = self.chunk_size
+        if self.end is not None:
+            size = min(size, self.end - self.start - self.bytes_read)
+        chunk = f.read(size) if size > 0 else b''
+        self.bytes_read += len(chunk)
+        if not chunk:
+            return buffer + decoder.decode(b'', final=True), True
+        return buffer + decoder.decode(chunk), False
+
+    def _same_delimiters(self, fields: List[str]) -> bool:
+        """Check an ISA split with the current delimiters declares those same delimiters"""
+        if len(fields) != ISA_ELEMENT_COUNT + 1:
+            return False
+        return (fields[ISA_ELEMENT_COUNT] == self.delimiters.component_separator
+                and _repetition_separator(fields[11]) == self.delimiters.repetition_separator)
+
+    def transactions(self, transaction_set_id: Optional[str] = None) -> Iterator[Tuple[Dict, List[List[str]]]]:
+        """
+        Yield (envelope, segments) for each ST...SE transaction set
+
+        Args:
+            transaction_set_id: Only yield transactions with this ST01 (e.g. '270')
+
+        Returns:
+            Iterator of envelope dicts (ISA/GS/ST control data and the
+            interchange delimiters) and the transaction's segments, ST and
+            SE included
+        """
+        interchange = {'delimiters': self.delimiters}
+        group = {}
+        current = None
+        envelope = None
+
+        for fields in self.segments():
+            segment_id = fields[0]
+
+            if current is not None:
+                current.append(fields)
+                if segment_id == 'SE':
+                    yield envelope, current
+                    current = None
+                continue
+
+            if segment_id == 'ST':
+                set_id = fields[1] if len(fields) > 1 else ''
+                if transaction_set_id and set_id != transaction_set_id:
+                    continue
+                envelope = dict(interchange, **group)
+                envelope['transaction_set_id'] = set_id
+                envelope['st_control_number'] = fields[2] if len(fields) > 2 else None
+                current = [fields]
+
+            elif segment_id == 'ISA':
+                interchange = {
+                    'sender_id': fields[6].strip() if len(fields) > 6 else None,
+                    'receiver_id': fields[8].strip() if len(fields) > 8 else None,
+                    'isa_control_number': fields[13] if len(fields) > 13 else None,
+                    'delimiters': self.delimiters
+                }
+                group = {}
+
+            elif segment_id == 'GS':
+                group = {
+                    'functional_id_code': fields[1] if len(fields) > 1 else None,
+                    'gs_control_number': fields[6] if len(fields) > 6 else None
+                }
+
+def find_interchange_offsets(file_path: str) -> List[int]:
+    """
+    Return the byte offset of every ISA interchange in an EDI file
+
+    The file is scanned through mmap without tokenizing it: each ISA header
+    is sniffed for its terminator, then the matching IEA trailer is located
+    and the next interchange must start right after it. A file without an
+    ISA header is treated as a single interchange at offset 0.
+    """
+    if os.path.getsize(file_path) == 0:
+        return []
+
+    offsets = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        pos = _skip_whitespace(mm, 0, size)
+        if mm[pos:pos + 3] != b'ISA':
+            return [0]
+
+        while pos < size and mm[pos:pos + 3] == b'ISA':
+            offsets.append(pos)
+            header = mm[pos:pos + ISA_LENGTH + 16].decode('utf-8', errors='replace')
+            delimiters = sniff_delimiters(header)
+            terminator = delimiters.segment_terminator.encode()
+            trailer = b'IEA' + delimiters.element_separator.encode()
+
+            # The IEA trailer must start a segment: only whitespace may sit
+            # between it and the previous terminator
+            iea = mm.find(trailer, pos)
+            while iea >= 0 and not _follows_terminator(mm, iea, terminator):
+                iea = mm.find(trailer, iea + 1)
+            if iea < 0:
+                break
+
+            end = mm.find(terminator, iea)
+            if end < 0:
+                break
+            pos = _skip_whitespace(mm, end + len(terminator), size)
+
+    return offsets
+
+def _follows_terminator(mm: mmap.mmap, pos: int, terminator: bytes) -> bool:
+    """Check the bytes before pos are a segment terminator, ignoring line breaks"""
+    pos -= 1
+    while pos >= 0 and mm[pos:pos + 1].isspace() and terminator != mm[pos:pos + 1]:
+        pos -= 1
+    return pos >= len(terminator) - 1 and mm[pos - len(terminator) + 1:pos + 1] == terminator
+
+def _skip_whitespace(mm: mmap.mmap, pos: int, size: int) -> int:
+    """Advance past line breaks and padding between interchanges"""
+    while pos < size and mm[pos:pos + 1].isspace():
+        pos += 1
+    return pos
+
+def sniff_transaction_set(file_path: str) -> Optional[str]:
+    """Return the ST01 transaction set ID (e.g. '837') of the first transaction in a file"""
+    for fields in SegmentTokenizer(file_path, chunk_size=64 * 1024).segments():
+        if fields[0] == 'ST':
+            return fields[1] if len(fields) > 1 else None
+    return None
+
+def join_segments(segments: List[List[str]], delimiters: Delimiters = DEFAULT_DELIMITERS) -> str:
+    """Rebuild raw EDI text for a list of tokenized segments"""
+    terminator = delimiters.segment_terminator
+    separator = delimiters.element_separator
+    return ''.join(separator.join(fields) + terminator for fields in segments)
+
+def split_components(element: str, delimiters: Delimiters = DEFAULT_DELIMITERS) -> List[str]:
+    """Split a composite element (e.g. 'HC:27447') into its components"""
+    return element.split(delimiters.component_separator)
+
+def split_repetitions(element: str, delimiters: Delimiters = DEFAULT_DELIMITERS) -> List[str]:
+    """Split a repeating element (e.g. EQ01 '2^BT') into its repeats"""
+    if delimiters.repetition_separator:
+        return element.split(delimiters.repetition_separator)
+    return [element]
+
+def iter_segments(file_path: str, **reader_options) -> Iterator[List[str]]:
+    """Yield each segment of an EDI file as a list of elements"""
+    return SegmentTokenizer(file_path, **reader_options).segments()
+
+def iter_transactions(file_path: str, transaction_set_id: Optional[str] = None,
+                      **reader_options) -> Iterator[Tuple[Dict, List[List[str]]]]:
+    """Yield (envelope, segments) for each ST...SE transaction in an EDI file"""
+    return SegmentTokenizer(file_path, **reader_options).transactions(transaction_set_id)
@@ -0,0 +1,469 @@
+"""
+PostgreSQL COPY bulk load path for the EDI loader
+
+A drop-in replacement for the mock DatabaseConnection in load_edi_data.py.
+Instead of one load_* SQL function call per record, each batch of parser
+output is streamed with COPY ... FROM STDIN into a session-local staging
+table and merged into its target table with a single INSERT ... SELECT ...
+ON CONFLICT. The merge derives keys and resolves conflicts exactly as the
+row-at-a-time functions in sql/00-consolidated-schema.sql do (e.g. 'ELG-' ||
+member_id || '-' || TO_CHAR(inquiry_date, ...); replacement and void claims
+update the stored claim), so both paths produce the same rows.
+
+Staging tables are TEMPORARY ... ON COMMIT DELETE ROWS: never WAL-logged,
+private to their connection (so pooled connections can load concurrently)
+and emptied by the commit that makes the merge visible. Batches run on a
+ThreadedConnectionPool, with up to max_connections batches in flight.
+Claims and members are routed to one lane per connection by a hash of
+their key, and a lane's batches commit one after another, so copies of a
+claim sent in different batches (original, replacement, void) merge in
+file order, as they do through the row-at-a-time functions.
+"""
+
+import io
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:
+    # load_edi_data stays usable with the mock connection;
+    # CopyDatabaseConnection reports the missing driver
+    psycopg2 = None
+    ThreadedConnectionPool = None
+
+from metrics import Histogram, StageMetrics, current_stage
+
+DEFAULT_COPY_BATCH_SIZE = int(os.environ.get('CFE_COPY_BATCH_SIZE', 50000))
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get('CFE_DB_MAX_CONNECTIONS', 4))
+
+class CopySpec(NamedTuple):
+    """How one load_*_batch call is staged and merged"""
+    staging_table: str
+    columns: List[Tuple[str, str]]
+    to_row: Callable[[Dict], Tuple]
+    merge_sql: str
+    # Record field whose copies must merge in file order; its batches go
+    # through one lane per connection instead of any free connection
+    order_key: Optional[str] = None
+
+def _first(values: Optional[List]) -> Optional[str]:
+    return values[0] if values else None
+
+def member_row(member: Dict) -> Tuple:
+    address = member.get('address') or {}
+    pcp = member.get('primary_care_provider') or {}
+    return (member.get('member_id'), member.get('first_name'), member.get('last_name'),
+            member.get('date_of_birth'), member.get('gender'), address.get('street'), address.get('city'),
+            address.get('state'), address.get('zip_code'), member.get('phone'), member.get('email'),
+            member.get('plan_type'), member.get('network'), member.get('geographic_region'),
+            member.get('enrollment_date'), member.get('enrollment_status'), member.get('termination_date'),
+            pcp.get('npi'), pcp.get('name'), pcp.get('specialty'), member.get('risk_score'),
+            member.get('hcc_score'))
+
+def eligibility_row(inquiry: Dict) -> Tuple:
+    return (inquiry.get('member_id'), inquiry.get('inquiry_ts'), _first(inquiry.get('service_type_codes')),
+            None, None, inquiry.get('provider_npi'), None, inquiry.get('coverage_status'),
+            inquiry.get('raw_270_ref'))
+
+def prior_auth_row(pa: Dict) -> Tuple:
+    return (pa.get('member_id'), pa.get('request_ts'), pa.get('request_type') or 'prior_authorization',
+            None, pa.get('status'), _first(pa.get('procedure_codes')), _first(pa.get('diagnosis_codes')),
+            pa.get('requesting_provider_npi'), pa.get('servicing_provider_npi'), None, None,
+            pa.get('service_from_date'), None)
+
+def claim_header_row(header: Dict) -> Tuple:
+    claim_type = header.get('claim_type')
+    return (header.get('claim_id'), header.get('member_id'), claim_type.capitalize() if claim_type else None,
+            header.get('from_date'), header.get('thru_date'), header.get('billing_provider_npi'),
+            header.get('facility_npi'), header.get('total_billed_amt'), None,
+            header.get('claim_frequency_code') or '1')
+
+def claim_line_row(line: Dict) -> Tuple:
+    return (line.get('claim_id'), line.get('line_num'), line.get('procedure_code'), None,
+            line.get('service_date'), line.get('billed_amt'))
+
+def rx_benefit_row(inquiry: Dict) -> Tuple:
+    return (inquiry.get('member_id'), inquiry.get('inquiry_date'), inquiry.get('ndc_code'),
+            inquiry.get('drug_name'), inquiry.get('drug_class'), inquiry.get('prescriber_npi'),
+            inquiry.get('pharmacy_npi'), inquiry.get('days_supply'), inquiry.get('quantity'),
+            inquiry.get('coverage_status'), inquiry.get('copay_amount'), inquiry.get('indication'),
+            inquiry.get('raw_transaction_data'))
+
+# load_edi_data batch function name -> staging/merge plan; members are
+# upserted as load_to_supabase writes them, the other merges mirror
+# load_270_eligibility, load_278_prior_auth, load_837_claim_header,
+# load_837_claim_line and load_rx_benefit_inquiry
+COPY_SPECS = {
+    'load_members_batch': CopySpec(
+        'stg_member',
+        [('member_id', 'TEXT'), ('first_name', 'TEXT'), ('last_name', 'TEXT'), ('date_of_birth', 'DATE'),
+         ('gender', 'TEXT'), ('address_street', 'TEXT'), ('address_city', 'TEXT'), ('address_state', 'TEXT'),
+         ('address_zip', 'TEXT'), ('phone', 'TEXT'), ('email', 'TEXT'), ('plan_type', 'TEXT'),
+         ('network', 'TEXT'), ('geographic_region', 'TEXT'), ('enrollment_date', 'DATE'),
+         ('enrollment_status', 'TEXT'), ('termination_date', 'DATE'), ('pcp_npi', 'TEXT'),
+         ('pcp_name', 'TEXT'), ('pcp_specialty', 'TEXT'), ('risk_score', 'DECIMAL(5,2)'),
+         ('hcc_score', 'DECIMAL(8,2)')],
+        member_row,
+        """
+        INSERT INTO member (
+          member_id, first_name, last_name, date_of_birth, gender, address_street, address_city,
+          address_state, address_zip, phone, email, plan_type, network, geographic_region,
+          enrollment_date, enrollment_status, termination_date, pcp_npi, pcp_name, pcp_specialty,
+          risk_score, hcc_score
+        )
+        SELECT DISTINCT ON (member_id) member_id, first_name, last_name, date_of_birth, gender,
+          address_street, address_city, address_state, address_zip, phone, email, plan_type, network,
+          geographic_region, enrollment_date, enrollment_status, termination_date, pcp_npi, pcp_name,
+          pcp_specialty, risk_score, hcc_score
+        FROM stg_member
+        ORDER BY member_id, staged_seq DESC
+        ON CONFLICT (member_id) DO UPDATE SET
+          first_name = EXCLUDED.first_name,
+          last_name = EXCLUDED.last_name,
+          date_of_birth = EXCLUDED.date_of_birth,
+          gender = EXCLUDED.gender,
+          address_street = EXCLUDED.address_street,
+          address_city = EXCLUDED.address_city,
+          address_state = EXCLUDED.address_state,
+          address_zip = EXCLUDED.address_zip,
+          phone = EXCLUDED.phone,
+          email = EXCLUDED.email,
+          plan_type = EXCLUDED.plan_type,
+          network = EXCLUDED.network,
+          geographic_region = EXCLUDED.geographic_region,
+          enrollment_date = EXCLUDED.enrollment_date,
+          enrollment_status = EXCLUDED.enrollment_status,
+          termination_date = EXCLUDED.termination_date,
+          pcp_npi = EXCLUDED.pcp_npi,
+          pcp_name = EXCLUDED.pcp_name,
+          pcp_specialty = EXCLUDED.pcp_specialty,
+          risk_score = EXCLUDED.risk_score,
+          hcc_score = EXCLUDED.hcc_score,
+          updated_at = NOW()
+        """,
+        order_key='member_id'
+    ),
+    'load_270_271_batch': CopySpec(
+        'stg_eligibility_inquiry_event',
+        [('member_id', 'TEXT'), ('inquiry_date', 'TIMESTAMPTZ'), ('service_type_code', 'TEXT'),
+         ('procedure_code', 'TEXT'), ('diagnosis_code', 'TEXT'), ('provider_npi', 'TEXT'),
+         ('eligibility_status', 'TEXT'), ('coverage_status', 'TEXT'), ('raw_edi_data', 'TEXT')],
+        eligibility_row,
+        """
+        INSERT INTO eligibility_inquiry_event (
+          event_id, member_id, inquiry_date, service_type_code, procedure_code,
+          diagnosis_code, provider_npi, eligibility_status, coverage_status, raw_edi_data
+        )
+        SELECT 'ELG-' || member_id || '-' || TO_CHAR(inquiry_date, 'YYYYMMDDHH24MISS'),
+          member_id, inquiry_date, service_type_code, procedure_code,
+          diagnosis_code, provider_npi, eligibility_status, coverage_status, raw_edi_data
+        FROM stg_eligibility_inquiry_event
+        ON CONFLICT (event_id) DO NOTHING
+        """
+    ),
+    'load_278_batch': CopySpec(
+        'stg_prior_auth_request',
+        [('member_id', 'TEXT'), ('request_date', 'TIMESTAMPTZ'), ('request_type', 'TEXT'),
+         ('service_type_code', 'TEXT'), ('auth_status', 'TEXT'), ('procedure_code', 'TEXT'),
+         ('diagnosis_code', 'TEXT'), ('requesting_provider_npi', 'TEXT'), ('servicing_provider_npi', 'TEXT'),
+         ('referred_provider_name', 'TEXT'), ('referred_provider_specialty', 'TEXT'),
+         ('requested_service_date', 'DATE'), ('raw_edi_data', 'TEXT')],
+        prior_auth_row,
+        """
+        INSERT INTO prior_auth_request (
+          auth_id, member_id, request_date, request_type, service_type_code, auth_status,
+          procedure_code, diagnosis_code, requesting_provider_npi, servicing_provider_npi,
+          referred_provider_name, referred_provider_specialty, requested_service_date, raw_edi_data
+        )
+        SELECT CASE WHEN request_type = 'referral' THEN 'REF-' ELSE 'PA-' END
+            || member_id || '-' || TO_CHAR(request_date, 'YYYYMMDDHH24MISS'),
+          member_id, request_date, request_type, service_type_code, auth_status,
+          procedure_code, diagnosis_code, requesting_provider_npi, servicing_provider_npi,
+          referred_provider_name, referred_provider_specialty, requested_service_date, raw_edi_data
+        FROM stg_prior_auth_request
+        ON CONFLICT (auth_id) DO NOTHING
+        """
+    ),
+    'load_837_headers_batch': CopySpec(
+        'stg_claim_header',
+        [('claim_id', 'TEXT'), ('member_id', 'TEXT'), ('claim_type', 'TEXT'), ('service_from_date', 'DATE'),
+         ('service_to_date', 'DATE'), ('billing_provider_npi', 'TEXT'), ('facility_npi', 'TEXT'),
+         ('total_charge_amount', 'DECIMAL(12,2)'), ('raw_edi_data', 'TEXT'), ('claim_frequency_code', 'TEXT')],
+        claim_header_row,
+        """
+        INSERT INTO claim_header (
+          claim_id, member_id, claim_type, claim_status, service_from_date,
+          service_to_date, billing_provider_npi, facility_npi, total_charge_amount,
+          claim_frequency_code, raw_edi_data
+        )
+        SELECT DISTINCT ON (claim_id) claim_id, member_id, claim_type, 'Submitted', service_from_date,
+          service_to_date, billing_provider_npi, facility_npi, total_charge_amount,
+          claim_frequency_code, raw_edi_data
+        FROM stg_claim_header
+        ORDER BY claim_id, staged_seq DESC
+        ON CONFLICT (claim_id) DO UPDATE SET
+          member_id = EXCLUDED.member_id,
+          claim_type = EXCLUDED.claim_type,
+          service_from_date = EXCLUDED.service_from_date,
+          service_to_date = EXCLUDED.service_to_date,
+          billing_provider_npi = EXCLUDED.billing_provider_npi,
+          facility_npi = EXCLUDED.facility_npi,
+          total_charge_amount = EXCLUDED.total_charge_amount,
+          claim_frequency_code = EXCLUDED.claim_frequency_code,
+          raw_edi_data = EXCLUDED.raw_edi_data
+        WHERE EXCLUDED.claim_frequency_code IN ('7', '8')
+        """,
+        order_key='claim_id'
+    ),
+    'load_837_lines_batch': CopySpec(
+        'stg_claim_line',
+        [('claim_id', 'TEXT'), ('line_number', 'INTEGER'), ('procedure_code', 'TEXT'),
+         ('diagnosis_code', 'TEXT'), ('service_date', 'DATE'), ('charge_amount', 'DECIMAL(12,2)')],
+        claim_line_row,
+        """
+        INSERT INTO claim_line (
+          line_id, claim_id, line_number, procedure_code, diagnosis_code,
+          service_date, charge_amount
+        )
+        SELECT DISTINCT ON (claim_id, line_number) claim_id || '-LINE-' || line_number, claim_id,
+          line_number, procedure_code, diagnosis_code, service_date, charge_amount
+        FROM stg_claim_line
+        ORDER BY claim_id, line_number, staged_seq DESC
+        ON CONFLICT (claim_id, line_number) DO UPDATE SET
+          procedure_code = EXCLUDED.procedure_code,
+          diagnosis_code = EXCLUDED.diagnosis_code,
+          service_date = EXCLUDED.service_date,
+          charge_amount = EXCLUDED.charge_amount
+        WHERE (claim_line.procedure_code, claim_line.diagnosis_code, claim_line.service_date, claim_line.charge_amount)
+          IS DISTINCT FROM (EXCLUDED.procedure_code, EXCLUDED.diagnosis_code, EXCLUDED.service_date,
+                            EXCLUDED.charge_amount)
+          OR claim_line.updated_at < (SELECT ch.updated_at FROM claim_header ch WHERE ch.claim_id = claim_line.claim_id)
+        """,
+        order_key='claim_id'
+    ),
+    'load_rx_benefit_batch': CopySpec(
+        'stg_rx_benefit_inquiry',
+        [('member_id', 'TEXT'), ('inquiry_date', 'TIMESTAMPTZ'), ('ndc_code', 'TEXT'), ('drug_name', 'TEXT'),
+         ('drug_class', 'TEXT'), ('prescriber_npi', 'TEXT'), ('pharmacy_npi', 'TEXT'),
+         ('days_supply', 'INTEGER'), ('quantity', 'DECIMAL(10,2)'), ('coverage_status', 'TEXT'),
+         ('copay_amount', 'DECIMAL(8,2)'), ('indication', 'TEXT'), ('raw_transaction_data', 'TEXT')],
+        rx_benefit_row,
+        """
+        INSERT INTO rx_benefit_inquiry (
+          inquiry_id, member_id, inquiry_date, ndc_code, drug_name, drug_class,
+          prescriber_npi, pharmacy_npi, days_supply, quantity, coverage_status,
+          copay_amount, indication, raw_transaction_data
+        )
+        SELECT 'RX-' || member_id || '-' || TO_CHAR(inquiry_date, 'YYYYMMDDHH24MISS'),
+          member_id, inquiry_date, ndc_code, drug_name, drug_class,
+          prescriber_npi, pharmacy_npi, days_supply, quantity, coverage_status,
+          copay_amount, indication, raw_transaction_data
+        FROM stg_rx_benefit_inquiry
+        ON CONFLICT (inquiry_id) DO NOTHING
+        """
+    )
+}
+
+# COPY text format escapes (backslash first)
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def copy_value(value: Any) -> str:
+    """One field in COPY text format (\\N for NULL)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:
+        return '\\N'
+    return str(value).translate(_COPY_ESCAPES)
+
+class CopyStream(io.RawIOBase):
+    """File-like COPY FROM STDIN source encoding rows lazily, one line at a time"""
+
+    def __init__(self, rows: Iterable[Tuple]):
+        self._lines = ('\t'.join(map(copy_value, row)) + '\n' for row in rows)
+        self._pending = b''
+        self.rows = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while len(self._pending) < len(buffer):
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._pending += line.encode('utf-8')
+            self.rows += 1
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+class CopyDatabaseConnection:
+    """Pooled PostgreSQL connection that bulk loads batches through COPY"""
+
+    def __init__(self, dsn: Optional[str] = None, batch_size: int = DEFAULT_COPY_BATCH_SIZE,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        """
+        Args:
+            dsn: libpq connection string (default: DATABASE_URL, else the
+                DB_HOST/DB_NAME/DB_USER/DB_PASSWORD variables DatabaseConnection reads)
+            batch_size: Records staged and merged per transaction
+            max_connections: Pool size, and the number of batches loaded concurrently
+        """
+        if psycopg2 is None:
+            raise ImportError("psycopg2 library not installed. Install it with: pip install psycopg2-binary")
+
+        self.host = os.getenv('DB_HOST', 'localhost')
+        self.database = os.getenv('DB_NAME', 'clinical_forecasting')
+        self.user = os.getenv('DB_USER', 'postgres')
+        self.password = os.getenv('DB_PASSWORD', '')
+        self.dsn = dsn or os.getenv('DATABASE_URL')
+        self.batch_size = batch_size
+        self.max_connections = max_connections
+
+        if self.dsn:
+            self.pool = ThreadedConnectionPool(1, max_connections, self.dsn)
+        else:
+            self.pool = ThreadedConnectionPool(1, max_connections, host=self.host, dbname=self.database,
+                                               user=self.user, password=self.password)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='pg-copy')
+        self._lock = threading.Lock()
+
+        self.rows_copied = 0
+        self.rows_inserted = 0
+        self.batches = 0
+        self.batch_seconds = Histogram()
+
+    def __enter__(self) -> 'CopyDatabaseConnection':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def execute_function(self, function_name: str, data: Iterable[Dict]) -> int:
+        """
+        Bulk load records for one of the load_*_batch functions
+
+        Records are read lazily, batch_size at a time, so a parser generator
+        can be passed straight in. Returns once every batch has committed;
+        a failed batch raises after the batches already in flight finish.
+        With an order_key, a lane's next batch starts only after its
+        previous one committed.
+
+        Returns:
+            Number of records loaded (rows skipped by ON CONFLICT included)
+        """
+        spec = COPY_SPECS.get(function_name)
+        if spec is None:
+            raise ValueError(f"No COPY load path for {function_name}")
+
+        # Pool threads don't see the caller's context, so pass the stage along
+        stage = current_stage()
+        pending = set()
+        lane_tails = {}
+        count = 0
+        try:
+            for lane, batch in self._batches(spec, iter(data)):
+                count += len(batch)
+                if lane in lane_tails:
+                    lane_tails[lane].result()
+                if len(pending) >= self.max_connections:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                future = self._executor.submit(self._load_batch, spec, batch, stage)
+                pending.add(future)
+                if lane is not None:
+                    lane_tails[lane] = future
+        finally:
+            done, _ = wait(pending)
+        for future in done:
+            future.result()
+
+        print(f"✓ {function_name}: {count} records via COPY into {spec.staging_table}")
+        return count
+
+    def _batches(self, spec: CopySpec, records: Iterator[Dict]) -> Iterator[Tuple[Optional[int], List[Dict]]]:
+        """
+        (lane, batch) pairs of up to batch_size records; the lane is None
+        without an order_key. Keyed records are buffered per lane, so up to
+        max_connections batches are held at once
+        """
+        if spec.order_key is None:
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    return
+                yield None, batch
+
+        lanes = [[] for _ in range(self.max_connections)]
+        for record in records:
+            lane = zlib.crc32(str(record.get(spec.order_key)).encode()) % len(lanes)
+            lanes[lane].append(record)
+            if len(lanes[lane]) >= self.batch_size:
+                yield lane, lanes[lane]
+                lanes[lane] = []
+        for lane, batch in enumerate(lanes):
+            if batch:
+                yield lane, batch
+
+    def execute_query(self, query: str, params: tuple = None):
+        """Execute SQL query, returning its rows (None for statements without results)"""
+        connection = self.pool.getconn()
+        try:
+            with connection, connection.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall() if cursor.description else None
+        finally:
+            self.pool.putconn(connection)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.closeall()
+
+    def _load_batch(self, spec: CopySpec, batch: List[Dict], stage: Optional[StageMetrics] = None):
+        """COPY one batch into staging and merge it, in one transaction"""
+        started = time.perf_counter()
+        stream = CopyStream(spec.to_row(record) for record in batch)
+        column_names = ', '.join(name for name, _ in spec.columns)
+
+        connection = self.pool.getconn()
+        try:
+            # Commits on success (emptying the ON COMMIT DELETE ROWS staging
+            # table), rolls back on error
+            with connection, connection.cursor() as cursor:
+                self._create_staging(cursor, spec)
+                cursor.copy_expert(f"COPY {spec.staging_table} ({column_names}) FROM STDIN",
+                                   io.BufferedReader(stream, buffer_size=256 * 1024))
+                cursor.execute(spec.merge_sql)
+                inserted = cursor.rowcount
+        finally:
+            self.pool.putconn(connection)
+
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.rows_copied += stream.rows
+            self.rows_inserted += inserted
+            self.batches += 1
+            self.batch_seconds.observe(seconds)
+        if stage is not None:
+            stage.observe_batch(stream.rows, seconds)
+
+    def _create_staging(self, cursor, spec: CopySpec):
+        """Create the session's staging table (a no-op after the first batch on a connection)"""
+        # staged_seq keeps file order within a batch (lanes keep it across
+        # batches), so the last copy of a re-sent claim wins
+        columns = ', '.join(f"{name} {pg_type}" for name, pg_type in spec.columns)
+        columns += ', staged_seq BIGINT GENERATED ALWAYS AS IDENTITY'
+        cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {spec.staging_table} ({columns}) "
+                       f"ON COMMIT DELETE ROWS")
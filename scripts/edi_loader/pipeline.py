@@ -0,0 +1,304 @@
+"""
+Asyncio pipeline runner for the Supabase loader
+
+Stages are declared with the stages they depend on and run as soon as
+those have finished, so independent stages (e.g. the four EDI loads once
+members are in) overlap instead of running one after another. The order
+comes from the declared DAG, not from call order.
+
+Inside a stage, stream() runs a blocking record generator (a parser, or a
+paged PostgREST read) on a worker thread and hands chunks of records to
+transform coroutines through a bounded asyncio.Queue. The transforms
+classify/enrich records and pass them to AsyncBatchWriters, which upsert on
+their own thread pool. A full queue stalls the generator and a writer with
+max_in_flight batches outstanding stalls the transforms, so parse CPU and
+database latency overlap while memory stays bounded.
+
+With a RunMetrics, each stage runs inside metrics.stage(name), and stream()
+adds the records it reads and its generator thread's CPU time to that stage.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from batch_writer import DEFAULT_MAX_IN_FLIGHT, BatchWriter
+from metrics import RunMetrics, current_stage
+
+# Records buffered between a generator and its transform workers
+DEFAULT_QUEUE_SIZE = int(os.environ.get('CFE_QUEUE_SIZE', 10000))
+
+# Records handed across the thread boundary at once
+DEFAULT_CHUNK_SIZE = 500
+
+# Transform coroutines consuming each queue
+DEFAULT_TRANSFORM_WORKERS = int(os.environ.get('CFE_TRANSFORM_WORKERS', 2))
+
+_DONE = object()
+
+class _Failed:
+    """Wraps an exception raised by a generator thread"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+class Stage:
+    """One named step of a pipeline and the stages it waits for"""
+
+    def __init__(self, name: str, run: Callable[[], Any], depends_on: Sequence[str] = ()):
+        """
+        Args:
+            name: Stage name, used by other stages' depends_on
+            run: Coroutine function or plain callable taking no arguments;
+                plain callables run on a worker thread
+            depends_on: Stages that must finish before this one starts
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+
+class Pipeline:
+    """DAG of stages, run concurrently in dependency order"""
+
+    def __init__(self, metrics: Optional[RunMetrics] = None):
+        """
+        Args:
+            metrics: Run metrics each stage is measured into
+        """
+        self.metrics = metrics
+        self.stages: Dict[str, Stage] = {}
+        # Return value of every finished stage, by name
+        self.results: Dict[str, Any] = {}
+
+    def add(self, name: str, run: Callable[[], Any], depends_on: Sequence[str] = ()) -> Stage:
+        """Declare a stage"""
+        if name in self.stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        stage = Stage(name, run, depends_on)
+        self.stages[name] = stage
+        return stage
+
+    def order(self) -> List[str]:
+        """Stage names in a valid execution order; rejects unknown dependencies and cycles"""
+        for stage in self.stages.values():
+            unknown = [name for name in stage.depends_on if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+
+        ordered = []
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items()
+                     if all(dep not in remaining for dep in stage.depends_on)]
+            if not ready:
+                raise ValueError(f"Pipeline stages form a cycle: {', '.join(sorted(remaining))}")
+            for name in ready:
+                ordered.append(name)
+                del remaining[name]
+        return ordered
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every stage; the first failure cancels the stages still running"""
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage):
+            await asyncio.gather(*(tasks[name] for name in stage.depends_on))
+            # Tasks and to_thread copy the context, so the stage is current inside
+            with self.metrics.stage(stage.name) if self.metrics else nullcontext():
+                if asyncio.iscoroutinefunction(stage.run):
+                    result = await stage.run()
+                else:
+                    result = await asyncio.to_thread(stage.run)
+            self.results[stage.name] = result
+            return result
+
+        # Dependencies come first in order(), so their tasks already exist
+        for name in self.order():
+            tasks[name] = asyncio.create_task(run_stage(self.stages[name]), name=name)
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return self.results
+
+async def stream(records: Iterable, transform: Callable[[List], Awaitable[None]],
+                 workers: int = DEFAULT_TRANSFORM_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Feed a blocking generator to transform coroutines through a bounded queue
+
+    Args:
+        records: Iterable that may block (parser, paged query); consumed on
+            a worker thread
+        transform: Coroutine called with each chunk of up to chunk_size
+            records, by one of `workers` concurrent consumers
+        workers: Concurrent transform coroutines
+        queue_size: Records buffered between the generator and the transforms
+        chunk_size: Records per queue item (amortizes the thread hand-off)
+
+    Returns:
+        Number of records consumed
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max(queue_size // chunk_size, 1))
+    stop = threading.Event()
+    stage = current_stage()
+
+    def put(item):
+        # Blocks this thread while the queue is full (backpressure)
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> int:
+        count = 0
+        chunk = []
+        cpu_started = time.thread_time()
+        try:
+            for record in records:
+                if stop.is_set():
+                    return count
+                chunk.append(record)
+                if len(chunk) == chunk_size:
+                    put(chunk)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                put(chunk)
+                count += len(chunk)
+        except BaseException as e:
+            put(_Failed(e))
+        finally:
+            if stage is not None:
+                stage.add(records=count, parse_cpu_seconds=time.thread_time() - cpu_started)
+            for _ in range(workers):
+                put(_DONE)
+        return count
+
+    async def consume():
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            await transform(item)
+
+    producer = loop.run_in_executor(None, produce)
+    consumers = [asyncio.create_task(consume()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*consumers)
+    except BaseException:
+        for consumer in consumers:
+            consumer.cancel()
+        # Unblock the generator thread so it can see the stop flag
+        stop.set()
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.sleep(0.01)
+        raise
+    return await producer
+
+class AsyncBatchWriter(BatchWriter):
+    """
+    BatchWriter for coroutines: batches are sent on the writer's thread pool
+    and awaited, so a full set of in-flight batches suspends the caller
+    instead of blocking the event loop
+    """
+
+    def __init__(self, client: Any, table: str, depends_on: Optional['AsyncBatchWriter'] = None, **options):
+        """
+        Args:
+            client: Supabase client (see BatchWriter)
+            table: Target table name
+            depends_on: Writer whose batches must land before each of ours
+            **options: batch_size, max_in_flight, max_retries,
+                backoff_seconds and on_conflict, as for BatchWriter
+        """
+        super().__init__(client, table, **options)
+        self.async_depends_on = depends_on
+        self._async_slots = asyncio.Semaphore(options.get('max_in_flight', DEFAULT_MAX_IN_FLIGHT))
+
+    async def __aenter__(self) -> 'AsyncBatchWriter':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.aclose()
+        else:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def awrite(self, row: Dict):
+        """Add one row, sending a batch once batch_size rows are buffered"""
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            await self._asubmit()
+
+    async def awrite_all(self, rows: Iterable[Dict]) -> int:
+        """Add every row from an iterable"""
+        count = 0
+        for row in rows:
+            await self.awrite(row)
+            count += 1
+        return count
+
+    async def aflush(self):
+        """Send any partially filled batch"""
+        if self._batch:
+            await self._asubmit()
+
+    async def adrain(self):
+        """Send the partial batch and wait for every in-flight batch to finish"""
+        await self.aflush()
+        # Waits on a snapshot rather than taking the list, so a concurrent
+        # drain from another worker also waits for these batches
+        await asyncio.gather(*list(self._pending))
+        self._reap()
+
+    async def aclose(self):
+        """Drain and release the worker threads"""
+        try:
+            await self.adrain()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    async def _asubmit(self):
+        batch, self._batch = self._batch, []
+        loop = asyncio.get_running_loop()
+
+        # Registered before any await: several transform workers share a
+        # writer, so a dependent writer draining us while this batch waits
+        # for the dependency or a slot must still wait for it
+        submitted = loop.create_future()
+        self._pending.append(submitted)
+
+        try:
+            if self.async_depends_on is not None:
+                await self.async_depends_on.adrain()
+            await self._async_slots.acquire()
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                submitted.cancel()
+            else:
+                submitted.set_exception(error)
+            raise
+
+        def settle(future):
+            self._async_slots.release()
+            if submitted.done():
+                return
+            if future.cancelled():
+                submitted.cancel()
+            elif future.exception() is not None:
+                submitted.set_exception(future.exception())
+            else:
+                submitted.set_result(future.result())
+
+        loop.run_in_executor(self._executor, self._send, batch).add_done_callback(settle)
+        self._reap()
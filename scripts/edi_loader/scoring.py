@@ -0,0 +1,221 @@
+"""
+Columnar scoring engine for prediction results
+
+Models take member features as parallel NumPy arrays (one element per
+member) and score the whole population in a handful of vectorized
+operations, instead of a Python loop building one dict per member.
+
+Models are looked up by model_version, so a new versioned model can be
+registered and selected (CFE_MODEL_VERSION) without touching the loader.
+"""
+
+import os
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Type
+
+import numpy as np
+
+DEFAULT_MODEL_VERSION = 'v1.0-rule-based'
+
+class ScoreResult:
+    """Per-member scores as parallel arrays"""
+
+    def __init__(self, model_version: str, probability: np.ndarray, confidence_low: np.ndarray,
+                 confidence_high: np.ndarray, days_ahead: np.ndarray, feature_names: Sequence[str],
+                 feature_importance: np.ndarray):
+        """
+        Args:
+            model_version: Version of the model that produced the scores
+            probability: Event probability per member
+            confidence_low: Lower confidence bound per member
+            confidence_high: Upper confidence bound per member
+            days_ahead: Predicted days from the prediction date to the event
+            feature_names: Names of the feature_importance columns
+            feature_importance: (members x features) importance weights
+        """
+        self.model_version = model_version
+        self.probability = probability
+        self.confidence_low = confidence_low
+        self.confidence_high = confidence_high
+        self.days_ahead = days_ahead
+        self.feature_names = list(feature_names)
+        self.feature_importance = feature_importance
+
+    def __len__(self) -> int:
+        return len(self.probability)
+
+    def to_records(self, member_ids: Sequence[str], episode_id: str,
+                   prediction_date: Optional[date] = None) -> Iterator[Dict]:
+        """Yield prediction_result rows, one per member"""
+        prediction_date = prediction_date or date.today()
+        event_dates = np.datetime64(prediction_date, 'D') + self.days_ahead.astype('timedelta64[D]')
+        event_dates = event_dates.astype(str).tolist()
+
+        probability = np.round(self.probability, 2).tolist()
+        low = np.round(self.confidence_low, 2).tolist()
+        high = np.round(self.confidence_high, 2).tolist()
+        importance = np.round(self.feature_importance, 4).tolist()
+        names = self.feature_names
+        prediction_date = prediction_date.isoformat()
+
+        for i, member_id in enumerate(member_ids):
+            yield {
+                'member_id': member_id,
+                'episode_id': episode_id,
+                'prediction_date': prediction_date,
+                'predicted_event_date': event_dates[i],
+                'probability_score': probability[i],
+                'model_version': self.model_version,
+                'confidence_interval_low': low[i],
+                'confidence_interval_high': high[i],
+                'feature_importance': dict(zip(names, importance[i]))
+            }
+
+class ScoringModel:
+    """Base class for prediction models; subclasses implement score()"""
+
+    model_version = None
+
+    # Feature arrays the model reads from the features dict
+    required_features = ()
+
+    def score(self, features: Dict[str, np.ndarray]) -> ScoreResult:
+        """Score every member at once from parallel feature arrays"""
+        raise NotImplementedError
+
+    def check_features(self, features: Dict[str, np.ndarray]) -> int:
+        """Validate the feature arrays and return the member count"""
+        missing = [name for name in self.required_features if name not in features]
+        if missing:
+            raise ValueError(f"Model {self.model_version} is missing features: {', '.join(missing)}")
+
+        lengths = {len(features[name]) for name in self.required_features}
+        if len(lengths) > 1:
+            raise ValueError(f"Feature arrays for model {self.model_version} have different lengths")
+        return lengths.pop() if lengths else 0
+
+MODEL_REGISTRY: Dict[str, Type[ScoringModel]] = {}
+
+def register_model(model_class: Type[ScoringModel]) -> Type[ScoringModel]:
+    """Class decorator that makes a model selectable by its model_version"""
+    MODEL_REGISTRY[model_class.model_version] = model_class
+    return model_class
+
+def get_model(model_version: Optional[str] = None, **options) -> ScoringModel:
+    """Instantiate a registered model (default: CFE_MODEL_VERSION or the rule-based model)"""
+    model_version = model_version or os.environ.get('CFE_MODEL_VERSION') or DEFAULT_MODEL_VERSION
+    if model_version not in MODEL_REGISTRY:
+        raise ValueError(f"Unknown model version {model_version}. Available: {', '.join(sorted(MODEL_REGISTRY))}")
+    return MODEL_REGISTRY[model_version](**options)
+
+@register_model
+class RuleBasedModel(ScoringModel):
+    """
+    Baseline rule: 0.5 + 0.1 per intent signal (boost capped at 0.4,
+    probability capped at 0.95), +/-0.15 confidence band, event 30-120 days out
+    """
+
+    model_version = DEFAULT_MODEL_VERSION
+    required_features = ('signal_count',)
+    feature_names = ('chronic_condition', 'intent_signals', 'demographics')
+    importance = (0.6, 0.3, 0.1)
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = np.random.default_rng(seed)
+
+    def score(self, features: Dict[str, np.ndarray]) -> ScoreResult:
+        count = self.check_features(features)
+        signal_count = np.asarray(features['signal_count'], dtype=np.float64)
+
+        probability = np.minimum(0.5 + np.minimum(signal_count * 0.1, 0.4), 0.95)
+
+        return ScoreResult(
+            model_version=self.model_version,
+            probability=probability,
+            confidence_low=np.maximum(probability - 0.15, 0.0),
+            confidence_high=np.minimum(probability + 0.15, 1.0),
+            days_ahead=self.rng.integers(30, 121, size=count),
+            feature_names=self.feature_names,
+            feature_importance=np.broadcast_to(np.array(self.importance), (count, len(self.importance)))
+        )
+
+@register_model
+class SignalFeatureModel(ScoringModel):
+    """
+    Logistic model over the time-decayed signal features of
+    signal_features.build_signal_features; a missing feature (NaN, e.g. no
+    prior auth yet) contributes nothing. The confidence band narrows as
+    signals accumulate and a recent PA or referral -> PA progression
+    brings the predicted event date forward
+    """
+
+    model_version = 'v2.0-signal-features'
+    required_features = ('signal_count', 'decayed_strength', 'decayed_eligibility', 'days_since_last_pa',
+                         'referral_to_pa', 'rx_escalation', 'condition_tenure_days')
+
+    # Transformed feature -> coefficient of its logit contribution
+    coefficients = {
+        'intent_strength': 0.8,
+        'eligibility_checks': 0.4,
+        'prior_auth_recency': 1.4,
+        'referral_to_pa': 0.9,
+        'rx_escalation': 1.1,
+        'condition_tenure': 0.3,
+    }
+    intercept = -1.2
+
+    # Days for a prior auth's recency weight to fall to 1/e
+    pa_recency_days = 90.0
+
+    def __init__(self, coefficients: Optional[Dict[str, float]] = None, intercept: Optional[float] = None):
+        self.coefficients = {**self.coefficients, **(coefficients or {})}
+        if intercept is not None:
+            self.intercept = intercept
+
+    def transform(self, features: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Model inputs on comparable scales, NaN replaced by 0"""
+        def column(name):
+            return np.asarray(features[name], dtype=np.float64)
+
+        inputs = {
+            'intent_strength': np.log1p(column('decayed_strength')),
+            'eligibility_checks': np.log1p(column('decayed_eligibility')),
+            'prior_auth_recency': np.exp(-column('days_since_last_pa') / self.pa_recency_days),
+            'referral_to_pa': column('referral_to_pa'),
+            'rx_escalation': column('rx_escalation') / 3,
+            'condition_tenure': np.log1p(np.maximum(column('condition_tenure_days'), 0) / 365),
+        }
+        return {name: np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0) for name, values in inputs.items()}
+
+    def score(self, features: Dict[str, np.ndarray]) -> ScoreResult:
+        count = self.check_features(features)
+        inputs = self.transform(features)
+        names = list(self.coefficients)
+
+        contributions = np.column_stack([self.coefficients[name] * inputs[name] for name in names]) \
+            if count else np.empty((0, len(names)))
+        probability = 1 / (1 + np.exp(-(self.intercept + contributions.sum(axis=1))))
+
+        magnitude = np.abs(contributions)
+        total = magnitude.sum(axis=1, keepdims=True)
+        importance = np.divide(magnitude, total, out=np.zeros_like(magnitude), where=total > 0)
+
+        half_width = 0.25 / np.sqrt(1 + np.asarray(features['signal_count'], dtype=np.float64))
+        days_ahead = 120 - 60 * inputs['prior_auth_recency'] - 20 * inputs['referral_to_pa'] \
+            - 15 * inputs['rx_escalation']
+
+        return ScoreResult(
+            model_version=self.model_version,
+            probability=probability,
+            confidence_low=np.maximum(probability - half_width, 0.0),
+            confidence_high=np.minimum(probability + half_width, 1.0),
+            days_ahead=np.clip(np.rint(days_ahead), 14, 180).astype(np.int64),
+            feature_names=names,
+            feature_importance=importance
+        )
+
+def score_members(member_ids: List[str], features: Dict[str, np.ndarray], episode_id: str,
+                  model: Optional[ScoringModel] = None) -> Iterator[Dict]:
+    """Score members with the selected model and yield prediction_result rows"""
+    model = model or get_model()
+    return model.score(features).to_records(member_ids, episode_id)
@@ -3,6 +3,7 @@
 -- Run this FIRST before any other scripts
 
 -- Drop existing tables if they exist (for clean reinstall)
+DROP TABLE IF EXISTS forecast_monthly_aggregate CASCADE;
 DROP TABLE IF EXISTS prediction_result CASCADE;
 DROP TABLE IF EXISTS clinical_outcome_event CASCADE;
 DROP TABLE IF EXISTS clinical_intent_event CASCADE;
@@ -13,6 +14,8 @@ DROP TABLE IF EXISTS prior_auth_request CASCADE;
 DROP TABLE IF EXISTS eligibility_inquiry_event CASCADE;
 DROP TABLE IF EXISTS member_chronic_condition CASCADE;
 DROP TABLE IF EXISTS episode_diagnosis_map CASCADE;
+DROP TABLE IF EXISTS episode_drug_class_map CASCADE;
+DROP TABLE IF EXISTS event_derivation_watermark CASCADE;
 DROP TABLE IF EXISTS episode_procedure_map CASCADE;
 DROP TABLE IF EXISTS episode_definition CASCADE;
 DROP TABLE IF EXISTS member CASCADE;
@@ -50,6 +53,15 @@ CREATE TABLE episode_diagnosis_map (
   UNIQUE(episode_id, diagnosis_code)
 );
 
+-- 3b. Drug class mappings (Rx benefit checks -> episodes, seeded in 02)
+CREATE TABLE episode_drug_class_map (
+  id SERIAL PRIMARY KEY,
+  episode_id TEXT NOT NULL REFERENCES episode_definition(episode_id),
+  drug_class TEXT NOT NULL UNIQUE,
+  signal_strength DECIMAL(5,2) NOT NULL DEFAULT 40.0,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- 4. Member demographics (from proprietary enrollment system)
 CREATE TABLE member (
   member_id TEXT PRIMARY KEY,
@@ -157,8 +169,11 @@ CREATE TABLE claim_header (
   facility_npi TEXT,
   total_charge_amount DECIMAL(12,2),
   paid_amount DECIMAL(12,2),
+  -- CLM05-3: 1 original, 7 replacement, 8 void
+  claim_frequency_code TEXT DEFAULT '1',
   raw_edi_data TEXT,
-  created_at TIMESTAMPTZ DEFAULT NOW()
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 -- 10. Claim line items
@@ -171,6 +186,7 @@ CREATE TABLE claim_line (
   service_date DATE NOT NULL,
   charge_amount DECIMAL(12,2),
   created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
   UNIQUE (claim_id, line_number)
 );
 
@@ -195,13 +211,17 @@ CREATE TABLE clinical_outcome_event (
   member_id TEXT REFERENCES member(member_id),
   episode_id TEXT REFERENCES episode_definition(episode_id),
   claim_id TEXT REFERENCES claim_header(claim_id),
+  line_id TEXT UNIQUE REFERENCES claim_line(line_id) ON DELETE CASCADE,
   procedure_date DATE NOT NULL,
   procedure_code TEXT NOT NULL,
   diagnosis_code TEXT,
   provider_npi TEXT,
   facility_npi TEXT,
   total_cost DECIMAL(12,2),
-  created_at TIMESTAMPTZ DEFAULT NOW()
+  -- The claim was voided (CLM05-3 = 8) or its line no longer maps to an episode
+  is_voided BOOLEAN DEFAULT false,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 -- 13. Prediction results (ML model output)
@@ -220,6 +240,23 @@ CREATE TABLE prediction_result (
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Monthly volume and cost cube behind the dashboard forecast and cost
+-- projection APIs. Maintained by the Python loader after prediction
+-- generation; missing member dimensions are stored as 'Unknown'
+CREATE TABLE forecast_monthly_aggregate (
+  episode_id TEXT REFERENCES episode_definition(episode_id),
+  region TEXT NOT NULL,
+  network TEXT NOT NULL,
+  plan_type TEXT NOT NULL,
+  month DATE NOT NULL,
+  actual_volume INTEGER NOT NULL DEFAULT 0,
+  actual_cost DECIMAL(14,2) NOT NULL DEFAULT 0,
+  predicted_volume INTEGER NOT NULL DEFAULT 0,
+  predicted_cost DECIMAL(14,2) NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (episode_id, region, network, plan_type, month)
+);
+
 -- Adding episode_code_mapping table for database-driven rules
 -- This table replaces hardcoded logic and supports multi-client customization
 CREATE TABLE episode_code_mapping (
@@ -238,6 +275,14 @@ CREATE TABLE episode_code_mapping (
   UNIQUE(episode_id, code_type, code_value, client_id)
 );
 
+-- High-water marks (latest source created_at already processed) for the
+-- incremental event generator functions
+CREATE TABLE event_derivation_watermark (
+  source_table TEXT PRIMARY KEY,
+  high_water_mark TIMESTAMPTZ NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- Create indexes for performance
 CREATE INDEX idx_member_enrollment_status ON member(enrollment_status);
 CREATE INDEX idx_member_region ON member(geographic_region);
@@ -246,37 +291,62 @@ CREATE INDEX idx_member_plan ON member(plan_type);
 
 CREATE INDEX idx_eligibility_member_date ON eligibility_inquiry_event(member_id, inquiry_date);
 CREATE INDEX idx_eligibility_procedure ON eligibility_inquiry_event(procedure_code);
+CREATE INDEX idx_eligibility_created_at ON eligibility_inquiry_event(created_at);
 
 CREATE INDEX idx_prior_auth_member_date ON prior_auth_request(member_id, request_date);
 CREATE INDEX idx_prior_auth_procedure ON prior_auth_request(procedure_code);
 CREATE INDEX idx_prior_auth_status ON prior_auth_request(auth_status);
 CREATE INDEX idx_prior_auth_request_type ON prior_auth_request(request_type);
+CREATE INDEX idx_prior_auth_created_at ON prior_auth_request(created_at);
 
 CREATE INDEX idx_rx_benefit_member_date ON rx_benefit_inquiry(member_id, inquiry_date);
 CREATE INDEX idx_rx_benefit_ndc ON rx_benefit_inquiry(ndc_code);
 CREATE INDEX idx_rx_benefit_drug_class ON rx_benefit_inquiry(drug_class);
+CREATE INDEX idx_rx_benefit_created_at ON rx_benefit_inquiry(created_at);
 
 CREATE INDEX idx_claim_member_date ON claim_header(member_id, service_from_date);
 CREATE INDEX idx_claim_status ON claim_header(claim_status);
+CREATE INDEX idx_claim_updated_at ON claim_header(updated_at);
 
 CREATE INDEX idx_claim_line_procedure ON claim_line(procedure_code);
 CREATE INDEX idx_claim_line_date ON claim_line(service_date);
+CREATE INDEX idx_claim_line_updated_at ON claim_line(updated_at);
 
 CREATE INDEX idx_intent_member_episode ON clinical_intent_event(member_id, episode_id);
 CREATE INDEX idx_intent_event_type ON clinical_intent_event(event_type);
 
+-- Source code -> episode joins in the event generator functions
+CREATE INDEX idx_episode_procedure_code ON episode_procedure_map(procedure_code);
+
 CREATE INDEX idx_outcome_member_episode ON clinical_outcome_event(member_id, episode_id);
 CREATE INDEX idx_outcome_date ON clinical_outcome_event(procedure_date);
+CREATE INDEX idx_outcome_claim ON clinical_outcome_event(claim_id);
 
 CREATE INDEX idx_prediction_member_episode ON prediction_result(member_id, episode_id);
 CREATE INDEX idx_prediction_date ON prediction_result(predicted_event_date);
 CREATE INDEX idx_prediction_risk_tier ON prediction_result(risk_tier);
 
+CREATE INDEX idx_forecast_aggregate_month ON forecast_monthly_aggregate(episode_id, month);
+
 -- Creating composite index for fast lookups at scale
 CREATE INDEX idx_code_mapping_lookup ON episode_code_mapping(code_type, code_value, client_id);
 CREATE INDEX idx_code_mapping_episode ON episode_code_mapping(episode_id, is_primary);
 CREATE INDEX idx_code_mapping_expiration ON episode_code_mapping(expiration_date) WHERE expiration_date IS NOT NULL;
 
+-- Keep updated_at current on claims, whichever loader rewrites them
+-- (create_clinical_outcome_events picks up changed claims by updated_at)
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_claim_header_updated_at BEFORE UPDATE ON claim_header
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE TRIGGER trg_claim_line_updated_at BEFORE UPDATE ON claim_line
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
 -- EDI Loader Functions (consolidated)
 CREATE OR REPLACE FUNCTION load_270_eligibility(
   p_member_id TEXT,
@@ -344,6 +414,9 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Replacement (7) and void (8) claims update the stored claim with the
+-- same claim_id; a re-sent original (1) leaves it as it is
+DROP FUNCTION IF EXISTS load_837_claim_header(TEXT, TEXT, TEXT, DATE, DATE, TEXT, TEXT, DECIMAL, TEXT);
 CREATE OR REPLACE FUNCTION load_837_claim_header(
   p_claim_id TEXT,
   p_member_id TEXT,
@@ -353,21 +426,38 @@ CREATE OR REPLACE FUNCTION load_837_claim_header(
   p_billing_provider_npi TEXT,
   p_facility_npi TEXT,
   p_total_charge_amount DECIMAL,
-  p_raw_edi TEXT
+  p_raw_edi TEXT,
+  p_claim_frequency_code TEXT DEFAULT '1'
 ) RETURNS TEXT AS $$
 BEGIN
   INSERT INTO claim_header (
     claim_id, member_id, claim_type, claim_status, service_from_date,
-    service_to_date, billing_provider_npi, facility_npi, total_charge_amount, raw_edi_data
+    service_to_date, billing_provider_npi, facility_npi, total_charge_amount,
+    claim_frequency_code, raw_edi_data
   ) VALUES (
     p_claim_id, p_member_id, p_claim_type, 'Submitted', p_service_from_date,
-    p_service_to_date, p_billing_provider_npi, p_facility_npi, p_total_charge_amount, p_raw_edi
-  ) ON CONFLICT (claim_id) DO NOTHING;
+    p_service_to_date, p_billing_provider_npi, p_facility_npi, p_total_charge_amount,
+    COALESCE(p_claim_frequency_code, '1'), p_raw_edi
+  ) ON CONFLICT (claim_id) DO UPDATE SET
+    member_id = EXCLUDED.member_id,
+    claim_type = EXCLUDED.claim_type,
+    service_from_date = EXCLUDED.service_from_date,
+    service_to_date = EXCLUDED.service_to_date,
+    billing_provider_npi = EXCLUDED.billing_provider_npi,
+    facility_npi = EXCLUDED.facility_npi,
+    total_charge_amount = EXCLUDED.total_charge_amount,
+    claim_frequency_code = EXCLUDED.claim_frequency_code,
+    raw_edi_data = EXCLUDED.raw_edi_data
+  WHERE EXCLUDED.claim_frequency_code IN ('7', '8');
   
   RETURN p_claim_id;
 END;
 $$ LANGUAGE plpgsql;
 
+-- A line re-sent with different values (i.e. from a replacement claim)
+-- overwrites the stored line; identical re-sends are no-ops unless the header
+-- was rewritten since the line was (a replacement re-sending the line), so
+-- the lines a replacement drops are the ones left older than their header
 CREATE OR REPLACE FUNCTION load_837_claim_line(
   p_claim_id TEXT,
   p_line_number INTEGER,
@@ -387,7 +477,14 @@ BEGIN
   ) VALUES (
     v_line_id, p_claim_id, p_line_number, p_procedure_code, p_diagnosis_code,
     p_service_date, p_charge_amount
-  ) ON CONFLICT (claim_id, line_number) DO NOTHING;
+  ) ON CONFLICT (claim_id, line_number) DO UPDATE SET
+    procedure_code = EXCLUDED.procedure_code,
+    diagnosis_code = EXCLUDED.diagnosis_code,
+    service_date = EXCLUDED.service_date,
+    charge_amount = EXCLUDED.charge_amount
+  WHERE (claim_line.procedure_code, claim_line.diagnosis_code, claim_line.service_date, claim_line.charge_amount)
+    IS DISTINCT FROM (EXCLUDED.procedure_code, EXCLUDED.diagnosis_code, EXCLUDED.service_date, EXCLUDED.charge_amount)
+    OR claim_line.updated_at < (SELECT ch.updated_at FROM claim_header ch WHERE ch.claim_id = claim_line.claim_id);
   
   RETURN v_line_id;
 END;
@@ -429,165 +526,273 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- Function to create clinical intent events from eligibility, PA, Rx, and Referrals
-CREATE OR REPLACE FUNCTION create_clinical_intent_events() RETURNS INTEGER AS $$
+--
+-- Incremental: each source table is read from its high-water mark in
+-- event_derivation_watermark (through the created_at indexes), and
+-- intent_event_id is derived from the source row, so ON CONFLICT on the
+-- primary key skips events that already exist. A procedure mapped to several
+-- episodes takes the primary mapping, as in create_clinical_outcome_events.
+-- Each source's upper bound is read once, before any insert, and both filters
+-- the inserts and becomes the new mark, so rows committing while the function
+-- runs are left for the next run instead of being skipped. created_at is the
+-- loading transaction's start time, so a load committing after a run can carry
+-- an older timestamp; each run re-reads a short lookback window to catch those.
+-- Pass p_full_refresh => true to reprocess every source row.
+DROP FUNCTION IF EXISTS create_clinical_intent_events();
+CREATE OR REPLACE FUNCTION create_clinical_intent_events(p_full_refresh BOOLEAN DEFAULT false) RETURNS INTEGER AS $$
 DECLARE
+  c_lookback CONSTANT INTERVAL := INTERVAL '15 minutes';
+  v_elig_since TIMESTAMPTZ;
+  v_pa_since TIMESTAMPTZ;
+  v_rx_since TIMESTAMPTZ;
+  v_elig_upper TIMESTAMPTZ;
+  v_pa_upper TIMESTAMPTZ;
+  v_rx_upper TIMESTAMPTZ;
   v_elig_count INTEGER;
   v_pa_count INTEGER;
   v_rx_count INTEGER;
 BEGIN
+  -- One run at a time, so watermarks only move forward
+  PERFORM pg_advisory_xact_lock(hashtext('create_clinical_intent_events'));
+  
+  SELECT
+    COALESCE(MAX(high_water_mark) FILTER (WHERE source_table = 'eligibility_inquiry_event') - c_lookback, '-infinity'),
+    COALESCE(MAX(high_water_mark) FILTER (WHERE source_table = 'prior_auth_request') - c_lookback, '-infinity'),
+    COALESCE(MAX(high_water_mark) FILTER (WHERE source_table = 'rx_benefit_inquiry') - c_lookback, '-infinity')
+  INTO v_elig_since, v_pa_since, v_rx_since
+  FROM event_derivation_watermark
+  WHERE NOT p_full_refresh;
+  
+  -- Upper bounds captured once: under READ COMMITTED every later statement
+  -- sees a new snapshot, so a MAX() taken after the inserts could cover rows
+  -- the inserts never saw
+  SELECT
+    (SELECT MAX(created_at) FROM eligibility_inquiry_event),
+    (SELECT MAX(created_at) FROM prior_auth_request),
+    (SELECT MAX(created_at) FROM rx_benefit_inquiry)
+  INTO v_elig_upper, v_pa_upper, v_rx_upper;
+  
   -- Create intent events from eligibility inquiries
-  WITH inserted AS (
-    INSERT INTO clinical_intent_event (
-      intent_event_id, member_id, episode_id, event_date, event_type,
-      event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
-    )
-    SELECT 
-      'INT-ELG-' || e.event_id,
-      e.member_id,
-      epm.episode_id,
-      e.inquiry_date,
-      'Eligibility_Inquiry',
-      e.event_id,
-      e.procedure_code,
-      e.diagnosis_code,
-      e.provider_npi,
-      CASE 
-        WHEN e.coverage_status = 'Covered' THEN 60.0
-        WHEN e.coverage_status = 'Prior Auth Required' THEN 75.0
-        ELSE 40.0
-      END
-    FROM eligibility_inquiry_event e
-    JOIN episode_procedure_map epm ON e.procedure_code = epm.procedure_code
-    WHERE NOT EXISTS (
-      SELECT 1 FROM clinical_intent_event ci 
-      WHERE ci.event_source_id = e.event_id
-    )
-    RETURNING 1
+  INSERT INTO clinical_intent_event (
+    intent_event_id, member_id, episode_id, event_date, event_type,
+    event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
   )
-  SELECT COUNT(*) INTO v_elig_count FROM inserted;
+  SELECT DISTINCT ON (e.event_id)
+    'INT-ELG-' || e.event_id,
+    e.member_id,
+    epm.episode_id,
+    e.inquiry_date,
+    'Eligibility_Inquiry',
+    e.event_id,
+    e.procedure_code,
+    e.diagnosis_code,
+    e.provider_npi,
+    CASE 
+      WHEN e.coverage_status = 'Covered' THEN 60.0
+      WHEN e.coverage_status = 'Prior Auth Required' THEN 75.0
+      ELSE 40.0
+    END
+  FROM eligibility_inquiry_event e
+  JOIN episode_procedure_map epm ON e.procedure_code = epm.procedure_code
+  WHERE e.created_at > v_elig_since
+  AND e.created_at <= v_elig_upper
+  ORDER BY e.event_id, epm.is_primary DESC, epm.episode_id
+  ON CONFLICT (intent_event_id) DO NOTHING;
+  GET DIAGNOSTICS v_elig_count := ROW_COUNT;
   
   -- Create intent events from prior auth requests AND referrals
-  WITH inserted AS (
-    INSERT INTO clinical_intent_event (
-      intent_event_id, member_id, episode_id, event_date, event_type,
-      event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
-    )
-    SELECT 
-      CASE 
-        WHEN pa.request_type = 'referral' THEN 'INT-REF-'
-        ELSE 'INT-PA-'
-      END || pa.auth_id,
-      pa.member_id,
-      epm.episode_id,
-      pa.request_date,
-      CASE 
-        WHEN pa.request_type = 'referral' THEN 'Referral'
-        ELSE 'Prior_Auth_Request'
-      END,
-      pa.auth_id,
-      pa.procedure_code,
-      pa.diagnosis_code,
-      pa.requesting_provider_npi,
-      CASE 
-        -- Referrals have lower signal strength than PA
-        WHEN pa.request_type = 'referral' AND pa.referred_provider_specialty IN ('Orthopedic Surgery', 'Pain Management') THEN 70.0
-        WHEN pa.request_type = 'referral' THEN 55.0
-        -- Prior auths have higher signal strength
-        WHEN pa.auth_status = 'approved' THEN 90.0
-        WHEN pa.auth_status = 'pended' THEN 70.0
-        WHEN pa.auth_status = 'requested' THEN 85.0
-        ELSE 50.0
-      END
-    FROM prior_auth_request pa
-    LEFT JOIN episode_procedure_map epm ON pa.procedure_code = epm.procedure_code
-    WHERE NOT EXISTS (
-      SELECT 1 FROM clinical_intent_event ci 
-      WHERE ci.event_source_id = pa.auth_id
-    )
-    -- For referrals without procedure codes, try to map via diagnosis
-    AND (epm.episode_id IS NOT NULL OR pa.request_type = 'referral')
-    RETURNING 1
+  INSERT INTO clinical_intent_event (
+    intent_event_id, member_id, episode_id, event_date, event_type,
+    event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
   )
-  SELECT COUNT(*) INTO v_pa_count FROM inserted;
+  SELECT DISTINCT ON (pa.auth_id)
+    CASE 
+      WHEN pa.request_type = 'referral' THEN 'INT-REF-'
+      ELSE 'INT-PA-'
+    END || pa.auth_id,
+    pa.member_id,
+    epm.episode_id,
+    pa.request_date,
+    CASE 
+      WHEN pa.request_type = 'referral' THEN 'Referral'
+      ELSE 'Prior_Auth_Request'
+    END,
+    pa.auth_id,
+    pa.procedure_code,
+    pa.diagnosis_code,
+    pa.requesting_provider_npi,
+    CASE 
+      -- Referrals have lower signal strength than PA
+      WHEN pa.request_type = 'referral' AND pa.referred_provider_specialty IN ('Orthopedic Surgery', 'Pain Management') THEN 70.0
+      WHEN pa.request_type = 'referral' THEN 55.0
+      -- Prior auths have higher signal strength
+      WHEN pa.auth_status = 'approved' THEN 90.0
+      WHEN pa.auth_status = 'pended' THEN 70.0
+      WHEN pa.auth_status = 'requested' THEN 85.0
+      ELSE 50.0
+    END
+  FROM prior_auth_request pa
+  LEFT JOIN episode_procedure_map epm ON pa.procedure_code = epm.procedure_code
+  WHERE pa.created_at > v_pa_since
+  AND pa.created_at <= v_pa_upper
+  -- For referrals without procedure codes, try to map via diagnosis
+  AND (epm.episode_id IS NOT NULL OR pa.request_type = 'referral')
+  ORDER BY pa.auth_id, epm.is_primary DESC, epm.episode_id
+  ON CONFLICT (intent_event_id) DO NOTHING;
+  GET DIAGNOSTICS v_pa_count := ROW_COUNT;
   
   -- Create intent events from Rx benefit checks
-  -- Map drugs to episodes based on indication
-  WITH inserted AS (
-    INSERT INTO clinical_intent_event (
-      intent_event_id, member_id, episode_id, event_date, event_type,
-      event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
-    )
-    SELECT 
-      'INT-RX-' || rx.inquiry_id,
-      rx.member_id,
-      CASE 
-        WHEN rx.drug_class IN ('NSAID', 'Opioid', 'Viscosupplement') THEN 'TKA'
-        WHEN rx.drug_class IN ('Anticoagulant', 'Antiplatelet') THEN 'CABG'
-        WHEN rx.drug_class IN ('Chemotherapy', 'Antiemetic') THEN 'COLORECTAL_SURGERY'
-        ELSE NULL
-      END,
-      rx.inquiry_date,
-      'Rx_Benefit_Check',
-      rx.inquiry_id,
-      NULL,
-      NULL,
-      rx.prescriber_npi,
-      CASE 
-        WHEN rx.drug_class IN ('Viscosupplement', 'Opioid') THEN 80.0
-        WHEN rx.drug_class = 'NSAID' THEN 50.0
-        ELSE 40.0
-      END
-    FROM rx_benefit_inquiry rx
-    WHERE NOT EXISTS (
-      SELECT 1 FROM clinical_intent_event ci 
-      WHERE ci.event_source_id = rx.inquiry_id
-    )
-    AND CASE 
-      WHEN rx.drug_class IN ('NSAID', 'Opioid', 'Viscosupplement') THEN 'TKA'
-      WHEN rx.drug_class IN ('Anticoagulant', 'Antiplatelet') THEN 'CABG'
-      WHEN rx.drug_class IN ('Chemotherapy', 'Antiemetic') THEN 'COLORECTAL_SURGERY'
-      ELSE NULL
-    END IS NOT NULL
-    RETURNING 1
+  -- Map drugs to episodes through episode_drug_class_map
+  INSERT INTO clinical_intent_event (
+    intent_event_id, member_id, episode_id, event_date, event_type,
+    event_source_id, procedure_code, diagnosis_code, provider_npi, signal_strength
   )
-  SELECT COUNT(*) INTO v_rx_count FROM inserted;
+  SELECT 
+    'INT-RX-' || rx.inquiry_id,
+    rx.member_id,
+    dcm.episode_id,
+    rx.inquiry_date,
+    'Rx_Benefit_Check',
+    rx.inquiry_id,
+    NULL,
+    NULL,
+    rx.prescriber_npi,
+    dcm.signal_strength
+  FROM rx_benefit_inquiry rx
+  JOIN episode_drug_class_map dcm ON rx.drug_class = dcm.drug_class
+  WHERE rx.created_at > v_rx_since
+  AND rx.created_at <= v_rx_upper
+  ON CONFLICT (intent_event_id) DO NOTHING;
+  GET DIAGNOSTICS v_rx_count := ROW_COUNT;
+  
+  -- Advance each mark to the upper bound this run processed (never backwards)
+  INSERT INTO event_derivation_watermark (source_table, high_water_mark)
+  SELECT source_table, high_water_mark
+  FROM (VALUES
+    ('eligibility_inquiry_event', v_elig_upper),
+    ('prior_auth_request', v_pa_upper),
+    ('rx_benefit_inquiry', v_rx_upper)
+  ) AS latest(source_table, high_water_mark)
+  WHERE high_water_mark IS NOT NULL
+  ON CONFLICT (source_table) DO UPDATE
+    SET high_water_mark = GREATEST(event_derivation_watermark.high_water_mark, EXCLUDED.high_water_mark),
+        updated_at = NOW();
   
   RETURN v_elig_count + v_pa_count + v_rx_count;
 END;
 $$ LANGUAGE plpgsql;
 
 -- Function to create clinical outcome events from claims
-CREATE OR REPLACE FUNCTION create_clinical_outcome_events() RETURNS INTEGER AS $$
+--
+-- Incremental and keyed on claim line: only lines whose claim_line or
+-- claim_header row changed since the last run (updated_at, kept by trigger)
+-- are read, and each line has at most one outcome (UNIQUE line_id). A
+-- replacement claim (CLM05-3 = 7) updates the outcomes of its lines in place;
+-- a void (8), a line the replacement no longer sends (its claim_line row is
+-- older than the rewritten header), or an adjusted line that no longer maps
+-- to an episode sets is_voided instead of deleting. The watermarks share
+-- event_derivation_watermark and the lookback of create_clinical_intent_events.
+DROP FUNCTION IF EXISTS create_clinical_outcome_events();
+CREATE OR REPLACE FUNCTION create_clinical_outcome_events(p_full_refresh BOOLEAN DEFAULT false) RETURNS INTEGER AS $$
 DECLARE
+  c_lookback CONSTANT INTERVAL := INTERVAL '15 minutes';
+  v_header_since TIMESTAMPTZ;
+  v_line_since TIMESTAMPTZ;
+  v_header_upper TIMESTAMPTZ;
+  v_line_upper TIMESTAMPTZ;
   v_count INTEGER;
+  v_unmapped INTEGER;
 BEGIN
-  WITH inserted AS (
-    INSERT INTO clinical_outcome_event (
-      outcome_event_id, member_id, episode_id, claim_id, procedure_date,
-      procedure_code, diagnosis_code, provider_npi, facility_npi, total_cost
-    )
-    SELECT 
-      'OUT-' || cl.line_id,
-      ch.member_id,
-      epm.episode_id,
-      ch.claim_id,
-      cl.service_date,
-      cl.procedure_code,
-      cl.diagnosis_code,
-      ch.rendering_provider_npi,
-      ch.facility_npi,
-      cl.charge_amount
-    FROM claim_line cl
-    JOIN claim_header ch ON cl.claim_id = ch.claim_id
-    JOIN episode_procedure_map epm ON cl.procedure_code = epm.procedure_code
-    WHERE NOT EXISTS (
-      SELECT 1 FROM clinical_outcome_event co 
-      WHERE co.claim_id = ch.claim_id AND co.procedure_code = cl.procedure_code
-    )
-    RETURNING 1
+  PERFORM pg_advisory_xact_lock(hashtext('create_clinical_outcome_events'));
+  
+  SELECT
+    COALESCE(MAX(high_water_mark) FILTER (WHERE source_table = 'claim_header') - c_lookback, '-infinity'),
+    COALESCE(MAX(high_water_mark) FILTER (WHERE source_table = 'claim_line') - c_lookback, '-infinity')
+  INTO v_header_since, v_line_since
+  FROM event_derivation_watermark
+  WHERE NOT p_full_refresh;
+  
+  -- Upper bounds captured once, as in create_clinical_intent_events
+  SELECT
+    (SELECT MAX(updated_at) FROM claim_header),
+    (SELECT MAX(updated_at) FROM claim_line)
+  INTO v_header_upper, v_line_upper;
+  
+  DROP TABLE IF EXISTS pg_temp.changed_claim_line;
+  CREATE TEMPORARY TABLE changed_claim_line ON COMMIT DROP AS
+  SELECT cl.line_id FROM claim_line cl WHERE cl.updated_at > v_line_since AND cl.updated_at <= v_line_upper
+  UNION
+  SELECT cl.line_id
+  FROM claim_header ch
+  JOIN claim_line cl ON cl.claim_id = ch.claim_id
+  WHERE ch.updated_at > v_header_since AND ch.updated_at <= v_header_upper;
+  
+  -- One outcome per line: a procedure mapped to several episodes takes the
+  -- primary mapping
+  INSERT INTO clinical_outcome_event (
+    outcome_event_id, member_id, episode_id, claim_id, line_id, procedure_date,
+    procedure_code, diagnosis_code, provider_npi, facility_npi, total_cost, is_voided
   )
-  SELECT COUNT(*) INTO v_count FROM inserted;
+  SELECT DISTINCT ON (cl.line_id)
+    'OUT-' || cl.line_id,
+    ch.member_id,
+    epm.episode_id,
+    ch.claim_id,
+    cl.line_id,
+    cl.service_date,
+    cl.procedure_code,
+    cl.diagnosis_code,
+    ch.rendering_provider_npi,
+    ch.facility_npi,
+    cl.charge_amount,
+    ch.claim_frequency_code = '8' OR (ch.claim_frequency_code = '7' AND cl.updated_at < ch.updated_at)
+  FROM changed_claim_line changed
+  JOIN claim_line cl ON cl.line_id = changed.line_id
+  JOIN claim_header ch ON cl.claim_id = ch.claim_id
+  JOIN episode_procedure_map epm ON cl.procedure_code = epm.procedure_code
+  ORDER BY cl.line_id, epm.is_primary DESC, epm.episode_id
+  ON CONFLICT (line_id) DO UPDATE SET
+    member_id = EXCLUDED.member_id,
+    episode_id = EXCLUDED.episode_id,
+    procedure_date = EXCLUDED.procedure_date,
+    procedure_code = EXCLUDED.procedure_code,
+    diagnosis_code = EXCLUDED.diagnosis_code,
+    provider_npi = EXCLUDED.provider_npi,
+    facility_npi = EXCLUDED.facility_npi,
+    total_cost = EXCLUDED.total_cost,
+    is_voided = EXCLUDED.is_voided,
+    updated_at = NOW()
+  WHERE (clinical_outcome_event.member_id, clinical_outcome_event.episode_id,
+         clinical_outcome_event.procedure_date, clinical_outcome_event.procedure_code,
+         clinical_outcome_event.diagnosis_code, clinical_outcome_event.provider_npi,
+         clinical_outcome_event.facility_npi, clinical_outcome_event.total_cost,
+         clinical_outcome_event.is_voided)
+    IS DISTINCT FROM (EXCLUDED.member_id, EXCLUDED.episode_id, EXCLUDED.procedure_date,
+                      EXCLUDED.procedure_code, EXCLUDED.diagnosis_code, EXCLUDED.provider_npi,
+                      EXCLUDED.facility_npi, EXCLUDED.total_cost, EXCLUDED.is_voided);
+  GET DIAGNOSTICS v_count := ROW_COUNT;
+  
+  -- Adjusted lines whose procedure no longer maps to any episode
+  UPDATE clinical_outcome_event co
+  SET is_voided = true, updated_at = NOW()
+  FROM changed_claim_line changed
+  JOIN claim_line cl ON cl.line_id = changed.line_id
+  WHERE co.line_id = cl.line_id
+    AND NOT co.is_voided
+    AND NOT EXISTS (SELECT 1 FROM episode_procedure_map epm WHERE epm.procedure_code = cl.procedure_code);
+  GET DIAGNOSTICS v_unmapped := ROW_COUNT;
+  
+  INSERT INTO event_derivation_watermark (source_table, high_water_mark)
+  SELECT source_table, high_water_mark
+  FROM (VALUES
+    ('claim_header', v_header_upper),
+    ('claim_line', v_line_upper)
+  ) AS latest(source_table, high_water_mark)
+  WHERE high_water_mark IS NOT NULL
+  ON CONFLICT (source_table) DO UPDATE
+    SET high_water_mark = GREATEST(event_derivation_watermark.high_water_mark, EXCLUDED.high_water_mark),
+        updated_at = NOW();
   
-  RETURN v_count;
+  RETURN v_count + v_unmapped;
 END;
 $$ LANGUAGE plpgsql;
@@ -19,3 +19,15 @@ INSERT INTO episode_definition (
   ('COLORECTAL', 'Colorectal Surgery', 'Oncology', 'Surgical removal of part of colon or rectum', 55000.00, 5),
   ('MASTECTOMY', 'Mastectomy', 'Oncology', 'Surgical removal of breast tissue', 42000.00, 2)
 ON CONFLICT (episode_id) DO NOTHING;
+
+-- Drug class -> episode mappings for Rx benefit intent events
+-- (used by create_clinical_intent_events)
+INSERT INTO episode_drug_class_map (drug_class, episode_id, signal_strength) VALUES
+  ('NSAID', 'TKA', 50.0),
+  ('Opioid', 'TKA', 80.0),
+  ('Viscosupplement', 'TKA', 80.0),
+  ('Anticoagulant', 'CABG', 40.0),
+  ('Antiplatelet', 'CABG', 40.0),
+  ('Chemotherapy', 'COLORECTAL', 40.0),
+  ('Antiemetic', 'COLORECTAL', 40.0)
+ON CONFLICT (drug_class) DO NOTHING;